@@ -14,16 +14,48 @@
 # General python libraries
 import sys
 import re
+import argparse
+import time
+import asyncio
 
 # Metric calculating libraries
 import platform
 import os
-import datetime
 #from resource import *
 import psutil
 
 # Network connection library
 import socket
+from sha1_protocol import PROTOCOL_PORT, FRAME_MANIFEST, FRAME_CHUNK, FRAME_END, FRAME_ACK, FRAME_REPAIR, FLAG_STREAMED, FLAG_TREE
+from sha1_protocol import FRAME_TYPE_NAMES, MAX_REPAIR_ROUNDS, pack_indices, send_frame, recv_frame, recv_file_frames, read_frame_async, write_frame_async
+from sha1_protocol import BufferedSocketReader, FRAME_STRIPE, unpack_stripe, accept_stripes, AsyncStripedReceiver
+from sha1_protocol import FRAME_COMPRESS, DecodingReceiver, AsyncDecodingReceiver
+
+# Negotiated chunk compression
+from sha1_compress import available_codecs, accepted_codecs_spec, answer_compression
+
+# Hash verification engine
+from sha1_verify import default_worker_count, cross_check_chunks_with_sha1sum, RunningVerifier, split_staged_chunks
+from sha1_verify import iter_staged_file, IndexedVerifier
+from sha1_merkle import merkle_root, merkle_levels, leaves_match_root, audit_path, verify_audit_path, verify_subrange
+
+# Binary digest manifests (hashes.bin)
+from sha1_manifest import Manifest
+
+# Packed chunk store with a fixed-width offset index (chunks.dat + chunks.idx)
+from sha1_chunkstore import ChunkStoreWriter, ChunkStore
+
+# Background resource sampling, tagged with the phase the script is in
+from sha1_sampler import PHASES, ResourceSampler, DEFAULT_SAMPLE_HZ, set_phase
+
+# Chrome trace / Perfetto spans, free while tracing is off
+from sha1_trace import span, start_tracing, save_trace
+
+# Power telemetry from sysfs sensors, a serial USB meter log or a replayed log
+from sha1_power import DEFAULT_POWER_HZ, PowerMonitor, power_source_spec, is_telemetry_source, open_power_source
+
+# Per-board settings saved by `sha1_benchmark.py autotune`
+from sha1_profile import BOARD_NAMES, load_board_profile, apply_socket_buffers, resolve_board_name
 
 
 
@@ -41,10 +73,27 @@ receive_txt_file_path = os.path.abspath( os.path.join(HOME_DIR, "receive.txt") )
 # Path for storing hash.txt file stored from the network 
 hash_txt_file_path = os.path.abspath( os.path.join(HOME_DIR, "hashes.txt") )
 
-# General path name for storing each hash of each text block
-hash_text_block_txt_dir = os.path.abspath(os.path.join(HOME_DIR, "associative-hashes"))
-if not os.path.exists(hash_text_block_txt_dir):
-    os.mkdir(hash_text_block_txt_dir)
+# Path for the binary manifest of a staged transfer, hashes.txt is its hex export
+hash_bin_file_path = os.path.abspath( os.path.join(HOME_DIR, "hashes.bin") )
+
+# Packed store of every received text block and its offset index, chunk N is one mmap slice away
+chunk_store_dat_file_path = os.path.abspath(os.path.join(HOME_DIR, "chunks.dat"))
+chunk_store_idx_file_path = os.path.abspath(os.path.join(HOME_DIR, "chunks.idx"))
+
+# Root the transmitter sent for the last tree transfer, what --verify-range checks leaves against
+merkle_root_txt_file_path = os.path.abspath(os.path.join(HOME_DIR, "merkle-root.txt"))
+
+# Path for the resource samples taken with --sample-hz
+samples_json_file_path = os.path.abspath(os.path.join(HOME_DIR, "SHA-1-samples-rx.json"))
+
+# Path for the power readings taken with a telemetry --power-source
+power_json_file_path = os.path.abspath(os.path.join(HOME_DIR, "SHA-1-power-rx.json"))
+
+# Default path for the --trace output
+trace_json_file_path = os.path.abspath(os.path.join(HOME_DIR, "SHA-1-trace-rx.json"))
+
+# Per-connection report written by the long-lived receiver server
+server_log_txt_file_path = os.path.abspath(os.path.join(HOME_DIR, "SHA-1-server-rx.txt"))
 
 # File to store hashes generated in Linux
 linux_hashes_txt_file_path = os.path.abspath(os.path.join(HOME_DIR, "linux-hashes.txt"))
@@ -147,6 +196,11 @@ def write_txt_file(type="results") -> None:
 #################################
 # Create the hashes.txt file and receive.txt
 def create_network_passed_files():
+    # A hashes.bin (or tree root) from an earlier run must not be mistaken for this transfer's
+    for path in (hash_bin_file_path, merkle_root_txt_file_path):
+        if os.path.exists(path):
+            os.remove(path)
+    
     # Create the hashes.txt file
     try:
         if not os.path.exists(hash_txt_file_path):
@@ -167,73 +221,671 @@ def create_network_passed_files():
    
 ############################
 
-# Create the client socket and transfer data using utf-8 encoding
-def receive_data_from_transmitter(server_ip):
+# Append every chunk from receive.txt to the chunk store as it streams past
+def store_chunks(chunks, store_writer):
+    for chunk in chunks:
+        set_phase("write")
+        with span("append chunk", "io"):
+            store_writer.append(chunk)
+        set_phase("hash")
+        yield chunk
+        set_phase("read")
+
+############################
+
+# Write a streamed transfer straight into hashes.txt and the chunk store, returns (chunk count, END payload).
+# Streamed chunks are raw bytes that may hold a "\r", so each one is stored by index with its length
+# instead of being separated in receive.txt.
+def receive_streamed_frames(connection_socket, first_frame) -> tuple:
+    chunk_count = 0
+    frame = first_frame
+    with open(hash_txt_file_path, "wb") as hash_file, ChunkStoreWriter(chunk_store_dat_file_path, chunk_store_idx_file_path) as store_writer:
+        while True:
+            if frame is None:
+                raise Exception("receive_streamed_frames: connection closed before the END frame")
+            frame_type, _, index, payload = frame
+            if(frame_type == FRAME_END):
+                end_payload = bytes(payload)
+                break
+            elif(frame_type == FRAME_MANIFEST):
+                hash_file.write(payload)
+                hash_file.write(b"\r")
+            elif(frame_type == FRAME_CHUNK):
+                if(index != chunk_count):
+                    raise Exception("receive_streamed_frames: expected chunk " + str(chunk_count) + " but got chunk " + str(index))
+                with span("append chunk", "io"):
+                    store_writer.append(payload)
+                chunk_count += 1
+            else:
+                raise Exception("receive_streamed_frames: unexpected " + FRAME_TYPE_NAMES[frame_type] + " frame")
+            with span("recv frame", "net"):
+                frame = recv_frame(connection_socket)
+    return chunk_count, end_payload
+
+############################
+
+# Stored chunks after `index`, read back out of the chunk store for RunningVerifier.resume()
+def iter_stored_chunks(store_writer, chunk_spans, index):
+    for later in range(index + 1, len(chunk_spans)):
+        offset, length, digest = chunk_spans[later]
+        yield later, store_writer.read(offset, length), digest
+
+############################
+
+# Frame handling of a verified streamed transfer, shared by the blocking receiver and the --serve daemon
+# which only differ in how they read and send frames. feed() takes every frame of a round (the first
+# pass or a repair round) up to its END frame, next_repair_round() picks the chunks to ask for again.
+# Stored chunks go into the chunk store by index, their (offset, length, digest) are remembered in
+# chunk_spans so repaired chunks can be patched in place and a chained digest re-derived from disk.
+class StreamedFrames:
+    def __init__(self, verifier, source: str, hash_file=None, store_writer=None, announce=True):
+        self.verifier = verifier
+        self.source = source
+        self.hash_file = hash_file
+        self.store_writer = store_writer
+        self.announce = announce
+        self.chunk_spans = list()
+        self.repair_indices = None
+        self.pending_digest = None
+        self.end_frame = None
+        self.wire_bytes = 0
+        self.verify_ns = 0
+    
+    # Take one frame of the current round, True once its END frame arrived
+    def feed(self, frame) -> bool:
+        if frame is None:
+            raise Exception(self.source + ": connection closed before the END frame")
+        frame_type, _, index, payload = frame
+        self.wire_bytes += len(payload)
+        repair = self.repair_indices is not None
+        if(frame_type == FRAME_END):
+            self.end_frame = frame
+            self.pending_digest = None
+            # A chained repair only resent the first failed chunk, carry the running digest on over the stored rest
+            if(repair and self.verifier.chained and self.store_writer is not None):
+                set_phase("verify")
+                with span("re-derive running digest", "hash"):
+                    self.verifier.resume(iter_stored_chunks(self.store_writer, self.chunk_spans, self.repair_indices[0]))
+            return True
+        elif(frame_type == FRAME_MANIFEST):
+            self.pending_digest = str(payload, "ascii")
+            if(self.hash_file and not repair):
+                self.hash_file.write(payload)
+                self.hash_file.write(b"\r")
+        elif(frame_type == FRAME_CHUNK):
+            if(self.pending_digest is None or (not repair and index != self.verifier.chunk_count)):
+                raise Exception(self.source + ": chunk " + str(index) + " arrived without its digest")
+            set_phase("verify")
+            verify_start = time.perf_counter_ns()
+            with span("verify chunk", "hash"):
+                if repair:
+                    matched = self.verifier.recheck(index, payload, self.pending_digest)
+                else:
+                    matched = self.verifier.check(payload, self.pending_digest)
+            self.verify_ns += time.perf_counter_ns() - verify_start
+            if(not matched and self.announce):
+                print("\tHash mismatch on arrival --> chunk " + str(index + 1))
+            if(self.store_writer is not None and not repair):
+                self.chunk_spans.append((self.store_writer.offset, len(payload), self.pending_digest))
+                self.store_writer.append(payload)
+            elif(self.store_writer is not None and self.chunk_spans[index][1] == len(payload)):
+                self.store_writer.rewrite(self.chunk_spans[index][0], payload)
+            self.pending_digest = None
+        else:
+            raise Exception(self.source + ": unexpected " + FRAME_TYPE_NAMES[frame_type] + " frame")
+        return False
+    
+    # Start a repair round if chunks failed and rounds are left, returns the indices to ask for (None when done).
+    # A chained mismatch fails every later digest too, with the chunks stored only the first failed one is
+    # asked for and the running digest is carried on over the stored rest, without them every chunk from there on is resent.
+    def next_repair_round(self):
+        if not(self.verifier.mismatched_indices and self.verifier.repair_rounds < MAX_REPAIR_ROUNDS):
+            return None
+        indices = self.verifier.start_repair_round()
+        if(self.verifier.chained and self.store_writer is not None):
+            indices = indices[:1]
+        self.repair_indices = indices
+        return indices
+    
+    # Tree streams end with the root, rebuild it from the leaves we checked (and repaired)
+    def finish(self) -> None:
+        if(self.end_frame[1] & FLAG_TREE):
+            self.verifier.root_matched = leaves_match_root(self.verifier.leaf_digests, bytes.fromhex(str(self.end_frame[3], "ascii")))
+
+############################
+
+# Frame handling of a verified staged transfer (hashes.txt then send.txt), shared like StreamedFrames.
+# send.txt separates chunks with "\r" and text mode never leaves a "\r" inside a chunk.
+class StagedFrames:
+    def __init__(self, verifier, source: str, tree: bool, receive_file=None, announce=True):
+        self.verifier = verifier
+        self.source = source
+        self.tree = tree
+        self.receive_file = receive_file
+        self.announce = announce
+        self.manifest_bytes = bytearray()
+        self.manifest = None
+        self.manifest_end = None
+        self.pending = bytearray()
+        self.wire_bytes = 0
+        self.verify_ns = 0
+    
+    # Take one frame of hashes.txt, True once its END frame arrived and its packed digests are loaded
+    def feed_manifest(self, frame) -> bool:
+        if frame is None:
+            raise Exception(self.source + ": connection closed before the END of hashes.txt")
+        frame_type, _, _, payload = frame
+        self.wire_bytes += len(payload)
+        if(frame_type == FRAME_MANIFEST):
+            self.manifest_bytes += payload
+            return False
+        if(frame_type != FRAME_END):
+            raise Exception(self.source + ": unexpected " + FRAME_TYPE_NAMES[frame_type] + " frame in hashes.txt")
+        self.manifest_end = payload
+        self.manifest = Manifest.from_bytes(bytes(self.manifest_bytes), tree=self.tree)
+        self.verifier.set_algorithm(self.manifest.algorithm)
+        return True
+    
+    # Take one frame of send.txt, split it on its separators and check every complete chunk right away.
+    # True once its END frame arrived.
+    def feed(self, frame) -> bool:
+        if frame is None:
+            raise Exception(self.source + ": connection closed before the END of send.txt")
+        frame_type, _, _, payload = frame
+        if(frame_type == FRAME_END):
+            return True
+        if(frame_type != FRAME_CHUNK):
+            raise Exception(self.source + ": unexpected " + FRAME_TYPE_NAMES[frame_type] + " frame")
+        self.wire_bytes += len(payload)
+        if self.receive_file:
+            self.receive_file.write(payload)
+        set_phase("verify")
+        verify_start = time.perf_counter_ns()
+        for chunk in split_staged_chunks(self.pending, payload):
+            index = self.verifier.chunk_count
+            with span("verify chunk", "hash"):
+                matched = self.verifier.check(chunk, self.manifest.hex(index))
+            if(not matched and self.announce):
+                print("\tHash mismatch on arrival --> chunk " + str(index + 1))
+        self.verify_ns += time.perf_counter_ns() - verify_start
+        return False
+    
+    # Tree manifests end with the root, the received leaves have to rebuild it
+    def finish(self) -> None:
+        if self.tree:
+            self.verifier.root_matched = leaves_match_root(self.verifier.leaf_digests, bytes.fromhex(str(self.manifest_end, "ascii")))
+
+############################
+
+# Verify a streamed transfer chunk by chunk as the frames arrive, chunks only hit the disk if store_payload is set.
+# Failed chunks are asked for again (REPAIR) until they match or MAX_REPAIR_ROUNDS is used up.
+def verify_streamed_frames(connection_socket, first_frame, verifier, store_payload=False) -> None:
+    hash_file = open(hash_txt_file_path, "wb") if store_payload else None
+    store_writer = ChunkStoreWriter(chunk_store_dat_file_path, chunk_store_idx_file_path) if store_payload else None
+    frames = StreamedFrames(verifier, "verify_streamed_frames", hash_file, store_writer)
+    try:
+        frame = first_frame
+        while True:
+            while not frames.feed(frame):
+                set_phase("receive")
+                with span("recv frame", "net"):
+                    frame = recv_frame(connection_socket)
+            indices = frames.next_repair_round()
+            if indices is None:
+                break
+            print("Asking the transmitter to resend " + str(len(indices)) + " of " + str(verifier.chunk_count) + " chunks")
+            send_frame(connection_socket, FRAME_REPAIR, pack_indices(indices))
+            frame = recv_frame(connection_socket)
+    finally:
+        if hash_file:
+            hash_file.close()
+        if store_writer is not None:
+            store_writer.close()
+    
+    frames.finish()
+    if(verifier.repair_rounds and verifier.chained and store_writer is None):
+        push_text("Chained repair resent every chunk from the first failure on (" + str(verifier.repaired_bytes)
+                  + " bytes), it cannot save bytes unless the chunks are kept with --store-payload")
+    elif verifier.repair_rounds:
+        push_text("Repair saved " + str(verifier.byte_count - verifier.repaired_bytes) + " of " + str(verifier.byte_count) + " bytes compared with a full resend")
+
+############################
+
+# Verify a staged transfer (hashes.txt then send.txt) as the send.txt frames arrive
+def verify_staged_frames(connection_socket, first_frame, verifier, store_payload=False) -> None:
+    receive_file = open(receive_txt_file_path, "wb") if store_payload else None
+    frames = StagedFrames(verifier, "verify_staged_frames", bool(first_frame[1] & FLAG_TREE), receive_file)
+    try:
+        # The manifest is small, collect it and load its packed digests
+        frame = first_frame
+        while not frames.feed_manifest(frame):
+            frame = recv_frame(connection_socket)
+        send_frame(connection_socket, FRAME_ACK, b"Successfully received hashes.txt")
+        if store_payload:
+            frames.manifest.save(hash_bin_file_path)
+            frames.manifest.write_hex(hash_txt_file_path)
+        
+        while True:
+            set_phase("receive")
+            with span("recv frame", "net"):
+                frame = recv_frame(connection_socket)
+            if frames.feed(frame):
+                break
+    finally:
+        if receive_file:
+            receive_file.close()
+    
+    frames.finish()
+    send_frame(connection_socket, FRAME_ACK, b"Successfully received receive.txt")
+
+############################
+
+# Create the server socket and receive hashes.txt and receive.txt as framed messages.
+# Returns when the transmitter connected and the Merkle root it sent (None for classic manifests).
+def receive_data_from_transmitter(server_ip, verifier=None, store_payload=False, profile=None, accepted_codecs=()):
     # Server socket variables
-    server_welcome_port = 64321
-    RECV_BUFFER = 1024 
+    server_welcome_port = PROTOCOL_PORT
     
-    # Data buffers for file writing
+    # The manifest is collected for hashes.bin, receive.txt is written frame by frame
     data_hashes = list()
-    data_receive = list()
+    tree_root = None
+    set_phase("receive")
     
     # Create TCP welcome socket
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as welcome_socket:
         # Listen for transmitter, then accept the connection
+        welcome_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        apply_socket_buffers(welcome_socket, profile)
         welcome_socket.bind((server_ip, server_welcome_port))
         print(f"Listening on {server_ip}:{server_welcome_port} ... ")
         welcome_socket.listen()
-        server_connection_socket, _ = welcome_socket.accept()
+        with span("wait for transmitter", "net"):
+            server_connection_socket, _ = welcome_socket.accept()
+        connected_at = time.perf_counter_ns()
         print("Connection created, now transferring files")
         
         # Use connection socket to receive hashes.txt and receive.txt
         with server_connection_socket:
-            # Set timout to 5 seconds
-            server_connection_socket.settimeout(5.0)
+            # Set timeout to 30 seconds, the END frames mark file boundaries so this only catches a dead link.
+            # A tuned recv buffer serves frame headers and digests from memory instead of one recv() each.
+            recv_buffer = profile.get("recv_buffer", 0) if profile else 0
+            def prepare_connection(connection):
+                connection.settimeout(30.0)
+                return BufferedSocketReader(connection, recv_buffer) if recv_buffer > 0 else connection
+            connection_socket = prepare_connection(server_connection_socket)
             
-            # Get hashes.txt file data           
-            try:
-                while True:
-                    data = server_connection_socket.recv(RECV_BUFFER)
-                    if not data:
-                        break
-                    else:
-                        data_hashes.append(data)
-            except socket.timeout:
-                pass
+            # The first frame tells us whether the transmitter staged its files or is streaming
+            first_frame = recv_frame(connection_socket)
+            if first_frame is None:
+                raise Exception("receive_data_from_transmitter: transmitter closed the connection before sending anything")
             
-            # ACK the transmitter for the hashes.txt file
-            server_connection_socket.sendall(b"Successfully received hashes.txt")
-    
-            # Get receive.txt file data
-            try:
-                while True:
-                    data = server_connection_socket.recv(RECV_BUFFER)
-                    if not data:
-                        break
-                    else:
-                        data_receive.append(data)
-            except socket.timeout:
-                pass
+            # A striped transmitter opens one connection per stream, accept the others and read them in chunk order
+            striped = None
+            if(first_frame[0] == FRAME_STRIPE):
+                with span("accept stripes", "net"):
+                    striped = connection_socket = accept_stripes(welcome_socket, connection_socket, first_frame, prepare_connection)
+                print("Transfer is striped over " + str(striped.stream_count) + " connections")
+                first_frame = recv_frame(connection_socket)
+                if first_frame is None:
+                    raise Exception("receive_data_from_transmitter: transmitter closed the connection after its STRIPE frames")
             
-            # ACK the transmitter or successfully getting receive.txt
-            server_connection_socket.sendall(b"Successfully received receive.txt")              
+            # A transmitter that wants compressed chunks offers its codecs first, answer with the one we take
+            codec = None
+            if(first_frame[0] == FRAME_COMPRESS):
+                reply, codec = answer_compression(first_frame, accepted_codecs)
+                send_frame(connection_socket, FRAME_COMPRESS, reply)
+                print("Transmitter offered compression " + str(first_frame[3], "ascii") + ", using " + str(reply, "ascii"))
+                if codec is not None:
+                    connection_socket = DecodingReceiver(connection_socket, codec)
+                first_frame = recv_frame(connection_socket)
+                if first_frame is None:
+                    raise Exception("receive_data_from_transmitter: transmitter closed the connection after its COMPRESS frame")
+            streamed = bool(first_frame[1] & FLAG_STREAMED)
+            tree = bool(first_frame[1] & FLAG_TREE)
+            if(verifier is not None and tree):
+                verifier.enable_tree_mode()
             
-            # Close the connection socket
+            if(verifier is not None and streamed):
+                # Verify-on-receive, check each chunk against its digest the moment it arrives
+                print("Transmitter is streaming, verifying chunks as they arrive")
+                verify_streamed_frames(connection_socket, first_frame, verifier, store_payload)
+                send_frame(connection_socket, FRAME_ACK, bytes("Verified " + verifier.summary(), "ascii"))
+            elif(verifier is not None):
+                # Verify-on-receive for a staged transmitter, chunks are checked as send.txt streams in
+                print("Verifying send.txt chunks as they arrive")
+                verify_staged_frames(connection_socket, first_frame, verifier, store_payload)
+            elif streamed:
+                # Streamed transfer, write each digest and chunk to disk as it arrives
+                print("Transmitter is streaming, writing chunks as they arrive")
+                chunk_count, end_payload = receive_streamed_frames(connection_socket, first_frame)
+                if tree:
+                    tree_root = str(end_payload, "ascii")
+                send_frame(connection_socket, FRAME_ACK, bytes("Successfully received " + str(chunk_count) + " streamed chunks", "ascii"))
+            else:
+                # Get hashes.txt file data, MANIFEST frames until its END frame
+                with span("recv hashes.txt", "net"):
+                    manifest_end = recv_file_frames(connection_socket, FRAME_MANIFEST, data_hashes, first_frame=first_frame)
+                if tree:
+                    tree_root = str(manifest_end, "ascii")
+                
+                # ACK the transmitter for the hashes.txt file
+                send_frame(connection_socket, FRAME_ACK, b"Successfully received hashes.txt")
+        
+                # Get receive.txt file data, CHUNK frames until its END frame, each written to disk as it arrives
+                with span("recv receive.txt", "net"):
+                    with open(receive_txt_file_path, "wb") as receive_file:
+                        recv_file_frames(connection_socket, FRAME_CHUNK, receive_file)
+                
+                # ACK the transmitter or successfully getting receive.txt
+                send_frame(connection_socket, FRAME_ACK, b"Successfully received receive.txt")
+            
+            # Close the connection socket (and every other stream of a striped transfer)
+            if codec is not None:
+                for line in codec.summary_lines():
+                    push_text(line)
+            if striped is not None:
+                for line in striped.summary_lines():
+                    push_text(line)
+                striped.close()
             server_connection_socket.close()
         
         # Close the welcome socket to TCP server
         welcome_socket.close()
     
-    # Write all data to their respective files after closing the socket
-    with open(hash_txt_file_path, "wb") as file: 
-        for line in data_hashes:
-            file.write(line)
-        file.close()
-    with open(receive_txt_file_path, "wb") as file:               
-        for line in data_receive:
+    # Streamed and verified transfers were already written to disk frame by frame (or not at all)
+    if(streamed or verifier is not None):
+        return connected_at, tree_root
+    
+    # Write the manifest after closing the socket, as hashes.bin plus its hex export
+    set_phase("write")
+    with span("write hashes.bin", "io"):
+        manifest = Manifest.from_bytes(b"".join(data_hashes), tree=(tree_root is not None))
+        manifest.save(hash_bin_file_path)
+        manifest.write_hex(hash_txt_file_path)
+    return connected_at, tree_root
+
+
+
+#################################
+#                               #
+#   MULTI-TRANSMITTER SERVER    #
+#                               #
+#################################
+# Seconds a connection may sit idle between frames before the server drops it
+SERVER_IDLE_TIMEOUT = 30.0
+
+# Connections of one striped transfer, collected as they arrive. Stream 0's connection
+# verifies the whole transfer, the others wait until it is done so their sockets stay open.
+class StripeGroup:
+    def __init__(self, stream_count: int):
+        self.readers = [None] * stream_count
+        self.owner = None
+        self.joined = asyncio.Event()
+        self.finished = asyncio.Event()
+
+############################
+
+# Add a connection that opened with `stripe_frame` to its transfer's group. Returns the
+# reader for the whole transfer to stream 0, None to every other stream once it is over.
+async def join_stripe_group(stripe_groups: dict, peer, stripe_frame, reader, connection_id: int):
+    transfer_id, stream_id, stream_count = unpack_stripe(stripe_frame[3])
+    group = stripe_groups.setdefault((peer[0], transfer_id), StripeGroup(stream_count))
+    if(len(group.readers) != stream_count or group.readers[stream_id] is not None):
+        raise Exception("join_stripe_group: stream " + str(stream_id) + " of " + str(stream_count) + " does not fit transfer " + str(transfer_id))
+    group.readers[stream_id] = reader
+    if(stream_id == 0):
+        group.owner = connection_id
+    if all(stream_reader is not None for stream_reader in group.readers):
+        group.joined.set()
+    try:
+        await asyncio.wait_for(group.joined.wait(), SERVER_IDLE_TIMEOUT)
+    except asyncio.TimeoutError:
+        stripe_groups.pop((peer[0], transfer_id), None)
+        raise Exception("join_stripe_group: only " + str(sum(r is not None for r in group.readers)) + " of " + str(stream_count) + " streams connected")
+    if(stream_id != 0):
+        await group.finished.wait()
+        return None
+    return AsyncStripedReceiver(group.readers)
+
+############################
+
+# Verify one transmitter's transfer on the event loop, every connection gets its own verifier.
+# Returns None for the extra connections of a striped transfer, its stream 0 reports for all of them.
+async def serve_transmitter(reader, writer, connection_id: int, stripe_groups: dict, accepted_codecs=()):
+    peer = writer.get_extra_info("peername")
+    verifier = RunningVerifier()
+    connected_at = time.perf_counter_ns()
+    first_frame_at = None
+    
+    frame = await read_frame_async(reader, SERVER_IDLE_TIMEOUT)
+    if frame is None:
+        raise Exception("serve_transmitter: " + str(peer) + " closed the connection before sending anything")
+    first_frame_at = time.perf_counter_ns()
+    stripes = None
+    if(frame[0] == FRAME_STRIPE):
+        stripes = await join_stripe_group(stripe_groups, peer, frame, reader, connection_id)
+        if stripes is None:
+            return None
+        reader = stripes
+        frame = await read_frame_async(reader, SERVER_IDLE_TIMEOUT)
+    codec = None
+    if(frame is not None and frame[0] == FRAME_COMPRESS):
+        reply, codec = answer_compression(frame, accepted_codecs)
+        await write_frame_async(writer, FRAME_COMPRESS, reply)
+        if codec is not None:
+            reader = AsyncDecodingReceiver(reader, codec)
+        frame = await read_frame_async(reader, SERVER_IDLE_TIMEOUT)
+    if frame is None:
+        raise Exception("serve_transmitter: " + str(peer) + " closed the connection before its first chunk")
+    streamed = bool(frame[1] & FLAG_STREAMED)
+    tree = bool(frame[1] & FLAG_TREE)
+    if tree:
+        verifier.enable_tree_mode()
+    
+    # Same frame handling as the blocking receiver, only the frames come from the event loop
+    source = "serve_transmitter " + str(peer)
+    if streamed:
+        # Digest (MANIFEST) and chunk (CHUNK) arrive together for every index, failed chunks are asked for again
+        frames = StreamedFrames(verifier, source, announce=False)
+        while True:
+            while not frames.feed(frame):
+                frame = await read_frame_async(reader, SERVER_IDLE_TIMEOUT)
+            indices = frames.next_repair_round()
+            if indices is None:
+                break
+            await write_frame_async(writer, FRAME_REPAIR, pack_indices(indices))
+            frame = await read_frame_async(reader, SERVER_IDLE_TIMEOUT)
+        frames.finish()
+        await write_frame_async(writer, FRAME_ACK, bytes("Verified " + verifier.summary(), "ascii"))
+    else:
+        # Staged transfer, the whole manifest first and then send.txt split on its separators
+        frames = StagedFrames(verifier, source, tree, announce=False)
+        while not frames.feed_manifest(frame):
+            frame = await read_frame_async(reader, SERVER_IDLE_TIMEOUT)
+        await write_frame_async(writer, FRAME_ACK, b"Successfully received hashes.txt")
+        frame = await read_frame_async(reader, SERVER_IDLE_TIMEOUT)
+        while not frames.feed(frame):
+            frame = await read_frame_async(reader, SERVER_IDLE_TIMEOUT)
+        frames.finish()
+        await write_frame_async(writer, FRAME_ACK, b"Successfully received receive.txt")
+    
+    # Per-connection throughput and latency
+    finished_at = time.perf_counter_ns()
+    elapsed_sec = (finished_at - connected_at) / 1e9
+    return {
+        "id": connection_id,
+        "peer": peer[0] + ":" + str(peer[1]),
+        "mode": ("streamed" if streamed else "staged") + (" tree" if tree else ""),
+        "chunks": verifier.chunk_count,
+        "matched": verifier.matched_count,
+        "mismatched": verifier.mismatched_count,
+        "root_matched": verifier.root_matched,
+        "repaired_bytes": verifier.repaired_bytes,
+        "wire_bytes": frames.wire_bytes,
+        "elapsed_sec": round(elapsed_sec, 6),
+        "throughput_MBps": round(frames.wire_bytes / elapsed_sec / 1e6, 3) if elapsed_sec > 0 else 0.0,
+        "first_frame_latency_ms": round((first_frame_at - connected_at) / 1e6, 3),
+        "verify_latency_us_per_chunk": round(frames.verify_ns / 1e3 / verifier.chunk_count, 3) if verifier.chunk_count else 0.0,
+        "stripes": stripes.report() if stripes is not None else None,
+        "compression": codec.report() if codec is not None else None,
+    }
+
+############################
+
+# Format one connection report for the console and SHA-1-server-rx.txt
+def format_connection_report(report: dict) -> str:
+    return ("[conn " + str(report["id"]) + "] " + report["peer"] + " " + report["mode"] + ": "
+            + str(report["matched"]) + "/" + str(report["chunks"]) + " chunks matched, "
+            + ("" if report["root_matched"] is None else "root " + ("OK" if report["root_matched"] else "BAD") + ", ")
+            + ("" if not report["repaired_bytes"] else str(report["repaired_bytes"]) + " bytes repaired, ")
+            + str(report["wire_bytes"]) + " bytes in " + str(report["elapsed_sec"]) + " s ("
+            + str(report["throughput_MBps"]) + " MB/s), first frame after " + str(report["first_frame_latency_ms"]) + " ms, "
+            + str(report["verify_latency_us_per_chunk"]) + " us/chunk verify"
+            + ("" if report["stripes"] is None else ", " + str(report["stripes"]["stream_count"]) + " streams at "
+               + "/".join(str(stream["throughput_MBps"]) for stream in report["stripes"]["streams"]) + " MB/s")
+            + ("" if report["compression"] is None else ", " + report["compression"]["codec"] + " saved "
+               + str(report["compression"]["saved_bytes"]) + " bytes in " + str(report["compression"]["decompress_sec"]) + " s decompress"))
+
+############################
+
+# Run the receiver as a long-lived daemon that verifies any number of transmitters at once
+async def run_receiver_server(server_ip: str, server_port=PROTOCOL_PORT, profile=None, accepted_codecs=()) -> None:
+    connection_count = 0
+    stripe_groups = dict()
+    
+    async def handle_connection(reader, writer):
+        nonlocal connection_count
+        connection_count += 1
+        connection_id = connection_count
+        try:
+            report = await serve_transmitter(reader, writer, connection_id, stripe_groups, accepted_codecs)
+            line = format_connection_report(report) if report is not None else None
+        except Exception as e:
+            line = "[conn " + str(connection_id) + "] failed: " + str(e)
+        finally:
+            # A striped transfer is over once its stream 0 is, release the connections waiting on it
+            for key, group in list(stripe_groups.items()):
+                if(group.owner == connection_id):
+                    group.finished.set()
+                    del stripe_groups[key]
+            writer.close()
+        if line is None:
+            return
+        print(line)
+        with open(server_log_txt_file_path, "a") as file:
             file.write(line)
-        file.close()
+            file.write("\r")
+    
+    # The buffers go on the listener before listen(), accepted sockets inherit them and TCP sizes
+    # its window scale from the receive buffer at SYN time
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    apply_socket_buffers(listener, profile)
+    listener.bind((server_ip, server_port))
+    listener.listen()
+    server = await asyncio.start_server(handle_connection, sock=listener)
+    print(f"Receiver server listening on {server_ip}:{server_port}, press Ctrl+C to stop")
+    async with server:
+        await server.serve_forever()
+
+
+
+#################################
+#                               #
+#        STORED SUBRANGE        #
+#                               #
+#################################
+# argparse type for --verify-range, "5:9" -> (5, 9)
+def chunk_range_spec(text: str) -> tuple:
+    start, _, end = text.partition(":")
+    if(not start.isdigit() or not end.isdigit() or not 1 <= int(start) <= int(end)):
+        raise argparse.ArgumentTypeError("expected START:END chunk numbers with 1 <= START <= END, not " + text)
+    return int(start), int(end)
+
+############################
+
+# --verify-range: check chunks first..last of the last tree transfer without a transmitter. Each
+# manifest leaf in the range is checked against the saved root through its audit path, then the
+# stored chunks are hashed against those leaves, so a few chunks can be re-verified on their own.
+def verify_stored_range(first: int, last: int, workers=None, use_processes=False) -> None:
+    if not os.path.exists(merkle_root_txt_file_path):
+        raise Exception("verify_stored_range: no merkle-root.txt, --verify-range needs the files of a --tree transfer received without --verify-on-receive")
+    with open(merkle_root_txt_file_path, "r") as file:
+        root = bytes.fromhex(file.read().strip())
+    manifest = Manifest.load(hash_bin_file_path if os.path.exists(hash_bin_file_path) else hash_txt_file_path, tree=True)
+    if(manifest.algorithm != "sha1"):
+        raise Exception("verify_stored_range: the Merkle tree is built from sha1 leaves, the manifest holds " + manifest.algorithm + " digests")
+    if(last > len(manifest)):
+        raise Exception("verify_stored_range: chunk " + str(last) + " is past the " + str(len(manifest)) + " chunk manifest")
+    print("Verifying chunks " + str(first) + "-" + str(last) + " of " + str(len(manifest)) + " against Merkle root 0x" + root.hex())
+    
+    # Leaves first, a leaf that is not under the root says nothing about its chunk
+    with span("audit paths", "hash"):
+        levels = merkle_levels(manifest.digests)
+        bad_leaves = [index for index in range(first - 1, last) if not verify_audit_path(manifest.digests[index], audit_path(levels, index), root)]
+    for index in bad_leaves:
+        print("\tManifest leaf does not lead to the root --> chunk " + str(index + 1))
+    
+    # Then the stored chunks against their leaves
+    with ChunkStore(chunk_store_dat_file_path, chunk_store_idx_file_path) as chunk_store:
+        if(last > len(chunk_store)):
+            raise Exception("verify_stored_range: chunks.dat only holds " + str(len(chunk_store)) + " chunks")
+        chunks = [bytes(chunk_store[index]) for index in range(first - 1, last)]
+    with span("verify subrange", "hash"):
+        matches = verify_subrange(chunks, first - 1, manifest.digests, workers=workers, use_processes=use_processes)
+    for offset in range(len(matches)):
+        if not matches[offset]:
+            print("\tHash mismatch --> chunk " + str(first + offset))
+    print("Range verification: " + str(sum(matches)) + "/" + str(len(matches)) + " chunks match their leaves, "
+          + str(len(matches) - len(bad_leaves)) + "/" + str(len(matches)) + " leaves lead to the root")
+
+
+
+#################################
+#                               #
+#     COMMAND LINE ARGUMENTS    #
+#                               #
+#################################
+def parse_args():
+    parser = argparse.ArgumentParser(description="SHA-1 receiver: receive chunks and hashes, then verify them")
+    parser.add_argument("--workers", type=int, default=default_worker_count(),
+                        help="number of hashing workers for tree manifests and --sha1sum-check, chained manifests verify serially (default: usable cores on this board)")
+    parser.add_argument("--processes", action="store_true",
+                        help="hash in a process pool instead of a thread pool")
+    parser.add_argument("--sha1sum-check", action="store_true",
+                        help="also cross-check every chunk file with batched sha1sum calls")
+    parser.add_argument("--verify-on-receive", action="store_true",
+                        help="check every chunk against its digest as it arrives instead of after the transfer")
+    parser.add_argument("--store-payload", action="store_true",
+                        help="with --verify-on-receive, still write hashes.txt and the chunks to disk (receive.txt when staged, chunks.dat "
+                             "when streamed, so a chained repair only resends the chunks that failed)")
+    parser.add_argument("--verify-range", type=chunk_range_spec, default=None, metavar="START:END",
+                        help="re-check chunks START to END (numbered from 1, as in the results) of the last --tree transfer from chunks.dat, "
+                             "against hashes.bin (or hashes.txt) and the root in merkle-root.txt, then exit")
+    parser.add_argument("--serve", action="store_true",
+                        help="run as a long-lived server that verifies many transmitters concurrently")
+    parser.add_argument("--host", default=None,
+                        help="address to listen on, skips the IP prompt (--serve default: all interfaces)")
+    parser.add_argument("--port", type=int, default=PROTOCOL_PORT,
+                        help="port the --serve daemon listens on")
+    parser.add_argument("--accept-compression", type=accepted_codecs_spec, default=available_codecs(),
+                        help="comma separated codecs a transmitter may compress chunks with, or none (default: "
+                             + ",".join(available_codecs()) + ")")
+    parser.add_argument("--board", default=None,
+                        help="board name or menu number (" + ", ".join(key + "=" + name for key, name in BOARD_NAMES.items()) + "), skips the device prompt")
+    parser.add_argument("--power-source", type=power_source_spec, default="manual",
+                        help="where power readings come from: manual (typed in from the USB meter), none, hwmon[:NAME], ina3221[:RAIL], "
+                             "power-supply[:NAME], serial:PATH[@BAUD] or replay:FILE.csv")
+    parser.add_argument("--power-hz", type=float, default=DEFAULT_POWER_HZ,
+                        help="polling rate for telemetry power sources")
+    parser.add_argument("--sample-hz", type=float, nargs="?", const=DEFAULT_SAMPLE_HZ, default=0.0,
+                        help="record CPU, frequency, memory and temperature samples at this rate (default when given: "
+                             + str(DEFAULT_SAMPLE_HZ) + " Hz) into SHA-1-samples-rx.json")
+    parser.add_argument("--trace", nargs="?", const=trace_json_file_path, default=None,
+                        help="record receive/read/hash/verify spans as Chrome trace JSON (default path: SHA-1-trace-rx.json)")
+    parser.add_argument("--no-profile", action="store_true",
+                        help="ignore the recv and socket buffer sizes saved by `sha1_benchmark.py autotune` for this board")
+    return parser.parse_args()
 
 
 
@@ -243,31 +895,59 @@ def receive_data_from_transmitter(server_ip):
 #                               #
 #################################
 def main():
+    # Read command line options before anything is timed
+    args = parse_args()
+    
+    # Buffer sizes come from this board's autotune profile when there is one
+    profile = None if args.no_profile else load_board_profile(args.board)
+    if profile:
+        print("Using autotune profile: recv buffer " + str(profile.get("recv_buffer", 0) or "unbuffered") + ", socket buffer " + str(profile.get("socket_buffer", 0) or "default"))
+    
+    # Re-check part of the last tree transfer from disk, no transmitter and no prompts
+    if args.verify_range:
+        verify_stored_range(args.verify_range[0], args.verify_range[1], workers=args.workers, use_processes=args.processes)
+        return
+    
+    # Daemon mode skips the interactive prompts and serves transmitters until stopped
+    if args.serve:
+        try:
+            asyncio.run(run_receiver_server(args.host or "0.0.0.0", args.port, profile=profile, accepted_codecs=args.accept_compression))
+        except KeyboardInterrupt:
+            print("\nReceiver server stopped")
+        return
+    
     # Start the elapsed time timer
-    elapsed_time_start = datetime.datetime.now()
-    
-    # Get name of embedded device user is running on
-    print("Please enter which platform you are running this on:")
-    print("\t(1) Raspberry Pi 3B+")
-    print("\t(2) Raspberry Pi 4B")
-    print("\t(3) Jetson Nano 4GB")
-    print("device: ", end="")
-    device_name = int(input())
-
-    # Define the device used
-    if(device_name == 1):
-        hw_name = "Raspberry Pi 3B+"
-    elif(device_name == 2):
-        hw_name = "Raspberry Pi 4B"
-    elif(device_name == 3):
-        hw_name = "Jetson Nano 4GB"
+    elapsed_time_start = time.perf_counter_ns()
+    
+    # Board name from the command line, otherwise ask for it
+    if args.board:
+        hw_name = resolve_board_name(args.board)
     else:
-        raise Exception("You need to enter either 1, 2, or 3... run the program again")
-        sys.exit(0) 
+        # Get name of embedded device user is running on
+        print("Please enter which platform you are running this on:")
+        print("\t(1) Raspberry Pi 3B+")
+        print("\t(2) Raspberry Pi 4B")
+        print("\t(3) Jetson Nano 4GB")
+        print("device: ", end="")
+        device_name = int(input())
+
+        # Define the device used
+        if(device_name == 1):
+            hw_name = "Raspberry Pi 3B+"
+        elif(device_name == 2):
+            hw_name = "Raspberry Pi 4B"
+        elif(device_name == 3):
+            hw_name = "Jetson Nano 4GB"
+        else:
+            raise Exception("You need to enter either 1, 2, or 3... run the program again")
+            sys.exit(0) 
         
-    # Get IP information for this device
-    print("\nDevice IP = ", end="")
-    server_ip = input()
+    # Get IP information for this device, unless it was given on the command line
+    if args.host:
+        server_ip = args.host
+    else:
+        print("\nDevice IP = ", end="")
+        server_ip = input()
     reg_ex = r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$"
     if not re.match(reg_ex, server_ip):
         raise Exception("Illegal IP address... please retry")
@@ -303,115 +983,126 @@ def main():
     push_text("\n")
     
     
-    # Connect to transmitter over network and receive files
-    create_network_passed_files()
-    receive_data_from_transmitter(server_ip)
+    # Trace spans start with the transfer
+    if args.trace:
+        start_tracing("SHA-1 receiver (" + hw_name + ")")
     
+    # Start the resource sampler before anything is received
+    sampler = ResourceSampler(args.sample_hz) if args.sample_hz > 0 else None
+    if sampler is not None:
+        sampler.start()
     
-    # Get execution time of hash verfication
-    program_start = datetime.datetime.now()
+    # Poll the power sensor alongside it when --power-source names one
+    power_monitor = PowerMonitor(open_power_source(args.power_source), args.power_hz) if is_telemetry_source(args.power_source) else None
+    if power_monitor is not None:
+        power_monitor.start()
     
-    
-    # Run through all hashes stored in the hashes.txt file and store to hashes buffer
-    print("Reading hashes and chunks from files...")
-    hashes_buffer = list()
-    try:
-        file = open(hash_txt_file_path, "r")
-        for line in file:
-            if not line:
-                continue
-            else:
-                hashes_buffer.append(line.split("\n")[0])
-    except Exception as e:
-        print("Error reading hashes.txt file: " + str(e))
-    finally:
-        file.close()
+    # Verify-on-receive: chunks are checked during the transfer, so the timer starts at connect
+    if args.verify_on_receive:
+        verifier = RunningVerifier()
+        if args.store_payload:
+            create_network_passed_files()
+        program_start, _ = receive_data_from_transmitter(server_ip, verifier=verifier, store_payload=args.store_payload, profile=profile,
+                                                         accepted_codecs=args.accept_compression)
+        push_text("Verify-on-receive: " + verifier.summary())
+        payload_bytes = verifier.byte_count
+        for index in verifier.mismatched_indices:
+            push_text("\tchunk " + str(index + 1) + " hash DOES NOT MATCH")
+        push_text("\n")
+    else:
+        # Connect to transmitter over network and receive files
+        create_network_passed_files()
+        _, tree_root = receive_data_from_transmitter(server_ip, profile=profile, accepted_codecs=args.accept_compression)
+        if tree_root is not None:
+            with open(merkle_root_txt_file_path, "w") as file:
+                file.write(tree_root + "\n")
         
-    # Run through all ascii chunks stored in receive.txt and store to ascii list
-    ascii_buffer = list()
-    try:
-        file = open(receive_txt_file_path, "r")
-        for line in file:
-            if not line:
-                continue
+        
+        # Get execution time of hash verfication
+        program_start = time.perf_counter_ns()
+        
+        
+        # Staged transfers leave hashes.bin, streamed ones only the hex hashes.txt
+        set_phase("read")
+        staged = os.path.exists(hash_bin_file_path)
+        with span("load manifest", "io"):
+            manifest = Manifest.load(hash_bin_file_path if staged else hash_txt_file_path, tree=(tree_root is not None))
+        push_text("Manifest: " + manifest.summary())
+        
+        # Stream receive.txt and check chunk i against digest i of the manifest.
+        # Classic manifests are the transmitter's running sha1 (or the --algorithm it named), tree manifests are per-chunk leaves.
+        # A chained manifest without --sha1sum-check has no per-chunk work to spread, so it is checked serially.
+        verifier = IndexedVerifier(chained=(tree_root is None), keep_leaves=(tree_root is not None or args.sha1sum_check),
+                                   workers=args.workers, use_processes=args.processes, algorithm=manifest.algorithm)
+        if verifier.parallel:
+            print("Verifying chunks against the manifest by index on " + str(verifier.active_workers) + " worker(s)...")
+        else:
+            print("Verifying chunks against the manifest by index, serially (each running digest depends on the chunk before it)...")
+        # Staged receive.txt is split on its "\r" separators into the store, streamed chunks are already in it by index
+        with span("verify chunks", "verify", {"workers": verifier.active_workers}):
+            if staged:
+                with ChunkStoreWriter(chunk_store_dat_file_path, chunk_store_idx_file_path) as store_writer:
+                    verifier.run(store_chunks(iter_staged_file(receive_txt_file_path), store_writer), manifest.digests)
             else:
-                ascii_buffer.append(line.split("\n")[0])
-    except Exception as e:
-        print("Error reading receive.txt file: " + str(e))
-    finally:
-        file.close()
+                with ChunkStore(chunk_store_dat_file_path, chunk_store_idx_file_path) as stored:
+                    verifier.run((bytes(chunk) for chunk in stored), manifest.digests)
+        payload_bytes = verifier.byte_count
+        chunk_store = ChunkStore(chunk_store_dat_file_path, chunk_store_idx_file_path)
+        push_text("Chunk store: " + chunk_store.summary())
     
-    # Associate each hash with its respective chunk, then make txt file for each ascii chunk
-    print("Mapping hashes to its associative text block...")
-    hashes_to_text_dict = dict()
-    for i in range(len(hashes_buffer)):
-        try:
-            # Associate hash to text to 1 file
-            hashes_to_text_dict.update({str(hashes_buffer[i]): str(ascii_buffer[i])})
-
-            # Make .txt file for this hash
-            temp_file_name = "text-of-hashes-" + str(i+1) + ".txt"
-            file = open(os.path.join(hash_text_block_txt_dir, temp_file_name), "w+")
-            file.write(ascii_buffer[i])            
-        except Exception as e:
-            print("Error writing to text-of-hashes-" + str(i) +".txt file: " + str(e))
-        finally:
-            file.close()
-    
-    # Get linux hash sums from terminal command
-    print("Getting hashes from Linux...")
-    file = os.open(linux_hashes_txt_file_path, os.O_CREAT, 0o777)
-    os.close(file)
-    num_hashes = os.listdir(hash_text_block_txt_dir)
-    for i in range(len(num_hashes)):
-        try:
-            print("\tsha1sum " + os.path.join(hash_text_block_txt_dir, num_hashes[i]) + " >> " + linux_hashes_txt_file_path)
-            os.system("sha1sum " + os.path.join(hash_text_block_txt_dir, num_hashes[i]) + " >> " + linux_hashes_txt_file_path)
-        except Exception as e:
-            print("Error in getting hash for " + num_hashes[i] + ": " + str(e))
+        # Tree manifests: the per-chunk digests are the Merkle leaves, so rebuild the root and check it too
+        if tree_root is not None:
+            set_phase("hash")
+            with span("merkle root", "hash"):
+                computed_root = merkle_root(verifier.leaves).hex()
+            push_text("Merkle root " + ("MATCHES" if computed_root == tree_root else "DOES NOT MATCH") + ": sender 0x" + tree_root + ", hashlib 0x" + computed_root)
+        
+        # Optionally cross-check hashlib against coreutils, one sha1sum call per batch of chunks
+        # written out of the store to a scratch directory
+        set_phase("verify")
+        if(args.sha1sum_check and manifest.algorithm != "sha1"):
+            push_text("sha1sum cross-check: skipped, the manifest holds " + manifest.algorithm + " digests")
+        elif args.sha1sum_check:
+            print("Cross-checking hashlib against sha1sum...")
+            file = os.open(linux_hashes_txt_file_path, os.O_CREAT, 0o777)
+            os.close(file)
+            with span("sha1sum cross-check", "hash"):
+                disagreements = cross_check_chunks_with_sha1sum(chunk_store, verifier.leaves, output_path=linux_hashes_txt_file_path)
+            for i in disagreements:
+                print("\tsha1sum disagrees with hashlib --> chunk " + str(i+1))
+            push_text("sha1sum cross-check: " + str(len(chunk_store) - len(disagreements)) + "/" + str(len(chunk_store)) + " chunks agree with hashlib")
         
-    # Compare hashes in linux by opening the linux hashes file and check if hash was found in dictionary --> if so find it's text file
-    print("Comparing hashes...")
-    matched_hashes = [False] * len(num_hashes)
-    linux_hashes = [None] * len(num_hashes)
-    with open(linux_hashes_txt_file_path, "r") as file:
-        for raw_line in file:
-            line = raw_line.split(" ")[0]
-            if(line in hashes_to_text_dict): 
-                text_file_number = hashes_buffer.index(line)
-                matched_hashes[text_file_number] = True
-                print("\tHash match --> " + num_hashes[text_file_number])
+        # Only the mismatches are listed, a match is already counted in the summary line.
+        # Each one is looked up in the store by index for its offset and length in chunks.dat.
+        push_text("Hash verification: " + verifier.summary())
+        for index, expected, computed in verifier.mismatches:
+            print("\tHash mismatch --> chunk " + str(index+1))
+            if(index < len(chunk_store)):
+                offset, length = chunk_store.entry(index)
+                location = str(length) + " bytes at offset " + str(offset) + " of chunks.dat"
             else:
-                print("\tHash not found!! --> " + line)                
-            linux_hashes[i] = line
-    
-    # Organize hashes for easier printing to results.txt
-    matched_list_for_txt = list()
-    for i in range(len(num_hashes)):
-        if(matched_hashes[i]):
-            matched_list_for_txt.append(num_hashes[i] + " hash has MATCHING value of " + linux_hashes[i])
-        else:
-            matched_list_for_txt.append(num_hashes[i] + " hash DOES NOT MATCH: \n\thashlib: 0x" + hashes_buffer[i] + "\n\tLinux  : 0x" + str(linux_hashes[i]))
-    
-    # Write all organized text found to results.txt file
-    for line in matched_list_for_txt:
-        push_text(line)
-    push_text("\n")
+                location = "never received"
+            push_text("chunk " + str(index+1) + " (" + location + ") hash DOES NOT MATCH: \n\tsender : 0x" + expected + "\n\thashlib: 0x" + computed)
+        if(verifier.mismatched_count > len(verifier.mismatches)):
+            push_text("... " + str(verifier.mismatched_count - len(verifier.mismatches)) + " more mismatched chunk(s) not listed")
+        chunk_store.close()
+        push_text("\n")
     
     
     # End execution and elapsed time tracking
-    program_end = datetime.datetime.now()
-    elapsed_time_end = datetime.datetime.now()
-    
-    # Calculate the execution time
-    execution_time = program_end - program_start
-    h,m,s = str(execution_time).split(":")
-    execution_time_sec = round(int(h)*3600 + int(m)*60 + float(s), 8)
+    program_end = time.perf_counter_ns()
+    elapsed_time_end = time.perf_counter_ns()
+    set_phase("idle")
+    if sampler is not None:
+        sampler.stop()
+    if args.trace:
+        print("Trace: " + str(save_trace(args.trace)) + " events written to " + args.trace)
+    if power_monitor is not None:
+        power_monitor.stop()
     
-    # Calculate the elapsed time
-    elapsed_time = elapsed_time_end - elapsed_time_start
-    h,m,s = str(elapsed_time).split(":")
-    elapsed_time_sec = round(int(h)*3600 + int(m)*60 + float(s), 8)
+    # Calculate the execution and elapsed time from the nanosecond counters
+    execution_time_sec = round((program_end - program_start) / 1e9, 8)
+    elapsed_time_sec = round((elapsed_time_end - elapsed_time_start) / 1e9, 8)
     
     # Get average CPU usage over last 1,5,15 minutes
     # load_1min, load_5min, load_15min = os.getloadavg()
@@ -431,28 +1122,45 @@ def main():
     # push_text("\t5 minute after execution = " + str(cpu_usage_5min) + "%")
     # push_text("\t15 minute after execution = " + str(cpu_usage_15min) + "%")       
     
-    # Ask user for input for max and average values from USB power meter
-    print("\n\nPlease enter the HIGHEST power draw during process (Watts):  ", end="")
-    max_power_draw = round( float(input()), 4 )
-    print("Please enter the AVERAGE power draw value during process (Watts):  ", end="")
-    avg_power_draw = round( float(input()), 4 )
-    print("Please enter the HIGHEST voltage value during the process (Volts):  ", end="")
-    max_voltage = round( float(input()), 4 )
-    print("Please enter the AVERAGE voltage value during the process (Volts):  ", end="")
-    avg_voltage = round( float(input()), 4 )
-    print("Please enter the HIGHEST current value during the process (Amps):  ", end="")
-    max_current = round( float(input()), 4 )
-    print("Please enter the AVERAGE current value during the process (Amps):  ", end="")
-    avg_current = round( float(input()), 4 )    
-    
-    # Put the power values into the results sheet
-    push_text("\nElectrical Measurements from the System via USB Power Meter:")
-    push_text("\tPeak power: " + str(max_power_draw) + "W")
-    push_text("\tAvg power: " + str(avg_power_draw) + "W")
-    push_text("\tPeak voltage: " + str(max_voltage) + "V")
-    push_text("\tAvg voltage: " + str(avg_voltage) + "V")
-    push_text("\tPeak current: " + str(max_current) + "A")
-    push_text("\tAvg current: " + str(avg_current) + "A")
+    # Per-phase resource summary, every sample goes to SHA-1-samples-rx.json
+    if sampler is not None:
+        push_text("")
+        for line in sampler.summary_lines():
+            push_text(line)
+        sampler.save(samples_json_file_path)
+    
+    # Power readings are typed in from the USB power meter unless --power-source none
+    if(args.power_source == "manual"):
+        # Ask user for input for max and average values from USB power meter
+        print("\n\nPlease enter the HIGHEST power draw during process (Watts):  ", end="")
+        max_power_draw = round( float(input()), 4 )
+        print("Please enter the AVERAGE power draw value during process (Watts):  ", end="")
+        avg_power_draw = round( float(input()), 4 )
+        print("Please enter the HIGHEST voltage value during the process (Volts):  ", end="")
+        max_voltage = round( float(input()), 4 )
+        print("Please enter the AVERAGE voltage value during the process (Volts):  ", end="")
+        avg_voltage = round( float(input()), 4 )
+        print("Please enter the HIGHEST current value during the process (Amps):  ", end="")
+        max_current = round( float(input()), 4 )
+        print("Please enter the AVERAGE current value during the process (Amps):  ", end="")
+        avg_current = round( float(input()), 4 )    
+    
+        # Put the power values into the results sheet
+        push_text("\nElectrical Measurements from the System via USB Power Meter:")
+        push_text("\tPeak power: " + str(max_power_draw) + "W")
+        push_text("\tAvg power: " + str(avg_power_draw) + "W")
+        push_text("\tPeak voltage: " + str(max_voltage) + "V")
+        push_text("\tAvg voltage: " + str(avg_voltage) + "V")
+        push_text("\tPeak current: " + str(max_current) + "A")
+        push_text("\tAvg current: " + str(avg_current) + "A")
+    elif power_monitor is not None:
+        # Telemetry sources were polled during the run, energy is split by phase
+        megabytes = {"received": (payload_bytes / 1e6, ("receive",)),
+                     "verified": (payload_bytes / 1e6, ("read", "hash", "verify")),
+                     "end to end": (payload_bytes / 1e6, PHASES)}
+        for line in power_monitor.summary_lines(megabytes):
+            push_text(line)
+        power_monitor.save(power_json_file_path)
     
     
     # Create the actual file for results, then write the results to it
@@ -14,11 +14,14 @@
 # General python libraries
 import sys
 import re
+import argparse
+import time
+import asyncio
+import contextlib
 
 # Metric calculating libraries
 import platform
 import os
-import datetime
 import psutil
 #from resource import *
 
@@ -27,6 +30,39 @@ import hashlib
 
 # Network connection library
 import socket
+from sha1_protocol import PROTOCOL_PORT, FRAME_MANIFEST, FRAME_CHUNK, FRAME_END, FRAME_ACK, FRAME_REPAIR, FLAG_STREAMED, FLAG_TREE
+from sha1_protocol import FRAME_TYPE_NAMES, send_frame, send_file_frames, send_digest_and_chunk, expect_frame, recv_frame, unpack_indices
+from sha1_protocol import connect_stripes, ASYNC_WRITE_HIGH_WATER, read_frame_async, write_frame_async, expect_frame_async
+from sha1_protocol import write_digest_and_chunk_async, send_file_frames_async
+
+# Negotiated chunk compression
+from sha1_compress import codec_list_spec, offer_compression, offer_compression_async
+
+# Merkle tree manifests
+from sha1_verify import default_worker_count
+from sha1_merkle import hash_leaves, merkle_root
+
+# Binary digest manifests (hashes.bin)
+from sha1_manifest import Manifest
+
+# Binary and memory-mapped input reading
+from sha1_hashing import mapped_file, iter_file_chunks, iter_view_chunks, iter_prefetched_chunks, DEFAULT_PREFETCH_DEPTH
+from sha1_hashing import HASH_ALGORITHMS, new_hash, hash_algorithm_spec
+
+# Persistent per-chunk digest cache
+from sha1_cache import DigestCache, DEFAULT_CACHE_MAX_BYTES
+
+# Background resource sampling, tagged with the phase the script is in
+from sha1_sampler import PHASES, ResourceSampler, DEFAULT_SAMPLE_HZ, set_phase, peak_rss_bytes
+
+# Chrome trace / Perfetto spans, free while tracing is off
+from sha1_trace import span, traced_iter, instant, start_tracing, save_trace
+
+# Power telemetry from sysfs sensors, a serial USB meter log or a replayed log
+from sha1_power import DEFAULT_POWER_HZ, PowerMonitor, power_source_spec, is_telemetry_source, open_power_source
+
+# Per-board settings saved by `sha1_benchmark.py autotune`
+from sha1_profile import BOARD_NAMES, load_board_profile, apply_socket_buffers, resolve_board_name
 
 
 
@@ -47,6 +83,18 @@ send_txt_file_path = os.path.abspath( os.path.join(HOME_DIR, "send.txt") )
 # Path for storing all hashed values into 
 hash_txt_file_path = os.path.abspath( os.path.join(HOME_DIR, "hashes.txt") )
 
+# Path for the binary manifest that is actually sent, hashes.txt is its hex export
+hash_bin_file_path = os.path.abspath( os.path.join(HOME_DIR, "hashes.bin") )
+
+# Path for the resource samples taken with --sample-hz
+samples_json_file_path = os.path.abspath( os.path.join(HOME_DIR, "SHA-1-samples-tx.json") )
+
+# Path for the power readings taken with a telemetry --power-source
+power_json_file_path = os.path.abspath( os.path.join(HOME_DIR, "SHA-1-power-tx.json") )
+
+# Default path for the --trace output
+trace_json_file_path = os.path.abspath( os.path.join(HOME_DIR, "SHA-1-trace-tx.json") )
+
 
 
 #################################
@@ -137,7 +185,8 @@ def write_txt_file(type="results", buffer=[None]) -> None:
             file.write("\r")
         file.close()
     elif(type == "send"):
-        file = open(send_txt_file_path, "a")
+        # Overwritten like hashes.bin, so the chunks always line up with this run's manifest
+        file = open(send_txt_file_path, "w")
         for line in buffer:
             file.write(line)
             file.write("\r")
@@ -146,49 +195,468 @@ def write_txt_file(type="results", buffer=[None]) -> None:
         raise Exception("write_txt_file: type only accepts input of \'hashes\', \'send\', or \'results\'")
 
 
+#################################
+#                               #
+#         REPAIR ROUNDS         #
+#                               #
+#################################
+# ACK/REPAIR exchange after a streamed END frame, shared by the blocking and asyncio senders so
+# both report repairs the same way. The sender reads a frame and hands it to acked(): an ACK ends
+# the transfer, a REPAIR makes round_chunks() yield every (index, hex digest, chunk) to send again,
+# and end_round() prints what the round cost.
+class RepairRounds:
+    def __init__(self, caller: str, read_chunk, sent_digests, bytes_sent: int, tree: bool):
+        self.caller = caller
+        self.read_chunk = read_chunk
+        self.sent_digests = sent_digests
+        self.chunk_count = len(sent_digests)
+        self.bytes_sent = bytes_sent
+        self.tree = tree
+        self.indices = list()
+        self.round_bytes = 0
+        self.repair_bytes = 0
+        self.acked_at = None
+
+    # True once the receiver ACKed, otherwise the REPAIR frame's indices become the next round
+    def acked(self, frame) -> bool:
+        if frame is None:
+            raise Exception(self.caller + ": receiver closed the connection before its ACK")
+        frame_type, _, _, payload = frame
+        instant(FRAME_TYPE_NAMES.get(frame_type, "frame") + " received", "net")
+        if(frame_type == FRAME_ACK):
+            print(str(bytes(payload)))
+            self.acked_at = time.perf_counter_ns()
+            return True
+        if(frame_type != FRAME_REPAIR):
+            raise Exception(self.caller + ": expected ACK or REPAIR but got " + FRAME_TYPE_NAMES[frame_type])
+        self.indices = unpack_indices(payload)
+        for index in self.indices:
+            if(index >= self.chunk_count):
+                raise Exception(self.caller + ": receiver asked for chunk " + str(index) + " of " + str(self.chunk_count))
+        self.round_bytes = 0
+        return False
+
+    # Every chunk of the current round, mapped slices are released once the caller has sent them
+    def round_chunks(self):
+        for index in self.indices:
+            chunk = self.read_chunk(index)
+            yield index, bytes(self.sent_digests[index].hex(), "ascii"), chunk
+            self.round_bytes += len(chunk)
+            if isinstance(chunk, memoryview):
+                chunk.release()
+
+    # A chained receiver without its chunks asks for every one from the first failure on, nothing is saved over resending them
+    def end_round(self) -> None:
+        self.repair_bytes += self.round_bytes
+        indices = self.indices
+        if(not self.tree and len(indices) > 1 and indices == list(range(indices[0], self.chunk_count))):
+            print("Repair: resent chunks " + str(indices[0] + 1) + "-" + str(self.chunk_count) + " (" + str(self.round_bytes)
+                  + " bytes), a chained digest needs every chunk after the first failure so this saves nothing")
+        else:
+            print("Repair: resent " + str(len(indices)) + " of " + str(self.chunk_count) + " chunks (" + str(self.round_bytes)
+                  + " bytes), saved " + str(self.bytes_sent - self.round_bytes) + " bytes compared with a full resend")
+
+    # Total for results.txt, nothing when no round was needed
+    def report(self) -> None:
+        if self.repair_bytes:
+            push_text("Repair rounds resent " + str(self.repair_bytes) + " bytes instead of " + str(self.bytes_sent) + " per full resend")
+
+############################
+
+# Chunk `index` of an open binary file, for repair rounds
+def read_chunk_at(file, index: int, chunk_size: int) -> bytes:
+    file.seek(index * chunk_size)
+    return file.read(chunk_size)
+
+
 #################################
 #                               #
 #     NETWORK FILE TRANSFER     #
 #                               #
 #################################
-# Create the client socket and transfer data using utf-8 encoding
-def transfer_data_to_receiver(server_ip):
-    client_port = 64321
-    RECV_BUFFER = 1024 
+# Payload bytes sent, the rate up to the receiver's last ACK and the peak RSS so far,
+# the same line for the blocking and the asyncio senders so the two can be compared
+def push_send_report(label: str, payload_bytes: int, elapsed_ns: int) -> None:
+    elapsed_sec = elapsed_ns / 1e9
+    push_text(label + ": " + str(payload_bytes) + " payload bytes in " + str(round(elapsed_sec, 6)) + " s ("
+              + str(round(payload_bytes / elapsed_sec / 1e6, 3) if elapsed_sec > 0 else 0.0) + " MB/s up to the last ACK), peak RSS "
+              + str(round(peak_rss_bytes() / 1e6, 2)) + "MB")
+
+############################
+
+# Create the client socket and transfer hashes.bin and send.txt as framed messages
+def transfer_data_to_receiver(server_ip, tree_root=None, profile=None, compress=()):
+    client_port = PROTOCOL_PORT
+    
+    # Tree manifests are flagged and their END frame carries the root instead of the file name
+    manifest_flags = FLAG_TREE if tree_root is not None else 0
+    manifest_end = bytes(tree_root.hex(), "ascii") if tree_root is not None else None
     
     # Open TCP socket to connect to receiver
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as client_socket:
+        # Socket buffer sizes from the board profile have to be set before connecting
+        apply_socket_buffers(client_socket, profile)
+        
         # Connect to TCP welcome port of server
         print(f"Connecting to server at {server_ip}:{client_port} ...")
         client_socket.connect((server_ip, client_port))
         
-        # Set timeout to 10 seconds
+        # Set timeout to 10 seconds, only a dead receiver should ever hit this
         client_socket.settimeout(10.0)
         
-        # Try and send hashes.txt file to server
-        print("Connected, trying to send hashes.txt...")
-        with open(hash_txt_file_path, "rb") as file:
-            data = file.read()
-            file.close()
-        client_socket.sendall(data)
+        # Agree on a codec for the send.txt frames first if --compress offered any
+        codec = offer_compression(client_socket, compress, manifest_flags) if compress else None
         
-        # Wait for an ACK from receiver for the hashes.txt file
-        server_ack = client_socket.recv(RECV_BUFFER)
-        print(str(server_ack))
+        # Send hashes.bin as MANIFEST frames, the END frame tells the receiver the file is done
+        print("Connected, trying to send hashes.bin...")
+        set_phase("send")
+        send_start = time.perf_counter_ns()
+        with span("send hashes.bin", "net"):
+            payload_bytes = send_file_frames(client_socket, hash_bin_file_path, FRAME_MANIFEST, "hashes.bin", flags=manifest_flags, end_payload=manifest_end)
+        
+        # Wait for an ACK from receiver for the manifest
+        set_phase("receive")
+        with span("wait ACK hashes.bin", "net"):
+            _, _, _, server_ack = expect_frame(client_socket, FRAME_ACK)
+        print(str(bytes(server_ack)))
     
-        # Try and send original.txt file to server, then receive server ACK
+        # Send send.txt as CHUNK frames followed by its END frame
         print("Now sending send.txt...")
-        with open(send_txt_file_path, "rb") as file:
-            data = file.read()
-            file.close()
-        client_socket.sendall(data)
+        set_phase("send")
+        with span("send send.txt", "net"):
+            payload_bytes += send_file_frames(client_socket, send_txt_file_path, FRAME_CHUNK, "send.txt", codec=codec)
         
         # Wait for an ACK from receiver for the send.txt file
-        server_ack = client_socket.recv(RECV_BUFFER)
-        print(str(server_ack))
+        set_phase("receive")
+        with span("wait ACK send.txt", "net"):
+            _, _, _, server_ack = expect_frame(client_socket, FRAME_ACK)
+        print(str(bytes(server_ack)))
+        acked_at = time.perf_counter_ns()
         
         # Close the connection
         client_socket.close()
+    
+    push_send_report("Blocking send", payload_bytes, acked_at - send_start)
+    
+    # Compress time and bytes saved, next to the receiver's decompress time in its results
+    if codec is not None:
+        for line in codec.summary_lines():
+            push_text(line)
+
+############################
+
+# Read, hash and send one chunk at a time without staging hashes.txt or send.txt on disk.
+# In tree mode each chunk carries its own leaf digest and the END frame carries the root,
+# which is also what gets returned as the final digest.
+# Chunks listed in corrupt_chunks get one byte flipped on their first send (repair testing only).
+# A prefetch depth above 0 reads ahead on a reader thread while the current chunk is hashed and sent.
+# With streams above 1 chunk i goes out on connection i mod streams (see sha1_protocol.py).
+# Codecs in `compress` are offered to the receiver, chunks are compressed with the one it picks.
+def stream_data_to_receiver(server_ip, input_path, chunk_size, tree=False, corrupt_chunks=(), cache=None, use_mmap=False, profile=None, prefetch=0,
+                            streams=1, compress=()):
+    client_port = PROTOCOL_PORT
+    sha1 = hashlib.sha1()
+    sent_digests = list()
+    flags = FLAG_STREAMED | (FLAG_TREE if tree else 0)
+    chunk_count = 0
+    bytes_sent = 0
+    
+    # Reuse digests from the cache when original.txt has not changed (or only grew, in tree mode)
+    cache_mode = "leaf-binary" if tree else "chain-binary"
+    cache_status, cached_digests = ("miss", list())
+    if cache is not None:
+        cache_status, cached_digests = cache.lookup(input_path, chunk_size, cache_mode)
+        print("Digest cache " + cache_status + ": reusing " + str(len(cached_digests)) + " chunk digests")
+    
+    # Open the TCP socket(s) to the receiver, stream 0 also carries the ACK/REPAIR exchange
+    print(f"Connecting to server at {server_ip}:{client_port} ...")
+    stream_sockets = connect_stripes((server_ip, client_port), streams, flags, setup=lambda sock: apply_socket_buffers(sock, profile), timeout=10.0)
+    stream_bytes = [0] * streams
+    with contextlib.ExitStack() as open_sockets:
+        for stream_socket in stream_sockets:
+            open_sockets.enter_context(stream_socket)
+        client_socket = stream_sockets[0]
+        codec = offer_compression(client_socket, compress, flags) if compress else None
+        send_start = time.perf_counter_ns()
+        
+        # Each chunk goes out as its digest (MANIFEST) and its bytes (CHUNK) under the same index
+        print("Connected" + (" over " + str(streams) + " streams" if streams > 1 else "") + ", streaming " + input_path + "...")
+        with open(input_path, "rb") as file, (mapped_file(input_path) if use_mmap else contextlib.nullcontext()) as view:
+            # --mmap hashes and sends memoryview slices of the mapped file, --prefetch slices of the
+            # reader thread's buffers, otherwise buffered binary reads
+            if use_mmap:
+                chunks = iter_view_chunks(view, chunk_size)
+            elif prefetch:
+                chunks = iter_prefetched_chunks(file, chunk_size, prefetch)
+            else:
+                chunks = iter_file_chunks(file, chunk_size)
+            set_phase("read")
+            for chunk in traced_iter(chunks, "read chunk", "io"):
+                set_phase("hash")
+                with span("sha1.update", "hash"):
+                    if(chunk_count < len(cached_digests)):
+                        raw_digest = cached_digests[chunk_count]
+                    elif tree:
+                        raw_digest = hashlib.sha1(chunk).digest()
+                    else:
+                        sha1.update(chunk)
+                        raw_digest = sha1.digest()
+                sent_digests.append(raw_digest)
+                digest = bytes(raw_digest.hex(), "ascii")
+                set_phase("send")
+                stream = chunk_count % streams
+                with span("send chunk", "net"):
+                    if(chunk_count in corrupt_chunks):
+                        send_digest_and_chunk(stream_sockets[stream], chunk_count, digest, bytes([chunk[0] ^ 0xFF]) + bytes(chunk[1:]), flags=flags, codec=codec)
+                    else:
+                        send_digest_and_chunk(stream_sockets[stream], chunk_count, digest, chunk, flags=flags, codec=codec)
+                stream_bytes[stream] += len(digest) + len(chunk)
+                chunk_count += 1
+                bytes_sent += len(chunk)
+                set_phase("read")
+            
+            # Close the stream, then resend only the chunks the receiver asks for until it ACKs
+            final_digest = merkle_root(sent_digests).hex() if tree else (sent_digests[-1].hex() if sent_digests else sha1.hexdigest())
+            end_payload = bytes(final_digest, "ascii") if tree else b"original.txt"
+            set_phase("send")
+            for stream_socket in stream_sockets:
+                send_frame(stream_socket, FRAME_END, end_payload, index=chunk_count, flags=flags)
+            read_chunk = (lambda index: view[index * chunk_size:(index + 1) * chunk_size]) if use_mmap else (lambda index: read_chunk_at(file, index, chunk_size))
+            repairs = RepairRounds("stream_data_to_receiver", read_chunk, sent_digests, bytes_sent, tree)
+            while True:
+                set_phase("receive")
+                with span("wait ACK/REPAIR", "net"):
+                    frame = recv_frame(client_socket)
+                if repairs.acked(frame):
+                    break
+                set_phase("send")
+                with span("repair round", "net", {"chunks": len(repairs.indices)}):
+                    for index, digest, chunk in repairs.round_chunks():
+                        send_digest_and_chunk(client_socket, index, digest, chunk, flags=flags, codec=codec)
+                    send_frame(client_socket, FRAME_END, end_payload, index=chunk_count, flags=flags)
+                repairs.end_round()
+            acked_at = repairs.acked_at
+        
+    # Per-stream share of the payload and the aggregate rate up to the receiver's ACK
+    if(streams > 1):
+        elapsed_sec = (acked_at - send_start) / 1e9
+        push_text("Striped over " + str(streams) + " streams: " + str(sum(stream_bytes)) + " bytes in " + str(round(elapsed_sec, 6))
+                  + " s (" + str(round(sum(stream_bytes) / elapsed_sec / 1e6, 3) if elapsed_sec > 0 else 0.0) + " MB/s aggregate up to the ACK)")
+        for stream in range(streams):
+            push_text("\tstream " + str(stream) + ": " + str(stream_bytes[stream]) + " bytes")
+    
+    push_send_report("Blocking send", bytes_sent + repairs.repair_bytes, acked_at - send_start)
+    if codec is not None:
+        for line in codec.summary_lines():
+            push_text(line)
+    repairs.report()
+    if(cache is not None and cache_status != "hit"):
+        cache.store(input_path, chunk_size, cache_mode, sent_digests)
+    return chunk_count, bytes_sent, final_digest
+
+
+
+#################################
+#                               #
+#    ASYNCIO NETWORK TRANSFER   #
+#                               #
+#################################
+# Connect to the receiver as an asyncio stream pair, writes wait once ASYNC_WRITE_HIGH_WATER bytes are queued
+async def open_receiver_connection(server_ip, profile=None) -> tuple:
+    client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        apply_socket_buffers(client_socket, profile)
+        client_socket.setblocking(False)
+        print(f"Connecting to server at {server_ip}:{PROTOCOL_PORT} ...")
+        await asyncio.wait_for(asyncio.get_running_loop().sock_connect(client_socket, (server_ip, PROTOCOL_PORT)), 10.0)
+        reader, writer = await asyncio.open_connection(sock=client_socket)
+    except BaseException:
+        client_socket.close()
+        raise
+    writer.transport.set_write_buffer_limits(high=ASYNC_WRITE_HIGH_WATER)
+    return reader, writer
+
+############################
+
+# asyncio transfer_data_to_receiver: hashes.bin and send.txt go out through sendfile(), so the kernel
+# copies them from the page cache and no file contents pass through Python. The manifest's ACK is
+# read by its own task while send.txt is already being sent instead of stalling the link for a round trip.
+async def transfer_data_async(server_ip, tree_root=None, profile=None, compress=()):
+    manifest_flags = FLAG_TREE if tree_root is not None else 0
+    manifest_end = bytes(tree_root.hex(), "ascii") if tree_root is not None else None
+    
+    reader, writer = await open_receiver_connection(server_ip, profile)
+    try:
+        codec = await offer_compression_async(reader, writer, compress, manifest_flags, 10.0) if compress else None
+        
+        # Send hashes.bin, then start waiting for its ACK without stopping
+        print("Connected, sending hashes.bin and send.txt with sendfile()...")
+        set_phase("send")
+        send_start = time.perf_counter_ns()
+        with span("send hashes.bin", "net"):
+            payload_bytes = await send_file_frames_async(writer, hash_bin_file_path, FRAME_MANIFEST, "hashes.bin", flags=manifest_flags,
+                                                         end_payload=manifest_end)
+        manifest_ack = asyncio.create_task(expect_frame_async(reader, FRAME_ACK, 10.0))
+        with span("send send.txt", "net"):
+            payload_bytes += await send_file_frames_async(writer, send_txt_file_path, FRAME_CHUNK, "send.txt", codec=codec)
+        ack_overlapped = manifest_ack.done()
+        
+        # Both ACKs, the manifest's has usually arrived long before send.txt was out
+        set_phase("receive")
+        with span("wait ACKs", "net"):
+            _, _, _, server_ack = await manifest_ack
+            print(str(bytes(server_ack)))
+            _, _, _, server_ack = await expect_frame_async(reader, FRAME_ACK, 10.0)
+            print(str(bytes(server_ack)))
+        acked_at = time.perf_counter_ns()
+    finally:
+        writer.close()
+        await writer.wait_closed()
+    
+    push_send_report("asyncio sendfile send", payload_bytes, acked_at - send_start)
+    push_text("\thashes.bin ACK " + ("arrived while send.txt was still being sent" if ack_overlapped else "arrived after send.txt was out"))
+    if codec is not None:
+        for line in codec.summary_lines():
+            push_text(line)
+
+############################
+
+# asyncio stream_data_to_receiver. Every digest + chunk pair is queued on the transport and the
+# loop only waits when the socket falls behind by more than ASYNC_WRITE_HIGH_WATER bytes, so
+# memory stays bounded however fast chunks are read and hashed. Supports --tree, --compress and
+# --corrupt-chunks (with REPAIR rounds), the binary read path only.
+async def stream_data_async(server_ip, input_path, chunk_size, tree=False, corrupt_chunks=(), profile=None, compress=()):
+    sha1 = hashlib.sha1()
+    sent_digests = list()
+    flags = FLAG_STREAMED | (FLAG_TREE if tree else 0)
+    chunk_count = 0
+    bytes_sent = 0
+    
+    reader, writer = await open_receiver_connection(server_ip, profile)
+    try:
+        codec = await offer_compression_async(reader, writer, compress, flags, 10.0) if compress else None
+        print("Connected, streaming " + input_path + " on the event loop...")
+        send_start = time.perf_counter_ns()
+        with open(input_path, "rb") as file:
+            set_phase("read")
+            for chunk in traced_iter(iter_file_chunks(file, chunk_size), "read chunk", "io"):
+                set_phase("hash")
+                with span("sha1.update", "hash"):
+                    if tree:
+                        raw_digest = hashlib.sha1(chunk).digest()
+                    else:
+                        sha1.update(chunk)
+                        raw_digest = sha1.digest()
+                sent_digests.append(raw_digest)
+                set_phase("send")
+                if(chunk_count in corrupt_chunks):
+                    chunk = bytes([chunk[0] ^ 0xFF]) + bytes(chunk[1:])
+                with span("send chunk", "net"):
+                    await write_digest_and_chunk_async(writer, chunk_count, bytes(raw_digest.hex(), "ascii"), chunk, flags=flags, codec=codec)
+                chunk_count += 1
+                bytes_sent += len(chunk)
+                set_phase("read")
+            
+            # Close the stream, then resend only the chunks the receiver asks for until it ACKs
+            final_digest = merkle_root(sent_digests).hex() if tree else (sent_digests[-1].hex() if sent_digests else sha1.hexdigest())
+            end_payload = bytes(final_digest, "ascii") if tree else b"original.txt"
+            set_phase("send")
+            await write_frame_async(writer, FRAME_END, end_payload, index=chunk_count, flags=flags)
+            repairs = RepairRounds("stream_data_async", lambda index: read_chunk_at(file, index, chunk_size), sent_digests, bytes_sent, tree)
+            while True:
+                set_phase("receive")
+                with span("wait ACK/REPAIR", "net"):
+                    frame = await read_frame_async(reader, 10.0)
+                if repairs.acked(frame):
+                    break
+                set_phase("send")
+                with span("repair round", "net", {"chunks": len(repairs.indices)}):
+                    for index, digest, chunk in repairs.round_chunks():
+                        await write_digest_and_chunk_async(writer, index, digest, chunk, flags=flags, codec=codec)
+                    await write_frame_async(writer, FRAME_END, end_payload, index=chunk_count, flags=flags)
+                repairs.end_round()
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+    push_send_report("asyncio send", bytes_sent + repairs.repair_bytes, repairs.acked_at - send_start)
+    if codec is not None:
+        for line in codec.summary_lines():
+            push_text(line)
+    repairs.report()
+    return chunk_count, bytes_sent, final_digest
+
+
+
+#################################
+#                               #
+#     COMMAND LINE ARGUMENTS    #
+#                               #
+#################################
+def parse_args():
+    parser = argparse.ArgumentParser(description="SHA-1 transmitter: hash original.txt and send it to the receiver")
+    parser.add_argument("--stream", action="store_true",
+                        help="hash and send each chunk as it is read instead of staging hashes.txt and send.txt")
+    parser.add_argument("--mmap", action="store_true",
+                        help="with --stream, memory-map original.txt and hash/send memoryview slices with no copies")
+    parser.add_argument("--prefetch", type=int, nargs="?", const=DEFAULT_PREFETCH_DEPTH, default=0,
+                        help="with --stream, read original.txt ahead on a reader thread into a ring of this many buffers (default when given: "
+                             + str(DEFAULT_PREFETCH_DEPTH) + ") so reads overlap hashing")
+    parser.add_argument("--streams", type=int, default=1,
+                        help="with --stream, stripe chunks over this many parallel TCP connections (chunk i on connection i mod N)")
+    parser.add_argument("--compress", type=codec_list_spec, default=list(),
+                        help="offer the receiver these chunk codecs in order of preference, e.g. zlib:6,lzma or bz2:9 (zlib, bz2, lzma; "
+                             "level after the colon). The receiver picks one or none")
+    parser.add_argument("--asyncio", action="store_true",
+                        help="send on an asyncio event loop: staged files through sendfile() with the manifest ACK read alongside, "
+                             "--stream chunks with write backpressure instead of blocking sends")
+    parser.add_argument("--tree", action="store_true",
+                        help="send a Merkle tree manifest (independent leaf digests + root) instead of running digests")
+    parser.add_argument("--algorithm", type=hash_algorithm_spec, default="sha1",
+                        help="hashlib algorithm for the staged manifest (" + ", ".join(HASH_ALGORITHMS) + "), recorded in hashes.bin "
+                             "so the receiver verifies with the same one (default: sha1)")
+    parser.add_argument("--corrupt-chunks", type=lambda text: {int(i) for i in text.split(",") if i}, default=set(),
+                        help="testing only: comma separated chunk indices to corrupt on their first --stream send")
+    parser.add_argument("--cache", action="store_true",
+                        help="reuse per-chunk digests from sha1-digest-cache.sqlite3 when original.txt is unchanged or only grew")
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_CACHE_MAX_BYTES // (1024 * 1024),
+                        help="size bound for the digest cache, least recently used entries are evicted first")
+    parser.add_argument("--workers", type=int, default=default_worker_count(),
+                        help="number of hashing workers for --tree leaf digests (default: usable cores on this board)")
+    parser.add_argument("--peer", default=None,
+                        help="receiver IP address, skips the IP prompt")
+    parser.add_argument("--board", default=None,
+                        help="board name or menu number (" + ", ".join(key + "=" + name for key, name in BOARD_NAMES.items()) + "), skips the device prompt")
+    parser.add_argument("--power-source", type=power_source_spec, default="manual",
+                        help="where power readings come from: manual (typed in from the USB meter), none, hwmon[:NAME], ina3221[:RAIL], "
+                             "power-supply[:NAME], serial:PATH[@BAUD] or replay:FILE.csv")
+    parser.add_argument("--power-hz", type=float, default=DEFAULT_POWER_HZ,
+                        help="polling rate for telemetry power sources")
+    parser.add_argument("--sample-hz", type=float, nargs="?", const=DEFAULT_SAMPLE_HZ, default=0.0,
+                        help="record CPU, frequency, memory and temperature samples at this rate (default when given: "
+                             + str(DEFAULT_SAMPLE_HZ) + " Hz) into SHA-1-samples-tx.json")
+    parser.add_argument("--trace", nargs="?", const=trace_json_file_path, default=None,
+                        help="record read/hash/write/send spans as Chrome trace JSON (default path: SHA-1-trace-tx.json)")
+    parser.add_argument("--no-profile", action="store_true",
+                        help="ignore the chunk size and socket buffers saved by `sha1_benchmark.py autotune` for this board")
+    args = parser.parse_args()
+    if(args.mmap and not args.stream):
+        parser.error("--mmap is a binary path and needs --stream, the staged send.txt format is text only")
+    if(args.prefetch and not args.stream):
+        parser.error("--prefetch is a binary path and needs --stream, the staged send.txt format is text only")
+    if(args.prefetch and args.mmap):
+        parser.error("--prefetch and --mmap are two different read paths, pick one")
+    if(args.streams < 1):
+        parser.error("--streams needs at least 1 connection")
+    if(args.streams > 1 and not args.stream):
+        parser.error("--streams stripes streamed chunks by index and needs --stream")
+    if(args.asyncio and args.stream and (args.mmap or args.prefetch or args.streams > 1 or args.cache)):
+        parser.error("--asyncio --stream reads with plain binary reads on one connection, drop --mmap, --prefetch, --streams and --cache")
+    if(args.algorithm != "sha1" and (args.stream or args.tree or args.cache)):
+        parser.error("--algorithm " + args.algorithm + " is for staged transfers, streamed digests, Merkle trees and the digest cache are SHA-1 only")
+    if(args.prefetch == 1 or args.prefetch < 0):
+        parser.error("--prefetch needs at least 2 buffers to overlap reads with hashing")
+    return args
 
 
 
@@ -198,31 +666,41 @@ def transfer_data_to_receiver(server_ip):
 #                               #
 #################################
 def main():
+    # Read command line options before anything is timed
+    args = parse_args()
+    
     # Start the elapsed time timer
-    elapsed_time_start = datetime.datetime.now()
-    
-    # Get name of embedded device user is running on
-    print("Please enter which platform you are running this on:")
-    print("\t(1) Raspberry Pi 3B+")
-    print("\t(2) Raspberry Pi 4B")
-    print("\t(3) Jetson Nano 4GB")
-    print("device: ", end="")
-    device_name = int(input())   
-    
-    # Define which device will be used
-    if(device_name == 1):
-        hw_name = "Raspberry Pi 3B+"
-    elif(device_name == 2):
-        hw_name = "Raspberry Pi 4B"
-    elif(device_name == 3):
-        hw_name = "Jetson Nano 4GB"
+    elapsed_time_start = time.perf_counter_ns()
+    
+    # Board name from the command line, otherwise ask for it
+    if args.board:
+        hw_name = resolve_board_name(args.board)
     else:
-        raise Exception("You need to enter either 1, 2, or 3... run the program again")
-        sys.exit(0)
+        # Get name of embedded device user is running on
+        print("Please enter which platform you are running this on:")
+        print("\t(1) Raspberry Pi 3B+")
+        print("\t(2) Raspberry Pi 4B")
+        print("\t(3) Jetson Nano 4GB")
+        print("device: ", end="")
+        device_name = int(input())   
+    
+        # Define which device will be used
+        if(device_name == 1):
+            hw_name = "Raspberry Pi 3B+"
+        elif(device_name == 2):
+            hw_name = "Raspberry Pi 4B"
+        elif(device_name == 3):
+            hw_name = "Jetson Nano 4GB"
+        else:
+            raise Exception("You need to enter either 1, 2, or 3... run the program again")
+            sys.exit(0)
         
-    # Get IP information for this device
-    print("\nDevice IP = ", end="")
-    server_ip = input()
+    # Get IP information for this device, unless it was given on the command line
+    if args.peer:
+        server_ip = args.peer
+    else:
+        print("\nDevice IP = ", end="")
+        server_ip = input()
     reg_ex = r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$"
     if not re.match(reg_ex, server_ip):
         raise Exception("Illegal IP address... please retry")
@@ -255,57 +733,163 @@ def main():
     push_text("\tPython Version: " + sw_info_list[2])
     
     
-    # Get execution time of hash verfication
-    program_start = datetime.datetime.now()    
-    
-    
-    # Get original.txt file and then hash it with SHA-1 and store its hashed value to .txt file
-    print("\nHashing:")
-    CHUNK_SIZE = 4096
-    sha1 = hashlib.sha1()
-    ascii_chunk_list = list()
-    with open(original_txt_file_path, 'r') as file:
-        while True:
-            chunk = file.read(CHUNK_SIZE)
-            ascii_chunk_list.append(chunk)
-            if chunk:
-                sha1.update( bytes(chunk, "ascii") ) 
-                push_text(str(sha1.hexdigest()), type="hashes")
-            else:
-                break
+    # Start the resource sampler before the timed section
+    sampler = ResourceSampler(args.sample_hz) if args.sample_hz > 0 else None
+    if sampler is not None:
+        sampler.start()
     
-    # Write out all hashed values to the console
-    for i in range(len(text_to_push_list_hashes)):
-        print("Hashed value " + str(i+1) + ": 0x" + str(sha1.hexdigest()))
+    # Poll the power sensor alongside it when --power-source names one
+    power_monitor = PowerMonitor(open_power_source(args.power_source), args.power_hz) if is_telemetry_source(args.power_source) else None
+    if power_monitor is not None:
+        power_monitor.start()
     
-    # Create the actual file for the hashes
-    create_txt_file(type="hashes")
-    write_txt_file(type="hashes")
+    # Trace spans cover the timed section only
+    if args.trace:
+        start_tracing("SHA-1 transmitter (" + hw_name + ")")
     
-    # Store associated text chunks to another file --> send.txt
-    create_txt_file(type="send")
-    write_txt_file(type="send", buffer=ascii_chunk_list)
-    
-    # Send the data over the network to the receiver
-    transfer_data_to_receiver(server_ip)
+    # Get execution time of hash verfication
+    program_start = time.perf_counter_ns()    
+    
+    
+    # Open the digest cache if asked for
+    cache = DigestCache(max_bytes=args.cache_max_mb * 1024 * 1024) if args.cache else None
+    
+    # Chunk size and socket buffers come from this board's autotune profile when there is one
+    profile = None if args.no_profile else load_board_profile(args.board)
+    CHUNK_SIZE = profile.get("chunk_size", 4096) if profile else 4096
+    if profile:
+        print("Using autotune profile: chunk size " + str(CHUNK_SIZE) + ", socket buffer " + str(profile.get("socket_buffer", 0) or "default"))
+    
+    # Streaming mode: constant memory, nothing written to disk before it is sent
+    if(args.stream and args.asyncio):
+        print("\nHashing and streaming on the event loop:")
+        chunk_count, bytes_sent, final_digest = asyncio.run(stream_data_async(server_ip, original_txt_file_path, CHUNK_SIZE, tree=args.tree,
+                                                                              corrupt_chunks=args.corrupt_chunks, profile=profile,
+                                                                              compress=args.compress))
+        print("Streamed " + str(chunk_count) + " chunks (" + str(bytes_sent) + " bytes)")
+        print("Final hashed value: 0x" + final_digest)
+    elif args.stream:
+        print("\nHashing and streaming:")
+        chunk_count, bytes_sent, final_digest = stream_data_to_receiver(server_ip, original_txt_file_path, CHUNK_SIZE, tree=args.tree,
+                                                                        corrupt_chunks=args.corrupt_chunks, cache=cache, use_mmap=args.mmap,
+                                                                        profile=profile, prefetch=args.prefetch, streams=args.streams,
+                                                                        compress=args.compress)
+        print("Streamed " + str(chunk_count) + " chunks (" + str(bytes_sent) + " bytes)")
+        print("Final hashed value: 0x" + final_digest)
+    else:
+        # Persistent digest cache (opt-in), keyed by file identity, chunk size and digest mode
+        cache_mode = "leaf-text" if args.tree else "chain-text"
+        cache_status, cached_digests = ("miss", list())
+        if cache is not None:
+            cache_status, cached_digests = cache.lookup(original_txt_file_path, CHUNK_SIZE, cache_mode)
+        
+        # Get original.txt file and then hash it with SHA-1 (or --algorithm) and store its raw digests in the manifest
+        print("\nHashing:")
+        sha1 = new_hash(args.algorithm)
+        update_span = args.algorithm + ".update"
+        ascii_chunk_list = list()
+        manifest = Manifest(algorithm=args.algorithm, chunk_size=CHUNK_SIZE, tree=args.tree)
+        with open(original_txt_file_path, 'r') as file:
+            while True:
+                set_phase("read")
+                with span("read chunk", "io"):
+                    chunk = file.read(CHUNK_SIZE)
+                ascii_chunk_list.append(chunk)
+                if not chunk:
+                    break
+                elif args.tree:
+                    continue
+                elif(cache_status == "hit" and len(manifest) < len(cached_digests)):
+                    manifest.digests.append(cached_digests[len(manifest)])
+                else:
+                    set_phase("hash")
+                    with span(update_span, "hash"):
+                        sha1.update( bytes(chunk, "ascii") ) 
+                    with span("digest", "hash"):
+                        manifest.digests.append(sha1.digest())
+        
+        set_phase("hash")
+        if args.tree:
+            # Tree mode: hash every leaf on its own across all cores, then fold them into a root.
+            # Leaves from the cache are reused, lookup() already checked an appended file's old chunks.
+            chunk_bytes = [bytes(chunk, "ascii") for chunk in ascii_chunk_list if chunk]
+            reused_leaves = cached_digests
+            if(len(reused_leaves) > len(chunk_bytes)):
+                reused_leaves = list()
+            tree_start = time.perf_counter()
+            with span("hash leaves", "hash", {"leaves": len(chunk_bytes) - len(reused_leaves), "workers": args.workers}):
+                leaves = reused_leaves + hash_leaves(chunk_bytes[len(reused_leaves):], workers=args.workers)
+            with span("merkle root", "hash"):
+                tree_root = merkle_root(leaves)
+            tree_sec = time.perf_counter() - tree_start
+            for leaf in leaves:
+                manifest.digests.append(leaf)
+            
+            # Classic whole-file SHA-1 of the same bytes, kept for comparison
+            classic_start = time.perf_counter()
+            for chunk in chunk_bytes:
+                sha1.update(chunk)
+            classic_sec = time.perf_counter() - classic_start
+            
+            for i in range(len(manifest)):
+                print("Leaf value " + str(i+1) + ": 0x" + manifest.hex(i))
+            push_text("Merkle root: 0x" + tree_root.hex() + " (" + str(len(leaves)) + " leaves on " + str(args.workers) + " workers in " + str(round(tree_sec, 6)) + " seconds)")
+            push_text("Whole-file SHA-1: 0x" + sha1.hexdigest() + " (serial in " + str(round(classic_sec, 6)) + " seconds)")
+            cache_digests = leaves
+            cache_reused = len(reused_leaves)
+        else:
+            # Write out all hashed values to the console
+            tree_root = None
+            for i in range(len(manifest)):
+                print("Hashed value " + str(i+1) + ": 0x" + manifest.hex(i))
+            cache_digests = list(manifest.digests)
+            cache_reused = len(cached_digests) if cache_status == "hit" else 0
+        
+        # Remember the digests for next time
+        if cache is not None:
+            push_text("Digest cache " + cache_status + ": reused " + str(cache_reused) + " of " + str(len(cache_digests)) + " chunk digests")
+            if(cache_status != "hit"):
+                cache.store(original_txt_file_path, CHUNK_SIZE, cache_mode, cache_digests)
+        
+        # Create the binary manifest that gets sent, plus hashes.txt as its hex export
+        set_phase("write")
+        push_text("Manifest: " + manifest.summary())
+        with span("write hashes.bin", "io"):
+            manifest.save(hash_bin_file_path)
+            manifest.write_hex(hash_txt_file_path)
+        
+        # Store associated text chunks to another file --> send.txt
+        with span("write send.txt", "io"):
+            create_txt_file(type="send")
+            write_txt_file(type="send", buffer=ascii_chunk_list)
+        
+        # Send the data over the network to the receiver
+        if args.asyncio:
+            asyncio.run(transfer_data_async(server_ip, tree_root=tree_root, profile=profile, compress=args.compress))
+        else:
+            transfer_data_to_receiver(server_ip, tree_root=tree_root, profile=profile, compress=args.compress)
+    
+    if cache is not None:
+        cache.close()
 
     
     # End execution time tracking
-    program_end = datetime.datetime.now()
-    elapsed_time_end = datetime.datetime.now()
+    program_end = time.perf_counter_ns()
+    elapsed_time_end = time.perf_counter_ns()
+    set_phase("idle")
+    if sampler is not None:
+        sampler.stop()
+    if args.trace:
+        print("Trace: " + str(save_trace(args.trace)) + " events written to " + args.trace)
+    if power_monitor is not None:
+        power_monitor.stop()
     
     # split up sections in console
     push_text("\n")
     
-    # Calculate the execution time
-    execution_time = program_end - program_start
-    h,m,s = str(execution_time).split(":")
-    execution_time_sec = round(int(h)*3600 + int(m)*60 + float(s), 8)
-    
-    # Calculate the elapsed time
-    elapsed_time = elapsed_time_end - elapsed_time_start
-    h,m,s = str(elapsed_time).split(":")
-    elapsed_time_sec = round(int(h)*3600 + int(m)*60 + float(s), 8)
+    # Calculate the execution and elapsed time from the nanosecond counters
+    execution_time_sec = round((program_end - program_start) / 1e9, 8)
+    elapsed_time_sec = round((elapsed_time_end - elapsed_time_start) / 1e9, 8)
     
     # Get average CPU usage over last 1,5,15 minutes
     # load_1min, load_5min, load_15min = os.getloadavg()
@@ -325,28 +909,46 @@ def main():
     # push_text("\t5 minute after execution = " + str(cpu_usage_5min) + "%")
     # push_text("\t15 minute after execution = " + str(cpu_usage_15min) + "%")       
     
-    # Ask user for input for max and average values from USB power meter
-    print("\n\nPlease enter the HIGHEST power draw during process (Watts):  ", end="")
-    max_power_draw = round( float(input()), 4 )
-    print("Please enter the AVERAGE power draw value during process (Watts):  ", end="")
-    avg_power_draw = round( float(input()), 4 )
-    print("Please enter the HIGHEST voltage value during the process (Volts):  ", end="")
-    max_voltage = round( float(input()), 4 )
-    print("Please enter the AVERAGE voltage value during the process (Volts):  ", end="")
-    avg_voltage = round( float(input()), 4 )
-    print("Please enter the HIGHEST current value during the process (Amps):  ", end="")
-    max_current = round( float(input()), 4 )
-    print("Please enter the AVERAGE current value during the process (Amps):  ", end="")
-    avg_current = round( float(input()), 4 )    
-    
-    # Put the power values into the results sheet
-    push_text("\nElectrical Measurements from the System via USB Power Meter:")
-    push_text("\tPeak power: " + str(max_power_draw) + "W")
-    push_text("\tAvg power: " + str(avg_power_draw) + "W")
-    push_text("\tPeak voltage: " + str(max_voltage) + "V")
-    push_text("\tAvg voltage: " + str(avg_voltage) + "V")
-    push_text("\tPeak current: " + str(max_current) + "A")
-    push_text("\tAvg current: " + str(avg_current) + "A")
+    # Per-phase resource summary, every sample goes to SHA-1-samples-tx.json
+    if sampler is not None:
+        push_text("")
+        for line in sampler.summary_lines():
+            push_text(line)
+        sampler.save(samples_json_file_path)
+    
+    # Power readings are typed in from the USB power meter unless --power-source none
+    if(args.power_source == "manual"):
+        # Ask user for input for max and average values from USB power meter
+        print("\n\nPlease enter the HIGHEST power draw during process (Watts):  ", end="")
+        max_power_draw = round( float(input()), 4 )
+        print("Please enter the AVERAGE power draw value during process (Watts):  ", end="")
+        avg_power_draw = round( float(input()), 4 )
+        print("Please enter the HIGHEST voltage value during the process (Volts):  ", end="")
+        max_voltage = round( float(input()), 4 )
+        print("Please enter the AVERAGE voltage value during the process (Volts):  ", end="")
+        avg_voltage = round( float(input()), 4 )
+        print("Please enter the HIGHEST current value during the process (Amps):  ", end="")
+        max_current = round( float(input()), 4 )
+        print("Please enter the AVERAGE current value during the process (Amps):  ", end="")
+        avg_current = round( float(input()), 4 )    
+    
+        # Put the power values into the results sheet
+        push_text("\nElectrical Measurements from the System via USB Power Meter:")
+        push_text("\tPeak power: " + str(max_power_draw) + "W")
+        push_text("\tAvg power: " + str(avg_power_draw) + "W")
+        push_text("\tPeak voltage: " + str(max_voltage) + "V")
+        push_text("\tAvg voltage: " + str(avg_voltage) + "V")
+        push_text("\tPeak current: " + str(max_current) + "A")
+        push_text("\tAvg current: " + str(avg_current) + "A")
+    elif power_monitor is not None:
+        # Telemetry sources were polled during the run, energy is split by phase
+        input_bytes = os.path.getsize(original_txt_file_path)
+        megabytes = {"hashed": (input_bytes / 1e6, ("read", "hash")),
+                     "transferred": (input_bytes / 1e6, ("send", "receive")),
+                     "end to end": (input_bytes / 1e6, PHASES)}
+        for line in power_monitor.summary_lines(megabytes):
+            push_text(line)
+        power_monitor.save(power_json_file_path)
     
     
     # Create the actual file for results, then write the results to it
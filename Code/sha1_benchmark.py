@@ -0,0 +1,1184 @@
+####################################################################################
+###                                                                              ###
+###               ECE 4300 - Computer Architecture Spring 2022                   ###
+###   Term Project: SHA-1 Algorithm Performance on Multiple Embedded Platforms   ###
+###                                                                              ###
+###                              Benchmark Runner                                ###
+###                                                                              ###
+###            By: Derek Mata, Christopher Yamada, Elizabeth Hwang               ###
+###                                                                              ###
+####################################################################################
+
+# Usage:
+#   python3 sha1_benchmark.py corpus ascii:64M binary:1G:7 small-files:256M [--verify]
+#   python3 sha1_benchmark.py hash-paths [--input original.txt | --corpus ascii:64M] [--chunk-size 4096] [--repeat 5]
+#   python3 sha1_benchmark.py prefetch [--input FILE | --size-mb 64 | --corpus binary:64M] [--depths 2,4,8] [--chunk-size 65536] [--warm]
+#   python3 sha1_benchmark.py autotune [--input FILE | --size-mb 16 | --corpus binary:16M] [--repeat 3] [--board NAME] [--no-save]
+#   python3 sha1_benchmark.py harness --workload hash-read|hash-mmap|hash-prefetch|hash-text|loopback|stream [--corpus ascii:64M] [--board 2] [--peer IP]
+#                                     [--power-source none] [--warmup 3] [--runs 30] [--output results.json]
+#   python3 sha1_benchmark.py algorithms [--algorithms sha1,sha256,blake2s] [--corpus ascii:64M] [--path read] [--power-source hwmon]
+#   python3 sha1_benchmark.py numpy-sha1 [--sizes 64,1024,4096] [--messages 256,4096] [--validate 1000]
+#   python3 sha1_benchmark.py e2e [--input FILE | --size-mb 64 | --corpus ascii:64M] [--runs 3] [--rx-args="--verify-on-receive"] [--tx-args="--stream --streams 2"]
+#   python3 sha1_benchmark.py trace-merge SHA-1-trace-tx.json SHA-1-trace-rx.json [--output SHA-1-trace.json]
+
+# General python libraries
+import os
+import re
+import sys
+import json
+import math
+import time
+import argparse
+import importlib
+import compileall
+import platform
+import statistics
+import socket
+import ssl
+import resource
+import random
+import shlex
+import shutil
+import tempfile
+import subprocess
+import threading
+
+# Hashing library
+import hashlib
+
+# Hashing paths under test
+from sha1_hashing import HASH_PATHS, DEFAULT_PREFETCH_DEPTH, iter_file_chunks, hash_binary_read, hash_prefetched
+from sha1_hashing import HASH_ALGORITHMS, new_hash, hash_algorithm_spec
+
+# Framed protocol and verify-on-receive, driven over loopback by the autotuner
+from sha1_protocol import PROTOCOL_PORT, FRAME_CHUNK, FRAME_END, FRAME_ACK, FRAME_STRIPE, FLAG_STREAMED, BufferedSocketReader
+from sha1_protocol import send_frame, send_digest_and_chunk, recv_frame, expect_frame, connect_stripes, accept_stripes, StripedReceiver
+from sha1_verify import RunningVerifier
+
+# Seeded synthetic inputs, cached on disk
+from sha1_corpus import CORPUS_PROFILES, corpus_spec, corpus_name, ensure_corpus, hash_corpus, shake_bytes
+
+# Packed chunk store
+from sha1_chunkstore import ChunkStoreWriter, ChunkStore
+
+# Per-board settings the autotuner writes
+from sha1_profile import DEFAULT_PROFILE_PATH, detect_board, board_name, save_board_profile
+from sha1_profile import load_board_profile, apply_socket_buffers
+
+# Phase tagging and power telemetry for energy per MB
+from sha1_sampler import set_phase, ResourceSampler
+from sha1_trace import merge_traces
+from sha1_power import DEFAULT_POWER_HZ, PowerMonitor, power_source_spec, is_telemetry_source, open_power_source
+
+
+
+# Default input, the same file the transmitter hashes
+HOME_DIR = os.path.dirname(__file__)
+original_txt_file_path = os.path.abspath( os.path.join(HOME_DIR, "original.txt") )
+
+# Autotune sweep, a socket buffer of 0 leaves the kernel default in place
+AUTOTUNE_CHUNK_SIZES = (1024, 4096, 16384, 65536, 262144)
+AUTOTUNE_RECV_BUFFERS = (1024, 4096, 16384, 65536, 262144)
+AUTOTUNE_SOCKET_BUFFERS = (0, 65536, 262144, 1048576)
+
+# Merged transmitter + receiver trace
+merged_trace_json_file_path = os.path.abspath(os.path.join(HOME_DIR, "SHA-1-trace.json"))
+
+# Where harness results go when --output is not given
+harness_results_dir = os.path.abspath(os.path.join(HOME_DIR, "benchmark-results"))
+
+# Input the algorithm matrix hashes when neither --input nor --corpus is given
+DEFAULT_ALGORITHM_CORPUS = "ascii:64M"
+
+# Clock sampling rate while the algorithm matrix runs
+ALGORITHM_SAMPLE_HZ = 20.0
+
+# Kernel TCP socket tables, a listening socket has state 0A
+PROC_NET_TCP_TABLES = ("/proc/net/tcp", "/proc/net/tcp6")
+TCP_LISTEN_STATE = "0A"
+
+# Receiver result lines that carry the verification summary, and the counts in them
+VERIFY_SUMMARY_PREFIXES = ("Hash verification: ", "Verify-on-receive: ")
+VERIFY_SUMMARY_COUNTS = re.compile(r"(\d+)/(\d+) chunks matched, (\d+) mismatched")
+
+
+
+#################################
+#                               #
+#       SYNTHETIC CORPORA       #
+#                               #
+#################################
+# --corpus PROFILE:SIZE[:SEED] stands in for --input, generated on first use and read from corpus-cache/ after
+def resolve_corpus_input(args) -> None:
+    args.corpus_info = None
+    if args.corpus is None:
+        return
+    profile, size, seed = args.corpus
+    if(profile == "small-files"):
+        raise Exception("resolve_corpus_input: small-files is a directory of files, time it with `sha1_benchmark.py corpus small-files:SIZE --verify`")
+    args.input, args.corpus_info, generated = ensure_corpus(profile, size, seed)
+    print("Corpus " + corpus_name(profile, size, seed) + (" generated in " + str(args.corpus_info["generate_sec"]) + " s" if generated else " from cache")
+          + ": " + args.input + " (SHA-1 " + args.corpus_info["sha1"] + ")")
+
+############################
+
+# Generate (or find) each corpus and print its SHA-1, the number to compare across boards.
+# --verify reads it back off the disk, checks the SHA-1 and reports MB/s and files/s.
+def run_corpus(args) -> None:
+    for profile, size, seed in args.corpora:
+        corpus_path, info, generated = ensure_corpus(profile, size, seed)
+        print(corpus_name(profile, size, seed) + ": " + str(info["size"]) + " bytes in " + str(info["files"]) + " file(s), SHA-1 " + info["sha1"]
+              + (", generated in " + str(info["generate_sec"]) + " s" if generated else ", cached"))
+        print("\t" + corpus_path)
+        if not args.verify:
+            continue
+        start = time.perf_counter()
+        digest, read_bytes, files = hash_corpus(corpus_path)
+        elapsed = time.perf_counter() - start
+        if(digest != info["sha1"] or read_bytes != info["size"]):
+            raise Exception("run_corpus: " + corpus_path + " no longer matches its .json (" + str(read_bytes) + " bytes, SHA-1 " + digest
+                            + "), delete both and generate it again")
+        print("\tverified: " + str(round(read_bytes / elapsed / 1e6, 2)) + " MB/s, " + str(round(files / elapsed, 1)) + " files/s")
+
+
+
+#################################
+#                               #
+#      HASHING PATH BENCHMARK   #
+#                               #
+#################################
+# Time the text-mode loop against the binary read and mmap paths on the same input
+def run_hash_paths(args) -> None:
+    resolve_corpus_input(args)
+    size = os.path.getsize(args.input)
+    print("Hashing " + args.input + " (" + str(size) + " bytes) in " + str(args.chunk_size) + " byte chunks, best of " + str(args.repeat))
+
+    results = dict()
+    for name, hash_path in HASH_PATHS.items():
+        best_sec = None
+        digests = None
+        try:
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                digests = hash_path(args.input, args.chunk_size)
+                elapsed = time.perf_counter() - start
+                best_sec = elapsed if best_sec is None else min(best_sec, elapsed)
+        except (UnicodeDecodeError, UnicodeEncodeError) as e:
+            print("\t" + name.ljust(5) + " failed on non-ASCII input: " + str(e).split(":")[0])
+            continue
+        results[name] = digests
+        throughput = size / best_sec / 1e6 if best_sec > 0 else float("inf")
+        print("\t" + name.ljust(5) + " " + str(round(best_sec * 1000, 3)).rjust(10) + " ms  " + str(round(throughput, 2)).rjust(10) + " MB/s")
+
+    # The binary paths must agree, text mode only agrees when newline translation is a no-op
+    for name in ("mmap", "prefetch"):
+        if(name in results and "read" in results and results[name] != results["read"]):
+            raise Exception("run_hash_paths: binary read and " + name + " digests differ")
+    if("text" in results and "read" in results and results["text"] != results["read"]):
+        print("\tnote: text mode digests differ from the binary paths (newline translation changed the bytes)")
+
+
+
+#################################
+#                               #
+#      PREFETCH READ-AHEAD      #
+#                               #
+#################################
+# File of `size_mb` random bytes, the caller removes it. Random so no chunk size gets an
+# easy ride from a repeating pattern.
+def make_random_file(size_mb: int, prefix: str, directory=None) -> str:
+    with tempfile.NamedTemporaryFile(prefix=prefix, suffix=".bin", dir=directory, delete=False) as file:
+        remaining = size_mb * 1024 * 1024
+        while(remaining > 0):
+            block = os.urandom(min(remaining, 1024 * 1024))
+            file.write(block)
+            remaining -= len(block)
+        return file.name
+
+############################
+
+# Push a file out of the page cache so the next read has to go to the SD card / disk (no root needed)
+def drop_file_cache(file_path: str) -> None:
+    with open(file_path, "rb") as file:
+        os.fsync(file.fileno())
+        os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+############################
+
+# Best time of `repeat` runs of `function`, the file is evicted from the page cache first when `cold`
+def best_time(function, input_path: str, repeat: int, cold: bool) -> float:
+    best_sec = None
+    for _ in range(repeat):
+        if cold:
+            drop_file_cache(input_path)
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best_sec = elapsed if best_sec is None else min(best_sec, elapsed)
+    return best_sec
+
+############################
+
+# Read the whole file into one reused buffer without hashing it, the I/O half of the loop
+def read_only(input_path: str, chunk_size: int) -> None:
+    buffer = bytearray(chunk_size)
+    with open(input_path, "rb") as file:
+        while file.readinto(buffer):
+            pass
+
+############################
+
+# Hash as many chunks as the file has from one buffer in memory, the CPU half of the loop
+def hash_only(size: int, chunk_size: int) -> None:
+    sha1 = hashlib.sha1()
+    chunk = bytes(chunk_size)
+    for offset in range(0, size, chunk_size):
+        sha1.update(chunk[:min(chunk_size, size - offset)])
+        sha1.hexdigest()
+
+############################
+
+# Serial read-then-hash against the prefetching reader thread at a few ring depths.
+# Overlap can at best bring read + hash down to max(read, hash), "hidden" is how much of
+# that gap (the smaller of the two halves) a depth actually recovered.
+def run_prefetch(args) -> None:
+    resolve_corpus_input(args)
+    temp_path = None
+    input_path = args.input
+    if input_path is None:
+        # Next to original.txt, so the reads hit the same SD card the transmitter reads from
+        temp_path = input_path = make_random_file(args.size_mb, "sha1-prefetch-", HOME_DIR)
+    size = os.path.getsize(input_path)
+    cold = not args.warm
+
+    try:
+        print("Prefetch on " + detect_board() + ": " + str(size) + " bytes in " + str(args.chunk_size) + " byte chunks, "
+              + ("page cache dropped before every run" if cold else "warm page cache") + ", best of " + str(args.repeat))
+        read_sec = best_time(lambda: read_only(input_path, args.chunk_size), input_path, args.repeat, cold)
+        hash_sec = best_time(lambda: hash_only(size, args.chunk_size), input_path, args.repeat, False)
+        serial_sec = best_time(lambda: hash_binary_read(input_path, args.chunk_size), input_path, args.repeat, cold)
+        ideal_sec = max(read_sec, hash_sec)
+        print("\tread only     " + str(round(read_sec * 1000, 3)).rjust(10) + " ms")
+        print("\thash only     " + str(round(hash_sec * 1000, 3)).rjust(10) + " ms")
+        print("\tread + hash   " + str(round(serial_sec * 1000, 3)).rjust(10) + " ms  " + str(round(size / serial_sec / 1e6, 2)).rjust(10) + " MB/s")
+        expected = hash_binary_read(input_path, args.chunk_size)
+        for depth in args.depths:
+            prefetch_sec = best_time(lambda: hash_prefetched(input_path, args.chunk_size, depth), input_path, args.repeat, cold)
+            hidden = (serial_sec - prefetch_sec) / (serial_sec - ideal_sec) if serial_sec > ideal_sec else 0.0
+            print("\tprefetch x" + str(depth).ljust(3) + str(round(prefetch_sec * 1000, 3)).rjust(10) + " ms  "
+                  + str(round(size / prefetch_sec / 1e6, 2)).rjust(10) + " MB/s  " + str(round(100 * hidden, 1)).rjust(6) + "% of "
+                  + str(round((serial_sec - ideal_sec) * 1000, 3)) + " ms hidden")
+            if(hash_prefetched(input_path, args.chunk_size, depth) != expected):
+                raise Exception("run_prefetch: prefetch depth " + str(depth) + " digests differ from the serial read")
+    finally:
+        if temp_path:
+            os.remove(temp_path)
+
+
+
+#################################
+#                               #
+#     CHUNK STORE BENCHMARK     #
+#                               #
+#################################
+# Bytes a directory tree really takes on disk, allocated blocks rather than file sizes
+def disk_usage(directory: str) -> int:
+    used = 0
+    for root, _, names in os.walk(directory):
+        for name in names:
+            used += os.stat(os.path.join(root, name)).st_blocks * 512
+    return used
+
+############################
+
+# One file per chunk (the old associative-hashes/text-of-hashes-N.txt layout) against the packed
+# store: time to write every chunk, then random reads of single chunks by index
+def run_chunk_store(args) -> None:
+    chunk = os.urandom(args.chunk_size)
+    order = random.Random(args.seed).choices(range(args.chunks), k=args.reads)
+    scratch_dir = tempfile.mkdtemp(prefix="sha1-chunk-store-", dir=args.directory or HOME_DIR)
+    files_dir = os.path.join(scratch_dir, "associative-hashes")
+    os.mkdir(files_dir)
+    data_path = os.path.join(scratch_dir, "chunks.dat")
+    index_path = os.path.join(scratch_dir, "chunks.idx")
+
+    try:
+        print("Chunk store on " + detect_board() + ": " + str(args.chunks) + " chunks of " + str(args.chunk_size) + " bytes in "
+              + scratch_dir + ", " + str(args.reads) + " random reads")
+        start = time.perf_counter()
+        for index in range(args.chunks):
+            with open(os.path.join(files_dir, "text-of-hashes-" + str(index + 1) + ".txt"), "wb") as file:
+                file.write(chunk)
+        os.sync()
+        files_write_sec = time.perf_counter() - start
+        start = time.perf_counter()
+        for index in order:
+            with open(os.path.join(files_dir, "text-of-hashes-" + str(index + 1) + ".txt"), "rb") as file:
+                file.read()
+        files_read_sec = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ChunkStoreWriter(data_path, index_path) as store_writer:
+            for index in range(args.chunks):
+                store_writer.append(chunk)
+        os.sync()
+        store_write_sec = time.perf_counter() - start
+        start = time.perf_counter()
+        with ChunkStore(data_path, index_path) as store:
+            for index in order:
+                bytes(store[index])
+        store_read_sec = time.perf_counter() - start
+
+        files_used = disk_usage(files_dir)
+        store_used = os.stat(data_path).st_blocks * 512 + os.stat(index_path).st_blocks * 512
+        print("\t" + "layout".ljust(16) + "write s".rjust(10) + "chunks/s".rjust(12) + "read us/chunk".rjust(15) + "on disk".rjust(12))
+        for name, write_sec, read_sec, used in (("file per chunk", files_write_sec, files_read_sec, files_used),
+                                                ("packed store", store_write_sec, store_read_sec, store_used)):
+            print("\t" + name.ljust(16) + str(round(write_sec, 4)).rjust(10) + str(round(args.chunks / write_sec)).rjust(12)
+                  + str(round(read_sec / max(1, args.reads) * 1e6, 2)).rjust(15) + str(used).rjust(12))
+    finally:
+        shutil.rmtree(scratch_dir)
+
+
+
+#################################
+#                               #
+#     CHUNK / BUFFER AUTOTUNE   #
+#                               #
+#################################
+# User + system CPU seconds this process has used so far (both ends of the loopback run here)
+def cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+############################
+
+# Verify-on-receive end of a loopback transfer, the same checks the receiver runs on a streamed transmitter.
+# A striped transmitter's other streams are accepted from the same listener and read back in chunk order.
+def loopback_receive(listener, recv_buffer: int, result: dict) -> None:
+    def prepare_connection(connection):
+        connection.settimeout(30.0)
+        return BufferedSocketReader(connection, recv_buffer)
+
+    try:
+        connection, _ = listener.accept()
+        with connection:
+            reader = prepare_connection(connection)
+            frame = recv_frame(reader)
+            if(frame is not None and frame[0] == FRAME_STRIPE):
+                reader = accept_stripes(listener, reader, frame, prepare_connection)
+                frame = recv_frame(reader)
+            verifier = RunningVerifier()
+            pending_digest = None
+            while True:
+                if frame is None:
+                    raise Exception("loopback_receive: transmitter closed the connection before the END frame")
+                frame_type, _, _, payload = frame
+                if(frame_type == FRAME_END):
+                    break
+                elif(frame_type == FRAME_CHUNK):
+                    verifier.check(payload, pending_digest)
+                else:
+                    pending_digest = str(payload, "ascii")
+                frame = recv_frame(reader)
+            send_frame(reader, FRAME_ACK, bytes(verifier.summary(), "ascii"))
+            result["verifier"] = verifier
+            if isinstance(reader, StripedReceiver):
+                result["stripes"] = reader.report()
+                reader.close()
+    except Exception as e:
+        result["error"] = e
+
+############################
+
+# Stream `input_path` with running digests, the same frames `SHA-1-Transmitter.py --stream` sends
+# (striped round-robin over `streams` connections), and wait for the receiver's ACK. Returns the ACK text.
+def stream_to_receiver(address, input_path: str, chunk_size: int, profile=None, streams=1) -> bytes:
+    stream_sockets = connect_stripes(address, streams, flags=FLAG_STREAMED, setup=lambda sock: apply_socket_buffers(sock, profile), timeout=30.0)
+    try:
+        sha1 = hashlib.sha1()
+        with open(input_path, "rb") as file:
+            for index, chunk in enumerate(iter_file_chunks(file, chunk_size)):
+                sha1.update(chunk)
+                send_digest_and_chunk(stream_sockets[index % streams], index, bytes(sha1.hexdigest(), "ascii"), chunk, flags=FLAG_STREAMED)
+        for stream_socket in stream_sockets:
+            send_frame(stream_socket, FRAME_END, bytes(sha1.hexdigest(), "ascii"), flags=FLAG_STREAMED)
+        _, _, _, ack = expect_frame(stream_sockets[0], FRAME_ACK)
+        return bytes(ack)
+    finally:
+        for stream_socket in stream_sockets:
+            stream_socket.close()
+
+############################
+
+# Stream `input_path` to an in-process receiver over 127.0.0.1, returns (wall seconds, CPU seconds, verifier)
+def loopback_transfer(input_path: str, chunk_size: int, recv_buffer: int, socket_buffer: int, streams=1) -> tuple:
+    buffers = {"socket_buffer": socket_buffer}
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as listener:
+        apply_socket_buffers(listener, buffers)
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(streams)
+        result = dict()
+        receiver = threading.Thread(target=loopback_receive, args=(listener, recv_buffer, result))
+        receiver.start()
+
+        wall_start = time.perf_counter()
+        cpu_start = cpu_seconds()
+        stream_to_receiver(listener.getsockname(), input_path, chunk_size, buffers, streams)
+        wall_sec = time.perf_counter() - wall_start
+        cpu_sec = cpu_seconds() - cpu_start
+        receiver.join()
+
+    if "error" in result:
+        raise result["error"]
+    verifier = result["verifier"]
+    if(verifier.mismatched_count != 0):
+        raise Exception("loopback_transfer: " + verifier.summary())
+    return wall_sec, cpu_sec, verifier
+
+############################
+
+# Sweep chunk size x recv buffer x socket buffer x TCP stream count over loopback and save the fastest setting for this board
+def run_autotune(args) -> None:
+    resolve_corpus_input(args)
+    temp_path = None
+    input_path = args.input
+    if input_path is None:
+        temp_path = input_path = make_random_file(args.size_mb, "sha1-autotune-")
+    size = os.path.getsize(input_path)
+    board = board_name(args.board)
+
+    try:
+        print("Autotuning on " + board + ": " + str(size) + " bytes over 127.0.0.1, best of " + str(args.repeat))
+        print("\t" + "chunk".rjust(8) + "recv buf".rjust(10) + "sock buf".rjust(10) + "streams".rjust(9) + "MB/s".rjust(10) + "CPU s".rjust(9) + "CPU s/MB".rjust(10))
+        results = list()
+        for chunk_size in args.chunk_sizes:
+            for recv_buffer in args.recv_buffers:
+                for socket_buffer in args.socket_buffers:
+                    for streams in args.streams:
+                        best = None
+                        for _ in range(args.repeat):
+                            wall_sec, cpu_sec, _ = loopback_transfer(input_path, chunk_size, recv_buffer, socket_buffer, streams)
+                            if(best is None or wall_sec < best[0]):
+                                best = (wall_sec, cpu_sec)
+                        throughput = size / best[0] / 1e6 if best[0] > 0 else float("inf")
+                        cpu_per_mb = best[1] / (size / 1e6) if size else 0.0
+                        results.append({"chunk_size": chunk_size, "recv_buffer": recv_buffer, "socket_buffer": socket_buffer,
+                                        "streams": streams, "throughput_MBps": round(throughput, 2), "cpu_sec": round(best[1], 4),
+                                        "cpu_sec_per_MB": round(cpu_per_mb, 6)})
+                        print("\t" + str(chunk_size).rjust(8) + str(recv_buffer).rjust(10) + (str(socket_buffer) if socket_buffer else "default").rjust(10)
+                              + str(streams).rjust(9) + str(round(throughput, 2)).rjust(10) + str(round(best[1], 3)).rjust(9) + str(round(cpu_per_mb, 5)).rjust(10))
+    finally:
+        if temp_path:
+            os.remove(temp_path)
+
+    # Highest throughput wins, less CPU time breaks a tie
+    best = max(results, key=lambda result: (result["throughput_MBps"], -result["cpu_sec"]))
+    print("Best: chunk size " + str(best["chunk_size"]) + ", recv buffer " + str(best["recv_buffer"])
+          + ", socket buffer " + (str(best["socket_buffer"]) if best["socket_buffer"] else "default")
+          + ", " + str(best["streams"]) + " stream(s) (" + str(best["throughput_MBps"]) + " MB/s)")
+    if args.no_save:
+        return
+    settings = dict(best)
+    settings["input_bytes"] = size
+    settings["tuned_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    save_board_profile(settings, board=board, profile_path=args.profile)
+    print("Saved to " + args.profile + " under \"" + board + "\", the transmitter and receiver load it at startup")
+
+
+
+#################################
+#                               #
+#       BENCHMARK HARNESS       #
+#                               #
+#################################
+# min, median, p95 (nearest rank), mean and sample standard deviation of run times in nanoseconds
+def summarize_ns(samples_ns) -> dict:
+    ordered = sorted(samples_ns)
+    count = len(ordered)
+    if(count == 0):
+        raise Exception("summarize_ns: no samples to summarize")
+    return {
+        "runs": count,
+        "min_ns": ordered[0],
+        "median_ns": statistics.median(ordered),
+        "p95_ns": ordered[max(0, math.ceil(0.95 * count) - 1)],
+        "max_ns": ordered[-1],
+        "mean_ns": statistics.fmean(ordered),
+        "stdev_ns": statistics.stdev(ordered) if count > 1 else 0.0,
+    }
+
+############################
+
+# Build the zero-argument callable one harness run times, for the workload named on the command line
+def make_workload(args, chunk_size: int, profile):
+    if args.workload.startswith("hash-"):
+        hash_path = HASH_PATHS[args.workload[len("hash-"):]]
+        return lambda: hash_path(args.input, chunk_size, algorithm=args.algorithm)
+    if(args.workload == "loopback"):
+        recv_buffer = profile.get("recv_buffer", 0) if profile else 0
+        socket_buffer = profile.get("socket_buffer", 0) if profile else 0
+        return lambda: loopback_transfer(args.input, chunk_size, recv_buffer, socket_buffer, args.streams)
+    if(args.workload == "stream"):
+        if not args.peer:
+            raise Exception("make_workload: the stream workload needs --peer (a receiver started with --serve)")
+        return lambda: stream_to_receiver((args.peer, args.port), args.input, chunk_size, profile, args.streams)
+    raise Exception("make_workload: unknown workload " + args.workload)
+
+############################
+
+# N untimed warmups, then M runs timed with perf_counter_ns, summarized and written out as JSON
+def run_harness(args) -> None:
+    resolve_corpus_input(args)
+    board = board_name(args.board)
+    profile = None if args.no_profile else load_board_profile(board)
+    chunk_size = args.chunk_size or (profile.get("chunk_size", 4096) if profile else 4096)
+    if(args.streams < 1):
+        raise Exception("run_harness: --streams has to be 1 or more")
+    if(args.algorithm != "sha1" and not args.workload.startswith("hash-")):
+        raise Exception("run_harness: --algorithm only applies to the hash-* workloads, streamed transfers are SHA-1")
+    size = os.path.getsize(args.input)
+    workload = make_workload(args, chunk_size, profile)
+
+    print("Harness: " + args.workload + " on " + board + ", " + str(size) + " bytes in " + str(chunk_size) + " byte chunks, "
+          + str(args.warmup) + " warmup + " + str(args.runs) + " measured runs")
+    for _ in range(args.warmup):
+        workload()
+
+    # Power is only read over the measured runs, tagged with the phase the workload spends its time in
+    power_monitor = PowerMonitor(open_power_source(args.power_source), args.power_hz) if is_telemetry_source(args.power_source) else None
+    if power_monitor is not None:
+        power_monitor.start()
+    set_phase("hash" if args.workload.startswith("hash-") else "send")
+    samples_ns = list()
+    for _ in range(args.runs):
+        start = time.perf_counter_ns()
+        workload()
+        samples_ns.append(time.perf_counter_ns() - start)
+    set_phase("idle")
+    if power_monitor is not None:
+        power_monitor.stop()
+
+    stats = summarize_ns(samples_ns)
+    stats["median_MBps"] = round(size / (stats["median_ns"] / 1e9) / 1e6, 3) if stats["median_ns"] else None
+    for name in ("min", "median", "p95", "stdev"):
+        print("\t" + name.ljust(7) + str(round(stats[name + "_ns"] / 1e6, 4)).rjust(12) + " ms")
+    print("\t" + "median".ljust(7) + str(stats["median_MBps"]).rjust(12) + " MB/s")
+    energy = None
+    if power_monitor is not None:
+        energy = power_monitor.peaks_and_averages()
+        energy["joules"] = round(power_monitor.total_joules(), 6)
+        energy["joules_per_MB"] = round(energy["joules"] / (size * args.runs / 1e6), 6) if size else None
+        energy["source"] = power_monitor.source.name
+        print("\t" + "energy".ljust(7) + str(energy["joules_per_MB"]).rjust(12) + " J/MB (" + str(energy["avg_watts"]) + "W avg)")
+
+    result = {
+        "workload": args.workload,
+        "board": board,
+        "detected_board": detect_board(),
+        "peer": args.peer,
+        "power_source": args.power_source,
+        "input": os.path.abspath(args.input),
+        "input_bytes": size,
+        "corpus": args.corpus_info,
+        "chunk_size": chunk_size,
+        "algorithm": args.algorithm,
+        "streams": args.streams,
+        "profile": profile,
+        "warmup_runs": args.warmup,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "started_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "stats": stats,
+        "energy": energy,
+        "samples_ns": samples_ns,
+    }
+    save_results(result, args.output, board, args.workload)
+
+############################
+
+# Write a result dict as JSON to `output_path`, - for stdout, None for benchmark-results/<board>-<label>-<time>.json
+def save_results(result: dict, output_path, board: str, label: str) -> None:
+    if output_path is None:
+        os.makedirs(harness_results_dir, exist_ok=True)
+        slug = "".join(c if c.isalnum() else "-" for c in board).strip("-").lower()
+        output_path = os.path.join(harness_results_dir, slug + "-" + label + "-" + time.strftime("%Y%m%d-%H%M%S") + ".json")
+    if(output_path == "-"):
+        json.dump(result, sys.stdout, indent=2)
+        print()
+        return
+    with open(output_path, "w") as file:
+        json.dump(result, file, indent=2)
+        file.write("\n")
+    print("Results written to " + output_path)
+
+
+
+#################################
+#                               #
+#     HASH ALGORITHM MATRIX     #
+#                               #
+#################################
+# Mean clock of the busiest core over the sampler's samples in Hz, None if the board does not report one.
+# Hashing runs on one core and the others idle down, so the highest core clock is the hashing one.
+def mean_busy_core_hz(samples):
+    clocks = [max(sample["cpu_freq_mhz"]) for sample in samples if sample["cpu_freq_mhz"] and max(sample["cpu_freq_mhz"]) > 0]
+    if not clocks:
+        return None
+    return statistics.fmean(clocks) * 1e6
+
+############################
+
+# Every algorithm through the same hashing path on the same input: median MB/s, cycles per byte
+# (median time x sampled clock / bytes) and, with a telemetry power source, J/MB
+def run_algorithms(args) -> None:
+    if(args.input is None and args.corpus is None):
+        args.corpus = corpus_spec(DEFAULT_ALGORITHM_CORPUS)
+    resolve_corpus_input(args)
+    board = board_name(args.board)
+    profile = None if args.no_profile else load_board_profile(board)
+    chunk_size = args.chunk_size or (profile.get("chunk_size", 4096) if profile else 4096)
+    hash_path = HASH_PATHS[args.path]
+    size = os.path.getsize(args.input)
+    print("Algorithms on " + board + ": " + args.path + " path, " + str(size) + " bytes in " + str(chunk_size) + " byte chunks, "
+          + str(args.warmup) + " warmup + " + str(args.runs) + " measured runs each")
+    print("\t" + "algorithm".ljust(10) + "digest".rjust(7) + "median ms".rjust(12) + "MB/s".rjust(10) + "vs sha1".rjust(9)
+          + "cycles/B".rjust(10) + "J/MB".rjust(10))
+
+    rows = list()
+    for algorithm in args.algorithms:
+        try:
+            hash_algorithm_spec(algorithm)
+        except ValueError as e:
+            print("\t" + algorithm.ljust(10) + " skipped: " + str(e))
+            continue
+        for _ in range(args.warmup):
+            hash_path(args.input, chunk_size, algorithm=algorithm)
+
+        power_monitor = PowerMonitor(open_power_source(args.power_source), args.power_hz) if is_telemetry_source(args.power_source) else None
+        if power_monitor is not None:
+            power_monitor.start()
+        set_phase("hash")
+        samples_ns = list()
+        with ResourceSampler(args.sample_hz) as sampler:
+            for _ in range(args.runs):
+                start = time.perf_counter_ns()
+                hash_path(args.input, chunk_size, algorithm=algorithm)
+                samples_ns.append(time.perf_counter_ns() - start)
+        set_phase("idle")
+        if power_monitor is not None:
+            power_monitor.stop()
+
+        stats = summarize_ns(samples_ns)
+        median_sec = stats["median_ns"] / 1e9
+        clock_hz = mean_busy_core_hz(sampler.samples)
+        row = {
+            "algorithm": algorithm,
+            "digest_size": new_hash(algorithm).digest_size,
+            "stats": stats,
+            "MBps": round(size / median_sec / 1e6, 3) if median_sec else None,
+            "mean_clock_mhz": round(clock_hz / 1e6, 1) if clock_hz else None,
+            "cycles_per_byte": round(clock_hz * median_sec / size, 3) if(clock_hz and size) else None,
+            "energy": None,
+        }
+        if power_monitor is not None:
+            row["energy"] = power_monitor.peaks_and_averages()
+            row["energy"]["joules"] = round(power_monitor.total_joules(), 6)
+            row["energy"]["joules_per_MB"] = round(row["energy"]["joules"] / (size * args.runs / 1e6), 6) if size else None
+        rows.append(row)
+
+    # Relative speed needs the sha1 row, the algorithm this project is about
+    baseline = next((row["MBps"] for row in rows if row["algorithm"] == "sha1"), None)
+    for row in rows:
+        row["vs_sha1"] = round(row["MBps"] / baseline, 3) if(baseline and row["MBps"]) else None
+        print("\t" + row["algorithm"].ljust(10) + str(row["digest_size"]).rjust(7) + str(round(row["stats"]["median_ns"] / 1e6, 3)).rjust(12)
+              + str(row["MBps"]).rjust(10) + (str(row["vs_sha1"]) + "x" if row["vs_sha1"] else "-").rjust(9)
+              + str(row["cycles_per_byte"] if row["cycles_per_byte"] is not None else "n/a").rjust(10)
+              + str(row["energy"]["joules_per_MB"] if row["energy"] else "n/a").rjust(10))
+
+    result = {
+        "workload": "algorithms",
+        "board": board,
+        "detected_board": detect_board(),
+        "power_source": args.power_source,
+        "input": os.path.abspath(args.input),
+        "input_bytes": size,
+        "corpus": args.corpus_info,
+        "hash_path": args.path,
+        "chunk_size": chunk_size,
+        "warmup_runs": args.warmup,
+        "python": platform.python_version(),
+        "openssl": ssl.OPENSSL_VERSION,
+        "platform": platform.platform(),
+        "started_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "algorithms": rows,
+    }
+    save_results(result, args.output, board, "algorithms")
+
+
+
+#################################
+#                               #
+#     VECTORIZED SHA-1 LANES    #
+#                               #
+#################################
+# The NumPy SHA-1 engine against one hashlib.sha1 call per message, for batches of equal-size
+# messages. The engine is checked bit for bit against hashlib first, a mismatch stops the run.
+def run_numpy_sha1(args) -> None:
+    try:
+        sha1_numpy = importlib.import_module("sha1_numpy")
+    except ImportError as e:
+        raise Exception("run_numpy_sha1: the vectorized engine needs NumPy (" + str(e) + ")")
+
+    mismatches = sha1_numpy.validate_against_hashlib(args.validate, seed=args.seed)
+    if mismatches:
+        length, expected, got = mismatches[0]
+        raise Exception("run_numpy_sha1: " + str(len(mismatches)) + " digests differ from hashlib, first one a " + str(length)
+                        + " byte message: hashlib " + expected + ", numpy " + got)
+    print("NumPy SHA-1 agrees with hashlib on " + str(args.validate + len(sha1_numpy.PADDING_EDGE_LENGTHS)) + " mixed-length messages"
+          + " (numpy " + sha1_numpy.np.__version__ + ", " + detect_board() + "), best of " + str(args.repeat))
+    print("\t" + "size".rjust(7) + "messages".rjust(10) + "hashlib MB/s".rjust(14) + "numpy MB/s".rjust(12) + "numpy/hashlib".rjust(15)
+          + "hashlib us/msg".rjust(16) + "numpy us/msg".rjust(14))
+
+    for size in args.sizes:
+        for count in args.messages:
+            data = shake_bytes(b"numpy-sha1", args.seed, size, size * count)
+            messages = [data[i * size:(i + 1) * size] for i in range(count)]
+            hashlib_sec = None
+            numpy_sec = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                expected = [hashlib.sha1(message).digest() for message in messages]
+                elapsed = time.perf_counter() - start
+                hashlib_sec = elapsed if hashlib_sec is None else min(hashlib_sec, elapsed)
+                start = time.perf_counter()
+                digests = sha1_numpy.sha1_batch(messages)
+                elapsed = time.perf_counter() - start
+                numpy_sec = elapsed if numpy_sec is None else min(numpy_sec, elapsed)
+            if(digests != expected):
+                raise Exception("run_numpy_sha1: batch of " + str(count) + " x " + str(size) + " bytes does not match hashlib")
+            print("\t" + str(size).rjust(7) + str(count).rjust(10) + str(round(size * count / hashlib_sec / 1e6, 2)).rjust(14)
+                  + str(round(size * count / numpy_sec / 1e6, 2)).rjust(12) + (str(round(hashlib_sec / numpy_sec, 3)) + "x").rjust(15)
+                  + str(round(hashlib_sec / count * 1e6, 3)).rjust(16) + str(round(numpy_sec / count * 1e6, 3)).rjust(14))
+
+
+
+#################################
+#                               #
+#      END-TO-END LOOPBACK      #
+#                               #
+#################################
+# Is anything listening on local TCP `port`. Read out of /proc/net/tcp rather than probed with a
+# connect, the receiver would take a probe connection for the transmitter.
+def port_is_listening(port: int) -> bool:
+    suffix = ":" + format(port, "04X")
+    for table_path in PROC_NET_TCP_TABLES:
+        try:
+            with open(table_path, "r") as file:
+                next(file, None)
+                for line in file:
+                    fields = line.split()
+                    if(len(fields) > 3 and fields[1].endswith(suffix) and fields[3] == TCP_LISTEN_STATE):
+                        return True
+        except OSError:
+            continue
+    return False
+
+############################
+
+# Wait until the receiver process listens on `port`, fail early if it exits first
+def wait_for_listener(process, port: int, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while not port_is_listening(port):
+        if process.poll() is not None:
+            raise Exception("wait_for_listener: the receiver exited with code " + str(process.returncode) + " before listening on port " + str(port))
+        if(time.monotonic() > deadline):
+            raise Exception("wait_for_listener: the receiver did not listen on port " + str(port) + " within " + str(timeout) + " seconds")
+        time.sleep(0.01)
+
+############################
+
+# Fresh directory with copies of both scripts, their modules, this board's profile and `input_path`
+# linked in as original.txt. The scripts read and write everything next to themselves, so every run
+# gets its own and the checkout is left alone.
+def make_e2e_workdir(parent, input_path: str) -> str:
+    workdir = tempfile.mkdtemp(prefix="sha1-e2e-", dir=parent)
+    code_dir = os.path.abspath(HOME_DIR)
+    for name in os.listdir(code_dir):
+        if name.endswith(".py"):
+            shutil.copy2(os.path.join(code_dir, name), workdir)
+    if os.path.exists(DEFAULT_PROFILE_PATH):
+        shutil.copy2(DEFAULT_PROFILE_PATH, workdir)
+    os.symlink(os.path.abspath(input_path), os.path.join(workdir, "original.txt"))
+    # Byte-compile up front so module compile time is not counted against the first import
+    compileall.compile_dir(workdir, quiet=1)
+    return workdir
+
+############################
+
+# Verification summary line out of the receiver's results file, (line, matched, chunks, mismatched)
+def read_verify_summary(results_path: str) -> tuple:
+    with open(results_path, "r") as file:
+        for line in file:
+            if line.startswith(VERIFY_SUMMARY_PREFIXES):
+                counts = VERIFY_SUMMARY_COUNTS.search(line)
+                if counts is not None:
+                    return (line.strip(),) + tuple(int(count) for count in counts.groups())
+    raise Exception("read_verify_summary: no verification summary in " + results_path)
+
+############################
+
+# Total time covered by (start, end) intervals, overlapping and nested spans count once
+def covered_time(intervals) -> float:
+    total = 0.0
+    covered_until = None
+    for start, end in sorted(intervals):
+        if covered_until is None or start > covered_until:
+            total += end - start
+            covered_until = end
+        elif(end > covered_until):
+            total += end - covered_until
+            covered_until = end
+    return total
+
+############################
+
+# Per-phase latency out of one --trace file. Per span category (io, hash, net, verify, codec):
+# busy time with nesting folded, and when the phase first started and last finished in ms after
+# `origin_us`. Per span name: count, total and worst single span.
+def trace_phases(trace_path: str, origin_us: float) -> dict:
+    with open(trace_path, "r") as file:
+        trace = json.load(file)
+    by_category = dict()
+    by_name = dict()
+    for event in trace["traceEvents"]:
+        if(event.get("ph") != "X"):
+            continue
+        start, end = event["ts"], event["ts"] + event["dur"]
+        by_category.setdefault(event.get("cat", "sha1"), list()).append((start, end))
+        name_summary = by_name.setdefault(event["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        name_summary["count"] += 1
+        name_summary["total_ms"] += event["dur"] / 1000.0
+        name_summary["max_ms"] = max(name_summary["max_ms"], event["dur"] / 1000.0)
+    categories = dict()
+    for category, intervals in by_category.items():
+        categories[category] = {
+            "spans": len(intervals),
+            "busy_ms": round(covered_time(intervals) / 1000.0, 3),
+            "first_ms": round((min(start for start, _ in intervals) - origin_us) / 1000.0, 3),
+            "last_ms": round((max(end for _, end in intervals) - origin_us) / 1000.0, 3),
+        }
+    for name_summary in by_name.values():
+        name_summary["total_ms"] = round(name_summary["total_ms"], 3)
+        name_summary["max_ms"] = round(name_summary["max_ms"], 3)
+    return {"categories": categories, "spans": by_name}
+
+############################
+
+# One full cycle: start the receiver, wait for it to listen, run the transmitter, wait for both.
+# The clock runs from launching the transmitter (before it hashes anything) until the receiver
+# has verified every chunk and exited.
+def run_e2e_once(args, board: str, run_dir: str) -> dict:
+    rx_log_path = os.path.join(run_dir, "rx.log")
+    tx_log_path = os.path.join(run_dir, "tx.log")
+    rx_trace_path = os.path.join(run_dir, "SHA-1-trace-rx.json")
+    tx_trace_path = os.path.join(run_dir, "SHA-1-trace-tx.json")
+    common = ["--board", board, "--power-source", "none"]
+    rx_command = ([sys.executable, "-u", os.path.join(run_dir, "SHA-1-Receiver.py"), "--host", "127.0.0.1", "--trace", rx_trace_path]
+                  + common + shlex.split(args.rx_args))
+    tx_command = ([sys.executable, "-u", os.path.join(run_dir, "SHA-1-Transmitter.py"), "--peer", "127.0.0.1", "--trace", tx_trace_path]
+                  + common + shlex.split(args.tx_args))
+
+    with open(rx_log_path, "w") as rx_log, open(tx_log_path, "w") as tx_log:
+        receiver = subprocess.Popen(rx_command, cwd=run_dir, stdin=subprocess.DEVNULL, stdout=rx_log, stderr=subprocess.STDOUT)
+        try:
+            wait_for_listener(receiver, PROTOCOL_PORT, args.timeout)
+            origin_us = time.time_ns() / 1000.0
+            start = time.perf_counter_ns()
+            transmitter = subprocess.run(tx_command, cwd=run_dir, stdin=subprocess.DEVNULL, stdout=tx_log, stderr=subprocess.STDOUT,
+                                         timeout=args.timeout)
+            transmitter_ns = time.perf_counter_ns() - start
+            # A transmitter that failed may never have connected, the receiver would wait forever
+            if(transmitter.returncode != 0):
+                raise Exception("run_e2e_once: the transmitter exited with code " + str(transmitter.returncode) + ", see " + tx_log_path)
+            receiver.wait(timeout=args.timeout)
+            elapsed_ns = time.perf_counter_ns() - start
+        finally:
+            if receiver.poll() is None:
+                receiver.kill()
+                receiver.wait()
+    if(receiver.returncode != 0):
+        raise Exception("run_e2e_once: the receiver exited with code " + str(receiver.returncode) + ", see " + rx_log_path)
+
+    summary, matched, chunks, mismatched = read_verify_summary(os.path.join(run_dir, "SHA-1-results-rx.txt"))
+    merge_traces([tx_trace_path, rx_trace_path], os.path.join(run_dir, "SHA-1-trace.json"))
+    return {
+        "elapsed_ns": elapsed_ns,
+        "transmitter_ns": transmitter_ns,
+        "verify_summary": summary,
+        "chunks": chunks,
+        "matched": matched,
+        "mismatched": mismatched,
+        "phases": {"transmitter": trace_phases(tx_trace_path, origin_us), "receiver": trace_phases(rx_trace_path, origin_us)},
+    }
+
+############################
+
+# Phase table for one run, each side's categories in the order they started
+def print_e2e_phases(phases: dict, top: int) -> None:
+    print("\t" + "side".ljust(12) + "phase".ljust(8) + "spans".rjust(8) + "busy ms".rjust(12) + "from ms".rjust(12) + "to ms".rjust(12))
+    for side, side_phases in phases.items():
+        for category, summary in sorted(side_phases["categories"].items(), key=lambda item: item[1]["first_ms"]):
+            print("\t" + side.ljust(12) + category.ljust(8) + str(summary["spans"]).rjust(8) + str(summary["busy_ms"]).rjust(12)
+                  + str(summary["first_ms"]).rjust(12) + str(summary["last_ms"]).rjust(12))
+    for side, side_phases in phases.items():
+        print("\tSlowest spans, " + side + ":")
+        ranked = sorted(side_phases["spans"].items(), key=lambda item: item[1]["total_ms"], reverse=True)
+        for name, summary in ranked[:top]:
+            print("\t\t" + name.ljust(32) + str(summary["count"]).rjust(8) + " x " + str(summary["total_ms"]).rjust(10) + " ms total, "
+                  + str(summary["max_ms"]) + " ms worst")
+
+############################
+
+# Why the staged (non --stream) transfer can't carry the file, None when it can. The transmitter
+# reads original.txt as ASCII text and the receiver splits chunks on \r, so both have to be absent.
+def staged_input_problem(input_path: str):
+    with open(input_path, "rb") as file:
+        offset = 0
+        while True:
+            block = file.read(1024 * 1024)
+            if not block:
+                return None
+            if not block.isascii():
+                return "has non-ASCII bytes near offset " + str(offset)
+            if b"\r" in block:
+                return "has a \\r at offset " + str(offset + block.index(b"\r"))
+            offset += len(block)
+
+############################
+
+# Receiver and transmitter as two real processes over 127.0.0.1, hash -> transfer -> verify end to
+# end, so a slowdown anywhere in either script (or a broken transfer) shows up as one number
+def run_e2e(args) -> None:
+    resolve_corpus_input(args)
+    board = board_name(args.board)
+    if(args.runs < 1):
+        raise Exception("run_e2e: --runs has to be 1 or more")
+    if port_is_listening(PROTOCOL_PORT):
+        raise Exception("run_e2e: something is already listening on port " + str(PROTOCOL_PORT) + ", stop the other receiver first")
+    if args.input is None:
+        # The staged transmitter reads original.txt as ASCII text, so the default input is the seeded ascii corpus
+        args.corpus = ("ascii", args.size_mb * 1024 * 1024, 0)
+        resolve_corpus_input(args)
+    if not "--stream" in shlex.split(args.tx_args):
+        problem = staged_input_problem(args.input)
+        if problem is not None:
+            raise Exception("run_e2e: " + args.input + " " + problem + ", the staged transfer only carries ASCII text, add --tx-args=\"--stream\" to send it")
+    parent = tempfile.mkdtemp(prefix="sha1-e2e-", dir=args.directory)
+    input_path = args.input
+    size = os.path.getsize(input_path)
+    print("End-to-end loopback: " + str(size) + " bytes on " + board + ", " + str(args.runs) + " run(s)")
+    print("\treceiver:    " + (args.rx_args or "(defaults)"))
+    print("\ttransmitter: " + (args.tx_args or "(defaults)"))
+
+    runs = list()
+    failure = None
+    try:
+        for run in range(args.runs):
+            run_dir = make_e2e_workdir(parent, input_path)
+            try:
+                runs.append(run_e2e_once(args, board, run_dir))
+            except Exception as error:
+                failure = str(error)
+                break
+            print("\trun " + str(run + 1) + ": " + str(round(runs[-1]["elapsed_ns"] / 1e9, 4)) + " s, " + runs[-1]["verify_summary"])
+            if runs[-1]["mismatched"]:
+                failure = "run_e2e: run " + str(run + 1) + " had " + str(runs[-1]["mismatched"]) + " mismatched chunk(s), see " + run_dir
+                break
+            if not args.keep:
+                shutil.rmtree(run_dir)
+    finally:
+        if(failure is None and not args.keep):
+            shutil.rmtree(parent)
+    if failure is not None:
+        raise Exception(failure + " (work files kept in " + parent + ")")
+
+    stats = summarize_ns([run["elapsed_ns"] for run in runs])
+    stats["median_MBps"] = round(size / (stats["median_ns"] / 1e9) / 1e6, 3) if stats["median_ns"] else None
+    print("\t" + "median".ljust(7) + str(round(stats["median_ns"] / 1e9, 4)).rjust(12) + " s")
+    print("\t" + "median".ljust(7) + str(stats["median_MBps"]).rjust(12) + " MB/s end to end")
+    median_run = sorted(runs, key=lambda run: run["elapsed_ns"])[(len(runs) - 1) // 2]
+    print("Phases of the median run (ms after the transmitter was launched):")
+    print_e2e_phases(median_run["phases"], args.top)
+    if args.keep:
+        print("Work files and merged traces kept in " + parent)
+
+    result = {
+        "workload": "e2e",
+        "board": board,
+        "detected_board": detect_board(),
+        "input": os.path.abspath(args.input),
+        "input_bytes": size,
+        "corpus": args.corpus_info,
+        "rx_args": args.rx_args,
+        "tx_args": args.tx_args,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "started_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "stats": stats,
+        "runs": runs,
+    }
+    save_results(result, args.output, board, "e2e")
+
+
+
+#################################
+#                               #
+#          TRACE MERGE          #
+#                               #
+#################################
+# Put transmitter and receiver traces on one timeline, one process track each
+def run_trace_merge(args) -> None:
+    count = merge_traces(args.traces, args.output)
+    print("Merged " + str(len(args.traces)) + " traces (" + str(count) + " events) into " + args.output + ", open it in ui.perfetto.dev or chrome://tracing")
+
+
+
+#################################
+#                               #
+#     COMMAND LINE ARGUMENTS    #
+#                               #
+#################################
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="SHA-1 benchmark runner")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    corpus = commands.add_parser("corpus", help="generate seeded synthetic inputs once and print their SHA-1 to compare across boards")
+    corpus.add_argument("corpora", nargs="+", type=corpus_spec, metavar="PROFILE:SIZE[:SEED]",
+                        help="profile (" + ", ".join(CORPUS_PROFILES) + "), size in bytes or K/M/G and an optional seed (default 0)")
+    corpus.add_argument("--verify", action="store_true", help="read each corpus back, check its SHA-1 and report MB/s and files/s")
+    corpus.set_defaults(run=run_corpus)
+
+    hash_paths = commands.add_parser("hash-paths", help="compare text-mode, binary read and mmap hashing loops")
+    hash_paths.add_argument("--input", default=original_txt_file_path, help="file to hash (default: original.txt)")
+    hash_paths.add_argument("--corpus", type=corpus_spec, default=None,
+                            help="seeded synthetic input PROFILE:SIZE[:SEED] in place of --input, e.g. ascii:64M (cached in corpus-cache/)")
+    hash_paths.add_argument("--chunk-size", type=int, default=4096, help="chunk size in bytes/characters")
+    hash_paths.add_argument("--repeat", type=int, default=5, help="runs per path, the best one is reported")
+    hash_paths.set_defaults(run=run_hash_paths)
+
+    sizes = lambda text: [int(size) for size in text.split(",") if size]
+    prefetch = commands.add_parser("prefetch", help="show how much read latency the prefetching reader thread hides behind hashing")
+    prefetch.add_argument("--input", default=None, help="file to hash, ideally on the SD card (default: --size-mb of random bytes next to original.txt)")
+    prefetch.add_argument("--size-mb", type=int, default=64, help="size of the generated input when --input is not given")
+    prefetch.add_argument("--corpus", type=corpus_spec, default=None,
+                          help="seeded synthetic input PROFILE:SIZE[:SEED] in place of --input, e.g. ascii:64M (cached in corpus-cache/)")
+    prefetch.add_argument("--chunk-size", type=int, default=65536, help="chunk size in bytes, hashlib only drops the GIL above 2 KB")
+    prefetch.add_argument("--depths", type=sizes, default=[2, DEFAULT_PREFETCH_DEPTH, 8], help="comma separated ring depths to try")
+    prefetch.add_argument("--repeat", type=int, default=3, help="runs per setting, the best one is reported")
+    prefetch.add_argument("--warm", action="store_true", help="leave the file in the page cache instead of dropping it before each run")
+    prefetch.set_defaults(run=run_prefetch)
+
+    chunk_store = commands.add_parser("chunk-store", help="compare one file per chunk against the packed chunk store the receiver writes")
+    chunk_store.add_argument("--chunks", type=int, default=10000, help="number of chunks to write")
+    chunk_store.add_argument("--chunk-size", type=int, default=4096, help="chunk size in bytes")
+    chunk_store.add_argument("--reads", type=int, default=10000, help="random single-chunk reads after writing")
+    chunk_store.add_argument("--seed", type=int, default=0, help="seed for the random read order")
+    chunk_store.add_argument("--directory", default=None, help="where to write, ideally the receiver's SD card (default: next to original.txt)")
+    chunk_store.set_defaults(run=run_chunk_store)
+
+    autotune = commands.add_parser("autotune", help="sweep chunk size and socket buffers over loopback, save the best per board")
+    autotune.add_argument("--input", default=None, help="file to transfer (default: --size-mb of random bytes)")
+    autotune.add_argument("--size-mb", type=int, default=16, help="size of the generated input when --input is not given")
+    autotune.add_argument("--corpus", type=corpus_spec, default=None,
+                          help="seeded synthetic input PROFILE:SIZE[:SEED] in place of --input, e.g. ascii:64M (cached in corpus-cache/)")
+    autotune.add_argument("--chunk-sizes", type=sizes, default=list(AUTOTUNE_CHUNK_SIZES), help="comma separated chunk sizes to try")
+    autotune.add_argument("--recv-buffers", type=sizes, default=list(AUTOTUNE_RECV_BUFFERS), help="comma separated receiver recv buffer sizes to try")
+    autotune.add_argument("--socket-buffers", type=sizes, default=list(AUTOTUNE_SOCKET_BUFFERS),
+                          help="comma separated SO_SNDBUF/SO_RCVBUF sizes to try, 0 is the kernel default")
+    autotune.add_argument("--streams", type=sizes, default=[1], help="comma separated TCP stream counts to try, e.g. 1,2,4 (SHA-1-Transmitter.py --streams)")
+    autotune.add_argument("--repeat", type=int, default=3, help="runs per setting, the fastest one is kept")
+    autotune.add_argument("--board", default=None, help="board name or device menu number to save the profile under (default: detected board name)")
+    autotune.add_argument("--profile", default=DEFAULT_PROFILE_PATH, help="profile file to update")
+    autotune.add_argument("--no-save", action="store_true", help="only print the sweep, leave the profile file alone")
+    autotune.set_defaults(run=run_autotune)
+
+    harness = commands.add_parser("harness", help="unattended warmup + measured runs of one workload, statistics written as JSON")
+    harness.add_argument("--workload", choices=["hash-" + name for name in HASH_PATHS] + ["loopback", "stream"], default="hash-read",
+                         help="hash a file locally, stream it over loopback, or stream it to --peer")
+    harness.add_argument("--input", default=original_txt_file_path, help="file to hash or send (default: original.txt)")
+    harness.add_argument("--corpus", type=corpus_spec, default=None,
+                         help="seeded synthetic input PROFILE:SIZE[:SEED] in place of --input, e.g. ascii:64M (cached in corpus-cache/)")
+    harness.add_argument("--chunk-size", type=int, default=None, help="chunk size in bytes (default: this board's autotune profile, else 4096)")
+    harness.add_argument("--algorithm", type=hash_algorithm_spec, default="sha1", help="hashlib algorithm for the hash-* workloads (" + ", ".join(HASH_ALGORITHMS) + ")")
+    harness.add_argument("--board", default=None, help="board name or device menu number (default: detected board name)")
+    harness.add_argument("--peer", default=None, help="receiver address for the stream workload")
+    harness.add_argument("--port", type=int, default=PROTOCOL_PORT, help="receiver port for the stream workload")
+    harness.add_argument("--streams", type=int, default=1, help="TCP connections to stripe the loopback/stream workloads over")
+    harness.add_argument("--power-source", type=power_source_spec, default="none",
+                         help="none, or a telemetry source (hwmon[:NAME], ina3221[:RAIL], power-supply[:NAME], serial:PATH, replay:FILE.csv) for J/MB")
+    harness.add_argument("--power-hz", type=float, default=DEFAULT_POWER_HZ, help="polling rate for the power source")
+    harness.add_argument("--warmup", type=int, default=3, help="untimed runs before measuring")
+    harness.add_argument("--runs", type=int, default=30, help="measured runs")
+    harness.add_argument("--output", default=None, help="JSON output path, - for stdout (default: benchmark-results/<board>-<workload>-<time>.json)")
+    harness.add_argument("--no-profile", action="store_true", help="ignore this board's autotune profile")
+    harness.set_defaults(run=run_harness)
+
+    algorithm_list = lambda text: [name.strip() for name in text.split(",") if name.strip()]
+    algorithms = commands.add_parser("algorithms", help="every hashlib algorithm through the same hashing path: MB/s, cycles/byte and J/MB")
+    algorithms.add_argument("--algorithms", type=algorithm_list, default=list(HASH_ALGORITHMS),
+                            help="comma separated algorithms to compare (default: " + ",".join(HASH_ALGORITHMS) + ")")
+    algorithms.add_argument("--input", default=None, help="file to hash (default: --corpus " + DEFAULT_ALGORITHM_CORPUS + ")")
+    algorithms.add_argument("--corpus", type=corpus_spec, default=None,
+                            help="seeded synthetic input PROFILE:SIZE[:SEED] in place of --input (cached in corpus-cache/)")
+    algorithms.add_argument("--path", choices=list(HASH_PATHS), default="read", help="hashing path every algorithm runs through")
+    algorithms.add_argument("--chunk-size", type=int, default=None, help="chunk size in bytes (default: this board's autotune profile, else 4096)")
+    algorithms.add_argument("--board", default=None, help="board name or device menu number (default: detected board name)")
+    algorithms.add_argument("--power-source", type=power_source_spec, default="none",
+                            help="none, or a telemetry source (hwmon[:NAME], ina3221[:RAIL], power-supply[:NAME], serial:PATH, replay:FILE.csv) for J/MB")
+    algorithms.add_argument("--power-hz", type=float, default=DEFAULT_POWER_HZ, help="polling rate for the power source")
+    algorithms.add_argument("--sample-hz", type=float, default=ALGORITHM_SAMPLE_HZ, help="CPU clock sampling rate for cycles/byte")
+    algorithms.add_argument("--warmup", type=int, default=1, help="untimed runs per algorithm")
+    algorithms.add_argument("--runs", type=int, default=5, help="measured runs per algorithm, the median is reported")
+    algorithms.add_argument("--output", default=None, help="JSON output path, - for stdout (default: benchmark-results/<board>-algorithms-<time>.json)")
+    algorithms.add_argument("--no-profile", action="store_true", help="ignore this board's autotune profile")
+    algorithms.set_defaults(run=run_algorithms)
+
+    numpy_sha1 = commands.add_parser("numpy-sha1", help="SHA-1 over many messages at once as NumPy uint32 lanes against hashlib per message")
+    numpy_sha1.add_argument("--sizes", type=sizes, default=[64, 1024, 4096], help="comma separated message sizes in bytes")
+    numpy_sha1.add_argument("--messages", type=sizes, default=[256, 4096], help="comma separated batch sizes (messages hashed at once)")
+    numpy_sha1.add_argument("--repeat", type=int, default=3, help="runs per setting, the best one is reported")
+    numpy_sha1.add_argument("--validate", type=int, default=1000, help="random-length messages checked against hashlib before timing")
+    numpy_sha1.add_argument("--seed", type=int, default=0, help="seed for the message bytes")
+    numpy_sha1.set_defaults(run=run_numpy_sha1)
+
+    e2e = commands.add_parser("e2e", help="run the receiver and transmitter as two processes over 127.0.0.1, end-to-end MB/s and per-phase latency")
+    e2e.add_argument("--input", default=None, help="file to send (default: --size-mb of the seeded ascii corpus)")
+    e2e.add_argument("--size-mb", type=int, default=64, help="size of the ascii corpus sent when --input and --corpus are not given")
+    e2e.add_argument("--corpus", type=corpus_spec, default=None,
+                     help="seeded synthetic input PROFILE:SIZE[:SEED] in place of --input, e.g. ascii:64M (cached in corpus-cache/)")
+    e2e.add_argument("--runs", type=int, default=3, help="full hash -> transfer -> verify cycles, the median is reported")
+    e2e.add_argument("--rx-args", default="", help="extra SHA-1-Receiver.py options, given with = since they start with a dash: --rx-args=\"--verify-on-receive\"")
+    e2e.add_argument("--tx-args", default="", help="extra SHA-1-Transmitter.py options, e.g. --tx-args=\"--stream --streams 2\"")
+    e2e.add_argument("--board", default=None, help="board name or device menu number passed to both scripts (default: detected board name)")
+    e2e.add_argument("--timeout", type=float, default=600.0, help="seconds to wait for each process")
+    e2e.add_argument("--top", type=int, default=5, help="slowest span names listed per side")
+    e2e.add_argument("--directory", default=None, help="where the per-run work directories go (default: the system temp directory)")
+    e2e.add_argument("--keep", action="store_true", help="keep each run's files, logs and merged trace")
+    e2e.add_argument("--output", default=None, help="JSON output path, - for stdout (default: benchmark-results/<board>-e2e-<time>.json)")
+    e2e.set_defaults(run=run_e2e)
+
+    trace_merge = commands.add_parser("trace-merge", help="combine --trace files from the transmitter and receiver into one timeline")
+    trace_merge.add_argument("traces", nargs="+", help="Chrome trace JSON files written with --trace")
+    trace_merge.add_argument("--output", default=merged_trace_json_file_path, help="merged trace path (default: SHA-1-trace.json)")
+    trace_merge.set_defaults(run=run_trace_merge)
+
+    return parser.parse_args(argv)
+
+
+
+#################################################################################################################
+if __name__ == "__main__":
+    arguments = parse_args()
+    arguments.run(arguments)
+    sys.exit(0)
@@ -0,0 +1,152 @@
+####################################################################################
+###                                                                              ###
+###               ECE 4300 - Computer Architecture Spring 2022                   ###
+###   Term Project: SHA-1 Algorithm Performance on Multiple Embedded Platforms   ###
+###                                                                              ###
+###                          Persistent Digest Cache                             ###
+###                                                                              ###
+###            By: Derek Mata, Christopher Yamada, Elizabeth Hwang               ###
+###                                                                              ###
+####################################################################################
+
+# Small SQLite file next to hashes.txt holding the per-chunk digests of every input
+# the transmitter has hashed. An entry is keyed by the file's real path, CHUNK_SIZE
+# and digest mode, and is only trusted while the file's size and mtime are unchanged.
+#
+#   hit     size and mtime match, every digest is reused and nothing is hashed
+#   append  the file grew and the mode uses independent (leaf) digests, the cached
+#           chunks are rehashed and their digests reused up to the first one that
+#           changed (the last one may have been partial, so it is always hashed again)
+#   miss    anything else, the file is hashed from scratch
+#
+# Running ("chain") digests cannot resume from the middle because hashlib state can't
+# be saved, so an appended file in chain mode is a miss. The total size of the stored
+# digests is bounded and the least recently used entries are evicted first.
+
+# General python libraries
+import os
+import time
+import sqlite3
+
+# Hashing library
+import hashlib
+
+
+
+# Default location of the cache, next to hashes.txt
+HOME_DIR = os.path.dirname(__file__)
+DEFAULT_CACHE_PATH = os.path.abspath(os.path.join(HOME_DIR, "sha1-digest-cache.sqlite3"))
+
+# Default upper bound on the digest bytes kept in the cache
+DEFAULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Size of one stored SHA-1 digest
+DIGEST_SIZE = 20
+
+# Digest modes the transmitter caches (running vs independent digests, text vs binary reads)
+CACHE_MODES = ("chain-text", "leaf-text", "chain-binary", "leaf-binary")
+
+
+
+#################################
+#                               #
+#          DIGEST CACHE         #
+#                               #
+#################################
+class DigestCache:
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.cache_path = cache_path
+        self.max_bytes = max_bytes
+        self.connection = sqlite3.connect(cache_path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS digests ("
+            " path TEXT NOT NULL, chunk_size INTEGER NOT NULL, mode TEXT NOT NULL,"
+            " size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, chunk_count INTEGER NOT NULL,"
+            " digests BLOB NOT NULL, last_used REAL NOT NULL,"
+            " PRIMARY KEY (path, chunk_size, mode))")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS digests_lru ON digests (last_used)")
+        self.connection.commit()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    # Look up the digests for a file, returns (status, digests) where status is "hit", "append" or "miss"
+    def lookup(self, file_path: str, chunk_size: int, mode: str) -> tuple:
+        if(mode not in CACHE_MODES):
+            raise Exception("DigestCache.lookup: mode only accepts " + ", ".join(CACHE_MODES))
+        path = os.path.realpath(file_path)
+        stat = os.stat(path)
+        row = self.connection.execute(
+            "SELECT size, mtime_ns, chunk_count, digests FROM digests WHERE path = ? AND chunk_size = ? AND mode = ?",
+            (path, chunk_size, mode)).fetchone()
+        if row is None:
+            return "miss", list()
+        size, mtime_ns, chunk_count, blob = row
+        digests = [bytes(blob[i:i + DIGEST_SIZE]) for i in range(0, chunk_count * DIGEST_SIZE, DIGEST_SIZE)]
+        if(size == stat.st_size and mtime_ns == stat.st_mtime_ns):
+            status = "hit"
+        elif(stat.st_size > size and mode.startswith("leaf") and chunk_count > 1):
+            # Size and mtime say nothing about the old bytes of a grown file, so every reused chunk is checked
+            digests = matching_prefix(path, chunk_size, digests[:-1], text=mode.endswith("text"))
+            status = "append" if digests else "miss"
+        else:
+            status = "miss"
+        if(status == "miss"):
+            return "miss", list()
+        
+        # Only an entry that is actually reused counts as recently used
+        self.connection.execute(
+            "UPDATE digests SET last_used = ? WHERE path = ? AND chunk_size = ? AND mode = ?",
+            (time.time(), path, chunk_size, mode))
+        self.connection.commit()
+        return status, digests
+
+    # Store (or replace) the digests for a file, then evict old entries if over the size bound
+    def store(self, file_path: str, chunk_size: int, mode: str, digests) -> None:
+        if(mode not in CACHE_MODES):
+            raise Exception("DigestCache.store: mode only accepts " + ", ".join(CACHE_MODES))
+        path = os.path.realpath(file_path)
+        stat = os.stat(path)
+        blob = b"".join(digests)
+        if(len(blob) > self.max_bytes):
+            return
+        self.connection.execute(
+            "INSERT OR REPLACE INTO digests (path, chunk_size, mode, size, mtime_ns, chunk_count, digests, last_used)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, chunk_size, mode, stat.st_size, stat.st_mtime_ns, len(digests), blob, time.time()))
+        self.connection.commit()
+        self.evict()
+
+    # Drop least recently used entries until the stored digests fit in max_bytes
+    def evict(self) -> int:
+        evicted = 0
+        total = self.connection.execute("SELECT COALESCE(SUM(LENGTH(digests)), 0) FROM digests").fetchone()[0]
+        while(total > self.max_bytes):
+            row = self.connection.execute(
+                "SELECT path, chunk_size, mode, LENGTH(digests) FROM digests ORDER BY last_used ASC LIMIT 1").fetchone()
+            if row is None:
+                break
+            self.connection.execute(
+                "DELETE FROM digests WHERE path = ? AND chunk_size = ? AND mode = ?", (row[0], row[1], row[2]))
+            total -= row[3]
+            evicted += 1
+        self.connection.commit()
+        return evicted
+
+
+#################################
+#                               #
+#         PREFIX CHECK          #
+#                               #
+#################################
+# Leading `digests` that still match the file's chunks, read the way the transmitter reads them
+# (binary, or text chunks of `chunk_size` characters). Stops at the first chunk that changed.
+def matching_prefix(file_path: str, chunk_size: int, digests, text=False) -> list:
+    with open(file_path, "r" if text else "rb") as file:
+        for index in range(len(digests)):
+            chunk = file.read(chunk_size)
+            if text:
+                chunk = bytes(chunk, "ascii")
+            if(hashlib.sha1(chunk).digest() != digests[index]):
+                return digests[:index]
+    return digests
@@ -0,0 +1,191 @@
+####################################################################################
+###                                                                              ###
+###               ECE 4300 - Computer Architecture Spring 2022                   ###
+###   Term Project: SHA-1 Algorithm Performance on Multiple Embedded Platforms   ###
+###                                                                              ###
+###                           Packed Chunk Store                                 ###
+###                                                                              ###
+###            By: Derek Mata, Christopher Yamada, Elizabeth Hwang               ###
+###                                                                              ###
+####################################################################################
+
+# chunks.dat holds every received chunk back to back in arrival order. chunks.idx is an
+# 8 byte header followed by one fixed-width entry per chunk:
+#
+#    0      4         5         8               16          20
+#   +------+---------+---------+---------------+-----------+---------------+----
+#   | S1CX | version | padding | offset 0 (8B) | length 0  | offset 1 (8B) | ...
+#   +------+---------+---------+---------------+-----------+---------------+----
+#
+# so the entry for chunk N sits at 8 + 12*N and the chunk itself is one slice of the
+# memory-mapped data file: no directory lookups, no open() per chunk and O(1) access
+# to any N. Both files are only ever appended to, a writer killed halfway leaves at
+# most a partial last entry, which is ignored on open. This replaces the one file
+# per chunk that associative-hashes/text-of-hashes-N.txt used to be, thousands of
+# tiny files are slow to create on an SD card.
+
+# General python libraries
+import os
+import mmap
+import struct
+
+
+
+# File identification
+INDEX_MAGIC = b"S1CX"
+INDEX_VERSION = 1
+
+# Index layout (see diagram above), all fields big endian
+INDEX_HEADER = struct.Struct("!4sB3x")
+INDEX_ENTRY = struct.Struct("!QI")
+
+
+
+#################################
+#                               #
+#          STORE WRITER         #
+#                               #
+#################################
+class ChunkStoreWriter:
+    # Start a new store, or keep appending to an existing one when truncate is False
+    def __init__(self, data_path: str, index_path: str, truncate=True):
+        self.data_path = data_path
+        self.index_path = index_path
+        self.count = 0
+        if(truncate or not os.path.exists(index_path)):
+            self.data_file = open(data_path, "w+b")
+            self.index_file = open(index_path, "wb")
+            self.index_file.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION))
+            self.offset = 0
+            return
+        # Drop a partial last entry, then carry on after the last whole chunk
+        self.count = read_index_count(index_path)
+        self.index_file = open(index_path, "r+b")
+        self.index_file.truncate(INDEX_HEADER.size + self.count * INDEX_ENTRY.size)
+        self.index_file.seek(0, os.SEEK_END)
+        self.offset = 0
+        if self.count:
+            self.index_file.seek(-INDEX_ENTRY.size, os.SEEK_END)
+            last_offset, last_length = INDEX_ENTRY.unpack(self.index_file.read(INDEX_ENTRY.size))
+            self.offset = last_offset + last_length
+        self.data_file = open(data_path, "r+b" if os.path.exists(data_path) else "wb")
+        self.data_file.truncate(self.offset)
+        self.data_file.seek(self.offset)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    # Append one chunk, returns its index
+    def append(self, chunk) -> int:
+        self.data_file.write(chunk)
+        self.index_file.write(INDEX_ENTRY.pack(self.offset, len(chunk)))
+        self.offset += len(chunk)
+        self.count += 1
+        return self.count - 1
+
+    # `length` bytes of chunk data at `offset`, read back before the store is closed
+    def read(self, offset: int, length: int) -> bytes:
+        self.data_file.seek(offset)
+        data = self.data_file.read(length)
+        self.data_file.seek(self.offset)
+        return data
+
+    # Overwrite chunk data at `offset` in place with a chunk of the same length (a repaired chunk)
+    def rewrite(self, offset: int, chunk) -> None:
+        if(offset + len(chunk) > self.offset):
+            raise Exception("ChunkStoreWriter.rewrite: " + str(len(chunk)) + " bytes at offset " + str(offset) + " run past the " + str(self.offset) + " bytes written")
+        self.data_file.seek(offset)
+        self.data_file.write(chunk)
+        self.data_file.seek(self.offset)
+
+    # Data first, so a closed store never has an index entry pointing past its data
+    def close(self) -> None:
+        if self.data_file.closed:
+            return
+        self.data_file.close()
+        self.index_file.close()
+
+############################
+
+# Whole entries in an index file, after checking its header
+def read_index_count(index_path: str) -> int:
+    with open(index_path, "rb") as file:
+        header = file.read(INDEX_HEADER.size)
+    if(len(header) < INDEX_HEADER.size):
+        raise Exception("read_index_count: " + index_path + " is too short for the index header")
+    magic, version = INDEX_HEADER.unpack(header)
+    if(magic != INDEX_MAGIC):
+        raise Exception("read_index_count: " + index_path + " is not a chunk store index (magic " + str(magic) + ")")
+    if(version != INDEX_VERSION):
+        raise Exception("read_index_count: unsupported chunk store index version " + str(version))
+    return (os.path.getsize(index_path) - INDEX_HEADER.size) // INDEX_ENTRY.size
+
+
+#################################
+#                               #
+#          STORE READER         #
+#                               #
+#################################
+# Read-only view of a store, both files memory-mapped. store[n] is a memoryview of chunk n
+# straight out of the page cache, release it (or let it go) before closing the store.
+class ChunkStore:
+    def __init__(self, data_path: str, index_path: str):
+        self.data_path = data_path
+        self.index_path = index_path
+        self.count = read_index_count(index_path)
+        self.index_file = open(index_path, "rb")
+        self.data_file = open(data_path, "rb")
+        # A zero-length file cannot be mapped, an empty store just has nothing to slice
+        self.index_map = mmap.mmap(self.index_file.fileno(), 0, access=mmap.ACCESS_READ) if self.count else b""
+        data_size = os.path.getsize(data_path)
+        self.data_map = mmap.mmap(self.data_file.fileno(), 0, access=mmap.ACCESS_READ) if data_size else b""
+        self.data_view = memoryview(self.data_map)
+        if(self.count and sum(self.entry(self.count - 1)) > data_size):
+            raise Exception("ChunkStore: index points past the " + str(data_size) + " bytes in " + data_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    # (offset, length) of chunk `index` in the data file
+    def entry(self, index: int) -> tuple:
+        if(index < 0 or index >= self.count):
+            raise IndexError("ChunkStore: chunk " + str(index) + " out of range (" + str(self.count) + " chunks)")
+        return INDEX_ENTRY.unpack_from(self.index_map, INDEX_HEADER.size + index * INDEX_ENTRY.size)
+
+    # Chunk `index` as a memoryview of the mapped data file
+    def __getitem__(self, index: int):
+        offset, length = self.entry(index)
+        return self.data_view[offset:offset + length]
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
+
+    # Bytes of chunk data in the store
+    def data_bytes(self) -> int:
+        return len(self.data_map)
+
+    def close(self) -> None:
+        self.data_view.release()
+        for mapping in (self.data_map, self.index_map):
+            if isinstance(mapping, mmap.mmap):
+                mapping.close()
+        self.data_file.close()
+        self.index_file.close()
+
+    # One line description for results.txt
+    def summary(self) -> str:
+        return (str(self.count) + " chunks, " + str(self.data_bytes()) + " bytes in " + os.path.basename(self.data_path)
+                + " + " + str(INDEX_HEADER.size + self.count * INDEX_ENTRY.size) + " byte index " + os.path.basename(self.index_path))
@@ -0,0 +1,265 @@
+####################################################################################
+###                                                                              ###
+###               ECE 4300 - Computer Architecture Spring 2022                   ###
+###   Term Project: SHA-1 Algorithm Performance on Multiple Embedded Platforms   ###
+###                                                                              ###
+###                         On-the-Wire Chunk Compression                        ###
+###                                                                              ###
+###            By: Derek Mata, Christopher Yamada, Elizabeth Hwang               ###
+###                                                                              ###
+####################################################################################
+
+# `SHA-1-Transmitter.py --compress zlib:6,lzma` offers codecs in order of preference
+# with a COMPRESS frame before the first manifest or chunk. The receiver answers with
+# the first one it accepts (`--accept-compression`, default every codec this Python
+# was built with) or "none", so a board whose Python lacks _lzma or _bz2 still talks
+# to everyone.
+#
+# Every CHUNK frame is compressed on its own, so repairs, striping and the staged
+# send.txt frames work as before. A chunk that does not get smaller is sent raw, and
+# only frames that really are compressed carry FLAG_COMPRESSED. Digests are always of
+# the raw chunk. A compressed frame may not decompress to more than max_output bytes
+# (MAX_FRAME_PAYLOAD, the largest raw frame), so a small payload cannot inflate into
+# gigabytes on the receiver. Both ends time their half: compress time and bytes saved
+# on the transmitter, decompress time on the receiver, so whether compression pays for
+# itself on a board and link can be read straight out of the two results.txt files.
+
+# General python libraries
+import time
+import zlib
+import importlib
+
+# Frame layer
+from sha1_protocol import FRAME_COMPRESS, FLAG_COMPRESSED, FRAME_TYPE_NAMES, MAX_FRAME_PAYLOAD, send_frame, expect_frame, read_frame_async, write_frame_async
+
+# Trace spans
+from sha1_trace import span
+
+
+
+# Supported codecs, with their default level and the valid level range
+CODEC_LEVELS = {
+    "zlib": (6, 0, 9),
+    "bz2": (9, 1, 9),
+    "lzma": (6, 0, 9),
+}
+
+# Spec meaning "send chunks raw"
+NO_COMPRESSION = "none"
+
+
+
+#################################
+#                               #
+#          CODEC SPECS          #
+#                               #
+#################################
+# Codec names this Python can actually use, zlib always, bz2 and lzma only if their C modules were built
+def available_codecs() -> list:
+    names = ["zlib"]
+    for name in ("bz2", "lzma"):
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+############################
+
+# (name, level) out of "zlib" or "zlib:1"
+def parse_codec_spec(spec: str) -> tuple:
+    name, _, level = spec.strip().partition(":")
+    if(name not in CODEC_LEVELS):
+        raise ValueError("unknown codec " + name + ", expected one of " + ", ".join(CODEC_LEVELS))
+    default, lowest, highest = CODEC_LEVELS[name]
+    if not level:
+        return name, default
+    if(not level.isdigit() or not lowest <= int(level) <= highest):
+        raise ValueError(name + " level has to be " + str(lowest) + "-" + str(highest) + ", not " + level)
+    return name, int(level)
+
+############################
+
+# argparse type for a comma separated codec list, "zlib:6,lzma" -> ["zlib:6", "lzma:6"]
+def codec_list_spec(text: str) -> list:
+    specs = list()
+    for spec in text.split(","):
+        if not spec.strip():
+            continue
+        if(spec.strip() == NO_COMPRESSION):
+            specs.append(NO_COMPRESSION)
+            continue
+        name, level = parse_codec_spec(spec)
+        specs.append(name + ":" + str(level))
+    return specs
+
+############################
+
+# argparse type for the codecs a receiver accepts, "zlib,lzma" -> ["zlib", "lzma"], "none" -> []
+def accepted_codecs_spec(text: str) -> list:
+    names = list()
+    for name in text.split(","):
+        name = name.strip()
+        if(not name or name == NO_COMPRESSION):
+            continue
+        if(name not in available_codecs()):
+            raise ValueError(name + " is not available in this Python, expected some of " + ", ".join(available_codecs()))
+        names.append(name)
+    return names
+
+############################
+
+# First offered spec whose codec is accepted, or "none"
+def choose_codec(offered, accepted) -> str:
+    for spec in offered:
+        if(spec != NO_COMPRESSION and parse_codec_spec(spec)[0] in accepted):
+            return spec
+    return NO_COMPRESSION
+
+
+#################################
+#                               #
+#          CHUNK CODEC          #
+#                               #
+#################################
+class ChunkCodec:
+    def __init__(self, spec: str, max_output=MAX_FRAME_PAYLOAD):
+        self.name, self.level = parse_codec_spec(spec)
+        self.max_output = max_output
+        module = importlib.import_module(self.name)
+        if(self.name == "lzma"):
+            self._compress = lambda data: module.compress(data, preset=self.level)
+            self._decompressor = module.LZMADecompressor
+        elif(self.name == "bz2"):
+            self._compress = lambda data: module.compress(data, compresslevel=self.level)
+            self._decompressor = module.BZ2Decompressor
+        else:
+            self._compress = lambda data: zlib.compress(data, self.level)
+            self._decompressor = zlib.decompressobj
+        self.frames = 0
+        self.compressed_frames = 0
+        self.raw_bytes = 0
+        self.wire_bytes = 0
+        self.compress_ns = 0
+        self.decompress_ns = 0
+
+    @property
+    def spec(self) -> str:
+        return self.name + ":" + str(self.level)
+
+    # (payload, flags) to send for a raw chunk, the chunk itself if compressing did not shrink it
+    def encode(self, chunk) -> tuple:
+        start = time.perf_counter_ns()
+        with span("compress chunk", "codec"):
+            compressed = self._compress(chunk)
+        self.compress_ns += time.perf_counter_ns() - start
+        self.frames += 1
+        self.raw_bytes += len(chunk)
+        if(len(compressed) >= len(chunk)):
+            self.wire_bytes += len(chunk)
+            return chunk, 0
+        self.compressed_frames += 1
+        self.wire_bytes += len(compressed)
+        return compressed, FLAG_COMPRESSED
+
+    # Raw chunk back out of a received payload
+    def decode(self, payload, flags: int):
+        self.frames += 1
+        self.wire_bytes += len(payload)
+        if not flags & FLAG_COMPRESSED:
+            self.raw_bytes += len(payload)
+            return payload
+        start = time.perf_counter_ns()
+        with span("decompress chunk", "codec"):
+            chunk = self._decompress_bounded(payload)
+        self.decompress_ns += time.perf_counter_ns() - start
+        self.compressed_frames += 1
+        self.raw_bytes += len(chunk)
+        return chunk
+
+    # Decompress one payload into at most max_output bytes. Output stops at the cap, so a stream that
+    # has not reached its end by then (zlib unconsumed_tail, bz2/lzma not eof) is rejected, as is
+    # anything trailing the end of the stream.
+    def _decompress_bounded(self, payload):
+        decompressor = self._decompressor()
+        chunk = decompressor.decompress(payload, max_length=self.max_output)
+        if(not decompressor.eof or getattr(decompressor, "unconsumed_tail", b"")):
+            raise Exception("ChunkCodec.decode: " + self.name + " frame of " + str(len(payload)) + " bytes decompresses to more than "
+                            + str(self.max_output) + " bytes (or is truncated), refusing it")
+        if decompressor.unused_data:
+            raise Exception("ChunkCodec.decode: " + str(len(decompressor.unused_data)) + " bytes after the end of the " + self.name + " stream")
+        return chunk
+
+    # Counters as a dict, for JSON reports
+    def report(self) -> dict:
+        saved = self.raw_bytes - self.wire_bytes
+        return {
+            "codec": self.spec,
+            "frames": self.frames,
+            "compressed_frames": self.compressed_frames,
+            "raw_bytes": self.raw_bytes,
+            "wire_bytes": self.wire_bytes,
+            "saved_bytes": saved,
+            "ratio": round(self.wire_bytes / self.raw_bytes, 4) if self.raw_bytes else 1.0,
+            "compress_sec": round(self.compress_ns / 1e9, 6),
+            "decompress_sec": round(self.decompress_ns / 1e9, 6),
+            "compress_MBps": round(self.raw_bytes / (self.compress_ns / 1e9) / 1e6, 3) if self.compress_ns else None,
+            "decompress_MBps": round(self.raw_bytes / (self.decompress_ns / 1e9) / 1e6, 3) if self.decompress_ns else None,
+        }
+
+    # Result lines for results.txt, only the time this end spent is listed
+    def summary_lines(self) -> list:
+        report = self.report()
+        lines = ["Compression " + report["codec"] + ": " + str(report["compressed_frames"]) + " of " + str(report["frames"])
+                 + " chunks compressed, " + str(report["raw_bytes"]) + " raw bytes sent as " + str(report["wire_bytes"])
+                 + " (saved " + str(report["saved_bytes"]) + " bytes, ratio " + str(report["ratio"]) + ")"]
+        if self.compress_ns:
+            lines.append("\tcompress time: " + str(report["compress_sec"]) + " s (" + str(report["compress_MBps"]) + " MB/s of raw chunks)")
+        if self.decompress_ns:
+            lines.append("\tdecompress time: " + str(report["decompress_sec"]) + " s (" + str(report["decompress_MBps"]) + " MB/s of raw chunks)")
+        return lines
+
+
+#################################
+#                               #
+#          NEGOTIATION          #
+#                               #
+#################################
+# Transmitter side: offer `specs` and wait for the receiver's pick, returns a ChunkCodec or None
+def offer_compression(sock, specs, flags=0):
+    send_frame(sock, FRAME_COMPRESS, bytes(",".join(specs), "ascii"), flags=flags)
+    _, _, _, payload = expect_frame(sock, FRAME_COMPRESS)
+    return accept_choice(payload, specs)
+
+############################
+
+# offer_compression for an asyncio StreamReader/StreamWriter pair
+async def offer_compression_async(reader, writer, specs, flags=0, timeout=None):
+    await write_frame_async(writer, FRAME_COMPRESS, bytes(",".join(specs), "ascii"), flags=flags)
+    frame = await read_frame_async(reader, timeout)
+    if(frame is None or frame[0] != FRAME_COMPRESS):
+        raise Exception("offer_compression_async: expected the receiver's COMPRESS answer but got "
+                        + ("a closed connection" if frame is None else FRAME_TYPE_NAMES[frame[0]]))
+    return accept_choice(frame[3], specs)
+
+############################
+
+# ChunkCodec for the receiver's answer to an offer of `specs`, None for "none"
+def accept_choice(payload, specs):
+    chosen = str(payload, "ascii")
+    if(chosen != NO_COMPRESSION and chosen not in specs):
+        raise Exception("accept_choice: receiver picked " + chosen + ", which was not offered")
+    print("Receiver picked " + ("no" if chosen == NO_COMPRESSION else chosen) + " compression")
+    if(chosen == NO_COMPRESSION):
+        return None
+    return ChunkCodec(chosen)
+
+############################
+
+# Receiver side: pick a codec for the offer in a COMPRESS frame, returns (reply payload, ChunkCodec or None)
+def answer_compression(offer_frame, accepted) -> tuple:
+    chosen = choose_codec(codec_list_spec(str(offer_frame[3], "ascii")), accepted)
+    if(chosen == NO_COMPRESSION):
+        return bytes(chosen, "ascii"), None
+    return bytes(chosen, "ascii"), ChunkCodec(chosen)
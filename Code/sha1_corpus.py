@@ -0,0 +1,281 @@
+####################################################################################
+###                                                                              ###
+###               ECE 4300 - Computer Architecture Spring 2022                   ###
+###   Term Project: SHA-1 Algorithm Performance on Multiple Embedded Platforms   ###
+###                                                                              ###
+###                           Synthetic Test Corpora                             ###
+###                                                                              ###
+###            By: Derek Mata, Christopher Yamada, Elizabeth Hwang               ###
+###                                                                              ###
+####################################################################################
+
+# original.txt is one sentence, it fits in a single chunk. These corpora are inputs from
+# a few KB to several GB, named PROFILE:SIZE[:SEED] (e.g. ascii:64M, binary:2G:7):
+#
+#   ascii        lines of English-looking words, what the text-mode transmitter expects
+#   binary       incompressible bytes
+#   repetitive   one 997 byte motif over and over, compresses to almost nothing
+#   small-files  a directory of 512 B - 16 KB text files adding up to SIZE
+#
+# Every byte comes out of SHAKE-128 keyed by the profile, the seed and the 1 MiB block
+# number, so the same spec gives the same bytes on every board and Python version (the
+# random module only promises that for random() itself). A corpus is generated once into
+# corpus-cache/ and reused after that. Its SHA-1 is kept in a .json file next to it, so
+# boards can compare one digest instead of shipping GBs around.
+
+# General python libraries
+import os
+import re
+import json
+import time
+import shutil
+
+# Hashing library
+import hashlib
+
+
+
+# Where generated corpora are kept
+HOME_DIR = os.path.dirname(__file__)
+DEFAULT_CORPUS_DIR = os.path.abspath(os.path.join(HOME_DIR, "corpus-cache"))
+
+# Bumped whenever a profile's bytes change, so stale cache entries are not reused
+CORPUS_VERSION = 1
+
+# Profiles, small-files is the only one that is a directory rather than one file
+CORPUS_PROFILES = ("ascii", "binary", "repetitive", "small-files")
+
+# Generation unit, every block is derived on its own
+BLOCK_SIZE = 1024 * 1024
+
+# Repetitive profile: the motif length is prime so it never lines up with a chunk size
+REPETITIVE_MOTIF_SIZE = 997
+
+# Small-files profile: file size range and files per subdirectory
+SMALL_FILE_MIN = 512
+SMALL_FILE_MAX = 16 * 1024
+SMALL_FILES_PER_DIR = 1000
+
+# ASCII profile: distinct lines to pick from (a power of two) and their word counts
+ASCII_LINE_COUNT = 4096
+ASCII_WORDS_PER_LINE = (6, 13)
+
+# 128 words, so one byte picks one word without bias
+ASCII_VOCABULARY = (
+    "the", "of", "and", "to", "in", "is", "that", "for", "it", "as", "was", "with", "be", "by", "on", "not",
+    "he", "this", "are", "or", "his", "from", "at", "which", "but", "have", "an", "had", "they", "you", "were", "their",
+    "one", "all", "we", "can", "her", "has", "there", "been", "if", "more", "when", "will", "would", "who", "so", "no",
+    "hash", "digest", "block", "chunk", "message", "padding", "word", "round", "rotate", "schedule", "state", "buffer", "cache", "memory", "table", "loop",
+    "processor", "core", "clock", "cycle", "pipeline", "branch", "register", "instruction", "latency", "throughput", "power", "voltage", "current", "board", "watt", "ampere",
+    "network", "packet", "socket", "frame", "receiver", "transmitter", "file", "stream", "byte", "bit", "integer", "constant", "function", "value", "array", "address",
+    "raspberry", "jetson", "nano", "python", "library", "kernel", "thread", "process", "timer", "sensor", "thermal", "frequency", "energy", "joule", "load", "store",
+    "fast", "slow", "small", "large", "first", "last", "new", "old", "same", "different", "every", "each", "other", "many", "some", "any",
+)
+
+# PROFILE:SIZE[:SEED] with SIZE in bytes or with a K/M/G (binary) suffix
+SIZE_PATTERN = re.compile(r"^(\d+)([KMG]?)(?:i?B)?$", re.IGNORECASE)
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+
+#################################
+#                               #
+#          CORPUS SPECS         #
+#                               #
+#################################
+# Bytes in "64M", "2G", "4096" or "512KiB"
+def parse_size(text: str) -> int:
+    match = SIZE_PATTERN.match(text.strip())
+    if match is None:
+        raise ValueError("bad size " + text + ", expected bytes or a number with a K/M/G suffix")
+    return int(match.group(1)) * SIZE_UNITS[match.group(2).upper()]
+
+############################
+
+# Shortest exact spelling of a size, 67108864 -> "64M"
+def format_size(size: int) -> str:
+    for suffix in ("G", "M", "K"):
+        if(size and size % SIZE_UNITS[suffix] == 0):
+            return str(size // SIZE_UNITS[suffix]) + suffix
+    return str(size)
+
+############################
+
+# argparse type for PROFILE:SIZE[:SEED], "ascii:64M" -> ("ascii", 67108864, 0)
+def corpus_spec(text: str) -> tuple:
+    parts = text.strip().split(":")
+    if(len(parts) not in (2, 3)):
+        raise ValueError("bad corpus " + text + ", expected PROFILE:SIZE[:SEED]")
+    profile = parts[0]
+    if(profile not in CORPUS_PROFILES):
+        raise ValueError("unknown corpus profile " + profile + ", expected one of " + ", ".join(CORPUS_PROFILES))
+    size = parse_size(parts[1])
+    if(size <= 0):
+        raise ValueError("corpus size has to be above 0")
+    if(len(parts) == 3 and not parts[2].isdigit()):
+        raise ValueError("corpus seed has to be a non-negative integer, not " + parts[2])
+    return profile, size, int(parts[2]) if len(parts) == 3 else 0
+
+############################
+
+# Cache entry name, "ascii-64M-seed0-v1"
+def corpus_name(profile: str, size: int, seed: int) -> str:
+    return profile + "-" + format_size(size) + "-seed" + str(seed) + "-v" + str(CORPUS_VERSION)
+
+
+#################################
+#                               #
+#          BYTE STREAMS         #
+#                               #
+#################################
+# `length` bytes of the stream for (label, seed, index)
+def shake_bytes(label: bytes, seed: int, index: int, length: int) -> bytes:
+    return hashlib.shake_128(label + b":" + seed.to_bytes(8, "big") + index.to_bytes(8, "big")).digest(length)
+
+############################
+
+# The ASCII_LINE_COUNT sentences ascii text is made of, each "Words like this.\n"
+def make_ascii_lines(seed: int) -> list:
+    low, high = ASCII_WORDS_PER_LINE
+    picks = shake_bytes(b"ascii-lines", seed, 0, ASCII_LINE_COUNT * (high + 1))
+    lines = list()
+    for line in range(ASCII_LINE_COUNT):
+        row = picks[line * (high + 1):(line + 1) * (high + 1)]
+        words = [ASCII_VOCABULARY[pick & 0x7F] for pick in row[1:1 + low + row[0] % (high - low + 1)]]
+        lines.append(bytes(" ".join(words).capitalize() + ".\n", "ascii"))
+    return lines
+
+############################
+
+# `length` bytes of text for block `index`, lines picked two stream bytes at a time
+def ascii_block(lines, label: bytes, seed: int, index: int, length: int) -> bytes:
+    shortest = min(len(line) for line in lines)
+    picks = shake_bytes(label, seed, index, 2 * (length // shortest + 1))
+    mask = len(lines) - 1
+    return b"".join([lines[((high << 8) | low) & mask] for high, low in zip(picks[0::2], picks[1::2])])[:length]
+
+############################
+
+# The blocks of a single-file profile, in order, adding up to exactly `size` bytes
+def iter_corpus_blocks(profile: str, size: int, seed: int):
+    lines = make_ascii_lines(seed) if profile == "ascii" else None
+    motif = shake_bytes(b"repetitive", seed, 0, REPETITIVE_MOTIF_SIZE) if profile == "repetitive" else None
+    for index in range((size + BLOCK_SIZE - 1) // BLOCK_SIZE):
+        length = min(BLOCK_SIZE, size - index * BLOCK_SIZE)
+        if(profile == "ascii"):
+            yield ascii_block(lines, b"ascii", seed, index, length)
+        elif(profile == "binary"):
+            yield shake_bytes(b"binary", seed, index, length)
+        elif(profile == "repetitive"):
+            # Carry on the motif where the previous block stopped
+            phase = (index * BLOCK_SIZE) % REPETITIVE_MOTIF_SIZE
+            yield (motif * (length // REPETITIVE_MOTIF_SIZE + 2))[phase:phase + length]
+        else:
+            raise Exception("iter_corpus_blocks: " + profile + " is not a single-file profile")
+
+############################
+
+# (relative path, bytes) of every small-files file, sizes add up to exactly `size`
+def iter_small_files(size: int, seed: int):
+    lines = make_ascii_lines(seed)
+    span = SMALL_FILE_MAX - SMALL_FILE_MIN + 1
+    written = 0
+    index = 0
+    sizes = b""
+    while(written < size):
+        # Two stream bytes per file size, drawn a batch at a time
+        if not sizes:
+            sizes = shake_bytes(b"small-files-sizes", seed, index // 4096, 2 * 4096)
+        length = min(SMALL_FILE_MIN + int.from_bytes(sizes[:2], "big") % span, size - written)
+        sizes = sizes[2:]
+        path = os.path.join("d" + str(index // SMALL_FILES_PER_DIR).zfill(4), "f" + str(index).zfill(7) + ".txt")
+        yield path, ascii_block(lines, b"small-files", seed, index, length)
+        written += length
+        index += 1
+
+
+#################################
+#                               #
+#          CORPUS CACHE         #
+#                               #
+#################################
+# Generate a corpus at `output_path`, returns its sidecar info (SHA-1 of the bytes in order, file count)
+def write_corpus(output_path: str, profile: str, size: int, seed: int) -> dict:
+    sha1 = hashlib.sha1()
+    files = 0
+    start = time.perf_counter()
+    if(profile == "small-files"):
+        for path, data in iter_small_files(size, seed):
+            file_path = os.path.join(output_path, path)
+            if not files % SMALL_FILES_PER_DIR:
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, "wb") as file:
+                file.write(data)
+            sha1.update(data)
+            files += 1
+    else:
+        with open(output_path, "wb") as file:
+            for block in iter_corpus_blocks(profile, size, seed):
+                file.write(block)
+                sha1.update(block)
+        files = 1
+    return {
+        "profile": profile,
+        "size": size,
+        "seed": seed,
+        "version": CORPUS_VERSION,
+        "files": files,
+        "sha1": sha1.hexdigest(),
+        "generate_sec": round(time.perf_counter() - start, 3),
+    }
+
+############################
+
+# Path of the cached corpus, generated first if it is not there yet. Returns (path, info, generated).
+# It is built under a .partial name and renamed once complete, so an interrupted run leaves no
+# half-written entry behind; the .json sidecar is written last and marks the entry as usable.
+def ensure_corpus(profile: str, size: int, seed=0, cache_dir=DEFAULT_CORPUS_DIR) -> tuple:
+    name = corpus_name(profile, size, seed)
+    output_path = os.path.join(cache_dir, name + ("" if profile == "small-files" else ".txt" if profile == "ascii" else ".bin"))
+    info_path = os.path.join(cache_dir, name + ".json")
+    if(os.path.exists(output_path) and os.path.exists(info_path)):
+        with open(info_path, "r") as file:
+            return output_path, json.load(file), False
+
+    os.makedirs(cache_dir, exist_ok=True)
+    partial_path = output_path + ".partial"
+    for stale_path in (partial_path, output_path):
+        if os.path.isdir(stale_path):
+            shutil.rmtree(stale_path)
+        elif os.path.exists(stale_path):
+            os.remove(stale_path)
+    info = write_corpus(partial_path, profile, size, seed)
+    os.rename(partial_path, output_path)
+    with open(info_path, "w") as file:
+        json.dump(info, file, indent=2)
+        file.write("\n")
+    return output_path, info, True
+
+############################
+
+# Every file of a corpus in generation order, one file for the single-file profiles
+def corpus_files(corpus_path: str) -> list:
+    if not os.path.isdir(corpus_path):
+        return [corpus_path]
+    return [os.path.join(corpus_path, directory, name)
+            for directory in sorted(os.listdir(corpus_path))
+            for name in sorted(os.listdir(os.path.join(corpus_path, directory)))]
+
+############################
+
+# Re-read a cached corpus from disk, returns (SHA-1 of its bytes in order, bytes, files)
+def hash_corpus(corpus_path: str, read_size=BLOCK_SIZE) -> tuple:
+    sha1 = hashlib.sha1()
+    size = 0
+    paths = corpus_files(corpus_path)
+    for path in paths:
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(read_size), b""):
+                sha1.update(block)
+                size += len(block)
+    return sha1.hexdigest(), size, len(paths)
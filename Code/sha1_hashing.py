@@ -0,0 +1,242 @@
+####################################################################################
+###                                                                              ###
+###               ECE 4300 - Computer Architecture Spring 2022                   ###
+###   Term Project: SHA-1 Algorithm Performance on Multiple Embedded Platforms   ###
+###                                                                              ###
+###                             Input Hashing Paths                              ###
+###                                                                              ###
+###            By: Derek Mata, Christopher Yamada, Elizabeth Hwang               ###
+###                                                                              ###
+####################################################################################
+
+# The original transmitter reads original.txt in text mode, so every 4096 character
+# chunk is decoded from the file and re-encoded with bytes(chunk, "ascii") before
+# sha1.update, and any non-ASCII byte stops the run. The binary paths here hand raw
+# bytes to hashlib instead, and the mmap path hands it memoryview slices of the
+# mapped file, so no chunk is ever copied into a Python object.
+#
+# The prefetch path overlaps the two halves of the loop. A reader thread readinto()s
+# the file into a small ring of preallocated bytearrays while the main thread hashes
+# the buffer before it. hashlib drops the GIL for buffers over 2 KB, so on a Pi the
+# SD card read of chunk i+1 runs while chunk i is being hashed.
+
+# General python libraries
+import os
+import mmap
+import queue
+import threading
+import contextlib
+
+# Hashing library
+import hashlib
+
+# Tracing spans for the reader thread
+from sha1_trace import span
+
+
+
+# Buffers in the prefetch ring, 2 is plain double buffering
+DEFAULT_PREFETCH_DEPTH = 4
+
+# hashlib algorithms the hashing stage can run. sha1 is what the project measures,
+# md5 is there as the cheap baseline.
+HASH_ALGORITHMS = ("sha1", "sha256", "sha512", "blake2b", "blake2s", "sha3_256", "md5")
+
+# Bytes per ring buffer, rounded down to whole chunks. Handing a buffer between threads
+# costs tens of microseconds, so each one carries many chunks instead of one.
+PREFETCH_BUFFER_SIZE = 1024 * 1024
+
+
+
+#################################
+#                               #
+#        CHUNK ITERATORS        #
+#                               #
+#################################
+# Yield bytes chunks from an open binary file
+def iter_file_chunks(file, chunk_size: int):
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+############################
+
+# Yield memoryview slices of a mapped file, each slice is released once the caller moves on
+def iter_view_chunks(view, chunk_size: int):
+    for offset in range(0, len(view), chunk_size):
+        with view[offset:offset + chunk_size] as chunk:
+            yield chunk
+
+############################
+
+# Fill `buffer` from `file`, short reads are retried so chunk boundaries stay put. Returns the bytes read.
+def read_fully(file, buffer) -> int:
+    filled = 0
+    with memoryview(buffer) as view:
+        while(filled < len(view)):
+            length = file.readinto(view[filled:])
+            if not length:
+                break
+            filled += length
+    return filled
+
+############################
+
+# Yield memoryview chunks of an open binary file, read ahead by a reader thread into a
+# ring of `depth` preallocated buffers. A chunk is only valid until the caller moves on
+# to the next buffer, which then goes back to the reader, so anything kept has to be copied.
+def iter_prefetched_chunks(file, chunk_size: int, depth=DEFAULT_PREFETCH_DEPTH, buffer_size=PREFETCH_BUFFER_SIZE):
+    if(depth < 2):
+        raise Exception("iter_prefetched_chunks: depth has to be at least 2 to overlap reads with hashing")
+    buffer_size = max(chunk_size, buffer_size - buffer_size % chunk_size)
+    buffers = [bytearray(buffer_size) for _ in range(depth)]
+    free_slots = queue.Queue()
+    filled_slots = queue.Queue()
+    for slot in range(depth):
+        free_slots.put(slot)
+
+    # Reader thread: take a free buffer, fill it, hand it over. None marks the end of the file.
+    def read_ahead():
+        try:
+            while True:
+                slot = free_slots.get()
+                if slot is None:
+                    return
+                with span("readinto", "io"):
+                    length = read_fully(file, buffers[slot])
+                if not length:
+                    filled_slots.put(None)
+                    return
+                filled_slots.put((slot, length))
+        except BaseException as e:
+            filled_slots.put(e)
+
+    reader = threading.Thread(target=read_ahead, name="chunk-reader", daemon=True)
+    reader.start()
+    try:
+        while True:
+            item = filled_slots.get()
+            if item is None:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            slot, length = item
+            with memoryview(buffers[slot]) as view:
+                for offset in range(0, length, chunk_size):
+                    with view[offset:min(offset + chunk_size, length)] as chunk:
+                        yield chunk
+            free_slots.put(slot)
+    finally:
+        # Also stops a reader that is still running because the caller stopped early
+        free_slots.put(None)
+        reader.join()
+
+############################
+
+# Map a whole file read-only and yield a memoryview over it (empty files cannot be mapped)
+@contextlib.contextmanager
+def mapped_file(file_path: str):
+    with open(file_path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if(size == 0):
+            yield memoryview(b"")
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+            # The whole file is read front to back, let the kernel read ahead aggressively
+            if hasattr(mapping, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                mapping.madvise(mmap.MADV_SEQUENTIAL)
+            view = memoryview(mapping)
+            try:
+                yield view
+            finally:
+                view.release()
+
+
+#################################
+#                               #
+#        HASH ALGORITHMS        #
+#                               #
+#################################
+# Fresh hashlib object for `algorithm`, the named constructors skip hashlib.new()'s lookup
+def new_hash(algorithm="sha1", data=b""):
+    return getattr(hashlib, algorithm)(data)
+
+############################
+
+# argparse type for --algorithm, also checks this Python can run it (md5 is disabled in FIPS builds)
+def hash_algorithm_spec(text: str) -> str:
+    if(text not in HASH_ALGORITHMS):
+        raise ValueError("unknown algorithm " + text + ", expected one of " + ", ".join(HASH_ALGORITHMS))
+    try:
+        new_hash(text)
+    except ValueError:
+        raise ValueError(text + " is not available in this Python's hashlib")
+    return text
+
+
+#################################
+#                               #
+#         HASHING PATHS         #
+#                               #
+#################################
+# Original text-mode loop: decode, re-encode as ASCII, running digest, one hex digest per chunk.
+# Every path hashes with SHA-1 unless given another of HASH_ALGORITHMS.
+def hash_text_mode(file_path: str, chunk_size: int, algorithm="sha1") -> list:
+    running = new_hash(algorithm)
+    digests = list()
+    with open(file_path, "r") as file:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            running.update(bytes(chunk, "ascii"))
+            digests.append(running.hexdigest())
+    return digests
+
+############################
+
+# Binary loop with buffered reads, one bytes copy per chunk but no decode or encode
+def hash_binary_read(file_path: str, chunk_size: int, algorithm="sha1") -> list:
+    running = new_hash(algorithm)
+    digests = list()
+    with open(file_path, "rb") as file:
+        for chunk in iter_file_chunks(file, chunk_size):
+            running.update(chunk)
+            digests.append(running.hexdigest())
+    return digests
+
+############################
+
+# Binary loop over the mapped file, hashlib reads straight out of the page cache
+def hash_mmap(file_path: str, chunk_size: int, algorithm="sha1") -> list:
+    running = new_hash(algorithm)
+    digests = list()
+    with mapped_file(file_path) as view:
+        for chunk in iter_view_chunks(view, chunk_size):
+            running.update(chunk)
+            digests.append(running.hexdigest())
+    return digests
+
+############################
+
+# Binary loop with a reader thread filling buffers ahead of the hasher
+def hash_prefetched(file_path: str, chunk_size: int, depth=DEFAULT_PREFETCH_DEPTH, algorithm="sha1") -> list:
+    running = new_hash(algorithm)
+    digests = list()
+    with open(file_path, "rb") as file:
+        for chunk in iter_prefetched_chunks(file, chunk_size, depth):
+            running.update(chunk)
+            digests.append(running.hexdigest())
+    return digests
+
+############################
+
+# Hashing paths by name, used by the --hash-path flag and the benchmark
+HASH_PATHS = {
+    "text": hash_text_mode,
+    "read": hash_binary_read,
+    "mmap": hash_mmap,
+    "prefetch": hash_prefetched,
+}
@@ -0,0 +1,153 @@
+####################################################################################
+###                                                                              ###
+###               ECE 4300 - Computer Architecture Spring 2022                   ###
+###   Term Project: SHA-1 Algorithm Performance on Multiple Embedded Platforms   ###
+###                                                                              ###
+###                          Binary Digest Manifest                              ###
+###                                                                              ###
+###            By: Derek Mata, Christopher Yamada, Elizabeth Hwang               ###
+###                                                                              ###
+####################################################################################
+
+# hashes.bin replaces the "\r"-joined hex of hashes.txt on the wire: a 20 byte header
+# followed by every raw digest back to back, half the bytes of the hex text and no
+# string per chunk on either side.
+#
+#    0      4        5          6             7      8            12            20
+#   +------+--------+----------+-------------+------+------------+-------------+----------------
+#   | S1MF | version| algorithm| digest size | mode | chunk size | chunk count | digests ...
+#   +------+--------+----------+-------------+------+------------+-------------+----------------
+#
+# Mode 0 is the transmitter's running digest after each chunk, mode 1 is one Merkle leaf
+# per chunk. All fields are big endian. Loading copies the digest block into a
+# DigestStore in one go, nothing is allocated per digest. hashes.txt is still written
+# next to it as a hex export for humans, and a hex manifest from an older transmitter
+# loads the same way.
+
+# General python libraries
+import struct
+
+# Fixed-width digest storage
+from sha1_verify import DigestStore
+
+
+
+# File identification
+MANIFEST_MAGIC = b"S1MF"
+MANIFEST_VERSION = 1
+
+# Header layout (see diagram above)
+MANIFEST_HEADER = struct.Struct("!4sBBBBIQ")
+MANIFEST_HEADER_SIZE = MANIFEST_HEADER.size
+
+# Digest modes
+MODE_CHAIN = 0
+MODE_TREE = 1
+
+# Algorithm ids in the header, with the digest size each one has. Ids are part of the
+# file format, a new algorithm gets the next free one.
+ALGORITHM_IDS = {"sha1": 1, "sha256": 2, "sha512": 3, "blake2b": 4, "blake2s": 5, "sha3_256": 6, "md5": 7}
+ALGORITHM_NAMES = {algorithm_id: name for name, algorithm_id in ALGORITHM_IDS.items()}
+ALGORITHM_DIGEST_SIZES = {"sha1": 20, "sha256": 32, "sha512": 64, "blake2b": 64, "blake2s": 32, "sha3_256": 32, "md5": 16}
+
+
+
+#################################
+#                               #
+#            MANIFEST           #
+#                               #
+#################################
+class Manifest:
+    def __init__(self, algorithm="sha1", chunk_size=0, tree=False, digests=None):
+        if(algorithm not in ALGORITHM_IDS):
+            raise Exception("Manifest: unknown algorithm " + str(algorithm))
+        self.algorithm = algorithm
+        self.chunk_size = chunk_size
+        self.tree = tree
+        self.digests = digests if digests is not None else DigestStore(ALGORITHM_DIGEST_SIZES[algorithm])
+        if(self.digests.digest_size != ALGORITHM_DIGEST_SIZES[algorithm]):
+            raise Exception("Manifest: " + algorithm + " digests are " + str(ALGORITHM_DIGEST_SIZES[algorithm]) + " bytes, not " + str(self.digests.digest_size))
+
+    def __len__(self) -> int:
+        return len(self.digests)
+
+    # Hex digest of chunk `index`, or "" past the end so a missing digest never matches
+    def hex(self, index: int) -> str:
+        if(index >= len(self.digests)):
+            return ""
+        return self.digests.hex(index)
+
+    # Header plus packed digests, exactly what goes into hashes.bin
+    def pack(self) -> bytes:
+        header = MANIFEST_HEADER.pack(MANIFEST_MAGIC, MANIFEST_VERSION, ALGORITHM_IDS[self.algorithm], self.digests.digest_size,
+                                      MODE_TREE if self.tree else MODE_CHAIN, self.chunk_size, len(self.digests))
+        return header + self.digests.data
+
+    # Write the binary manifest, replacing any older one
+    def save(self, output_path: str) -> None:
+        with open(output_path, "wb") as file:
+            file.write(self.pack())
+
+    # Write the human readable export, one "\r"-terminated hex digest per chunk like the old hashes.txt
+    def write_hex(self, output_path: str) -> None:
+        with open(output_path, "w") as file:
+            for index in range(len(self.digests)):
+                file.write(self.digests.hex(index))
+                file.write("\r")
+
+    # Manifest from a received or loaded buffer, binary (starts with the magic) or hex text
+    @classmethod
+    def from_bytes(cls, buffer, chunk_size=0, tree=False):
+        view = memoryview(buffer)
+        if(bytes(view[:len(MANIFEST_MAGIC)]) == MANIFEST_MAGIC):
+            return cls.from_binary(view)
+        return cls.from_text(view, chunk_size=chunk_size, tree=tree)
+
+    # Parse a binary manifest, the digest block is checked against the header and copied once
+    @classmethod
+    def from_binary(cls, buffer):
+        view = memoryview(buffer)
+        if(len(view) < MANIFEST_HEADER_SIZE):
+            raise Exception("Manifest.from_binary: " + str(len(view)) + " bytes is too short for the header")
+        magic, version, algorithm_id, digest_size, mode, chunk_size, count = MANIFEST_HEADER.unpack(view[:MANIFEST_HEADER_SIZE])
+        if(magic != MANIFEST_MAGIC):
+            raise Exception("Manifest.from_binary: bad magic " + str(magic))
+        if(version != MANIFEST_VERSION):
+            raise Exception("Manifest.from_binary: unsupported manifest version " + str(version))
+        if(algorithm_id not in ALGORITHM_NAMES):
+            raise Exception("Manifest.from_binary: unknown algorithm id " + str(algorithm_id))
+        if(digest_size != ALGORITHM_DIGEST_SIZES[ALGORITHM_NAMES[algorithm_id]]):
+            raise Exception("Manifest.from_binary: " + ALGORITHM_NAMES[algorithm_id] + " digests are "
+                            + str(ALGORITHM_DIGEST_SIZES[ALGORITHM_NAMES[algorithm_id]]) + " bytes, the header says " + str(digest_size))
+        if(len(view) - MANIFEST_HEADER_SIZE != count * digest_size):
+            raise Exception("Manifest.from_binary: header says " + str(count) + " digests of " + str(digest_size)
+                            + " bytes but " + str(len(view) - MANIFEST_HEADER_SIZE) + " bytes follow it")
+        digests = DigestStore.from_buffer(view[MANIFEST_HEADER_SIZE:], digest_size)
+        return cls(ALGORITHM_NAMES[algorithm_id], chunk_size, mode == MODE_TREE, digests)
+
+    # Parse a hex hashes.txt ("\r"-terminated lines), as sent by transmitters without binary manifests
+    @classmethod
+    def from_text(cls, buffer, chunk_size=0, tree=False, algorithm="sha1"):
+        digests = DigestStore(ALGORITHM_DIGEST_SIZES[algorithm])
+        for number, line in enumerate(bytes(buffer).split(b"\r")):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                digests.append(bytes.fromhex(str(line, "ascii")))
+            except ValueError as e:
+                raise Exception("Manifest.from_text: line " + str(number + 1) + " is not a " + algorithm + " hex digest: " + str(e))
+        return cls(algorithm, chunk_size, tree, digests)
+
+    # Load hashes.bin (or a hex hashes.txt, which does not record its chunk size or mode)
+    @classmethod
+    def load(cls, input_path: str, chunk_size=0, tree=False):
+        with open(input_path, "rb") as file:
+            return cls.from_bytes(file.read(), chunk_size=chunk_size, tree=tree)
+
+    # One line description for results.txt
+    def summary(self) -> str:
+        line = str(len(self.digests)) + " " + self.algorithm + (" leaf" if self.tree else " running") + " digests, "
+        if self.chunk_size:
+            line += str(self.chunk_size) + " byte chunks, "
+        return line + str(MANIFEST_HEADER_SIZE + len(self.digests.data)) + " byte manifest"
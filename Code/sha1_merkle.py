@@ -0,0 +1,121 @@
+####################################################################################
+###                                                                              ###
+###               ECE 4300 - Computer Architecture Spring 2022                   ###
+###   Term Project: SHA-1 Algorithm Performance on Multiple Embedded Platforms   ###
+###                                                                              ###
+###                          Merkle Tree Chunk Manifest                          ###
+###                                                                              ###
+###            By: Derek Mata, Christopher Yamada, Elizabeth Hwang               ###
+###                                                                              ###
+####################################################################################
+
+# The classic manifest is one running sha1 over every chunk, so chunk N can only be
+# checked after chunks 1..N-1. In tree mode every chunk (leaf) is hashed on its own,
+# which lets all cores hash at once, and the leaves are combined pairwise up to a root:
+#
+#   leaf   = SHA-1(chunk)                      (same value `sha1sum` gives for the chunk)
+#   parent = SHA-1(0x01 || left || right)
+#
+# A level with an odd number of nodes promotes its last node unchanged. The receiver
+# knows the leaf count, which fixes the shape of the tree, so a leaf can never be
+# re-read as an interior node.
+
+# Hashing library
+import hashlib
+
+# Pooled chunk hashing
+from sha1_verify import open_pool, map_chunks, sha1_digest
+
+
+
+# Prefix that separates interior nodes from leaves
+NODE_PREFIX = b"\x01"
+
+# Size of one SHA-1 digest in bytes
+DIGEST_SIZE = 20
+
+
+
+#################################
+#                               #
+#          TREE BUILDING        #
+#                               #
+#################################
+# Leaf digests (raw 20 bytes) of every chunk, hashed across the worker pool
+def hash_leaves(chunks, workers=None, use_processes=False) -> list:
+    pool = open_pool(workers, use_processes) if len(chunks) > 1 else None
+    if pool is None:
+        return [sha1_digest(chunk) for chunk in chunks]
+    with pool:
+        return map_chunks(pool, sha1_digest, chunks)
+
+############################
+
+# Combine two child digests into their parent
+def merkle_parent(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha1(NODE_PREFIX + left + right).digest()
+
+############################
+
+# Every level of the tree, leaves first and the root level last
+def merkle_levels(leaves) -> list:
+    levels = [list(leaves)]
+    while(len(levels[-1]) > 1):
+        level = levels[-1]
+        parents = [merkle_parent(level[i], level[i+1]) for i in range(0, len(level) - 1, 2)]
+        if(len(level) % 2 == 1):
+            parents.append(level[-1])
+        levels.append(parents)
+    return levels
+
+############################
+
+# Root digest of the tree, an empty input has the SHA-1 of no bytes as its root
+def merkle_root(leaves) -> bytes:
+    if not leaves:
+        return hashlib.sha1().digest()
+    return merkle_levels(leaves)[-1][0]
+
+
+#################################
+#                               #
+#      SUBRANGE VERIFICATION    #
+#                               #
+#################################
+# Sibling digests needed to rebuild the root from leaf `index`, as (sibling_is_left, digest) pairs
+def audit_path(levels, index: int) -> list:
+    path = list()
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if(sibling < len(level)):
+            path.append((sibling < index, level[sibling]))
+        index //= 2
+    return path
+
+############################
+
+# Check one leaf against the root using only its audit path
+def verify_audit_path(leaf: bytes, path, root: bytes) -> bool:
+    node = leaf
+    for sibling_is_left, sibling in path:
+        if sibling_is_left:
+            node = merkle_parent(sibling, node)
+        else:
+            node = merkle_parent(node, sibling)
+    return node == root
+
+############################
+
+# Verify chunks start..start+len(chunks)-1 on their own against the manifest leaves.
+# The leaves must already have been checked against the root (see leaves_match_root).
+def verify_subrange(chunks, start: int, leaves, workers=None, use_processes=False) -> list:
+    if(start < 0 or start + len(chunks) > len(leaves)):
+        raise Exception("verify_subrange: chunks " + str(start) + ".." + str(start + len(chunks) - 1) + " are outside the " + str(len(leaves)) + " leaf manifest")
+    digests = hash_leaves(chunks, workers=workers, use_processes=use_processes)
+    return [digests[i] == leaves[start + i] for i in range(len(digests))]
+
+############################
+
+# True if the manifest leaves really combine to the root the transmitter sent
+def leaves_match_root(leaves, root: bytes) -> bool:
+    return merkle_root(leaves) == root
@@ -0,0 +1,150 @@
+####################################################################################
+###                                                                              ###
+###               ECE 4300 - Computer Architecture Spring 2022                   ###
+###   Term Project: SHA-1 Algorithm Performance on Multiple Embedded Platforms   ###
+###                                                                              ###
+###                       Vectorized SHA-1 Reference Engine                      ###
+###                                                                              ###
+###            By: Derek Mata, Christopher Yamada, Elizabeth Hwang               ###
+###                                                                              ###
+####################################################################################
+
+# hashlib hands SHA-1 to OpenSSL, which picks SHA-NI, NEON/ARMv8 crypto or plain C for
+# us, so the boards' own ALUs never show up in the numbers. This is the textbook SHA-1
+# (FIPS 180-4) written out in Python with NumPy doing the arithmetic: many independent
+# messages are hashed at once, one uint32 lane per message,
+#
+#   W[t]    array of N words, message schedule word t of every message
+#   a .. e  arrays of N words, the working variables of every message
+#
+# so each of the 80 rounds is a handful of whole-array operations that NumPy runs as
+# SIMD loops over the lanes. Messages may have different lengths, a message that has
+# run out of blocks just stops taking part in the state update.
+#
+# It is slower than hashlib per byte, it exists to show how the compression function
+# itself scales with the ALU and vector unit. sha1_batch() is checked bit for bit
+# against hashlib.sha1 by validate_against_hashlib().
+
+# Vector arithmetic
+import numpy as np
+
+# Reference implementation
+import hashlib
+
+
+
+# Initial hash value H0..H4
+INITIAL_STATE = np.array([0x67452301, 0xEFCDAB89, 0x98BADCFE, 0x10325476, 0xC3D2E1F0], dtype=np.uint32)
+
+# Round constants for rounds 0-19, 20-39, 40-59 and 60-79
+ROUND_CONSTANTS = (np.uint32(0x5A827999), np.uint32(0x6ED9EBA1), np.uint32(0x8F1BBCDC), np.uint32(0xCA62C1D6))
+
+# SHA-1 block and digest sizes in bytes
+BLOCK_BYTES = 64
+DIGEST_BYTES = 20
+
+# Message lengths validate_against_hashlib always covers, every padding edge case
+# (0x80 and the 8 byte length fitting in the last block or spilling into a new one)
+PADDING_EDGE_LENGTHS = (0, 1, 55, 56, 57, 63, 64, 65, 119, 120, 127, 128, 129)
+
+
+
+#################################
+#                               #
+#            PADDING            #
+#                               #
+#################################
+# Pad every message (bytes-like) into whole 64 byte blocks: the message, 0x80, zeros and the
+# message length in bits as a big endian 64 bit integer. Returns (uint32 array of shape
+# (messages, blocks, 16) holding the big endian words, blocks used by each message).
+def pad_messages(messages) -> tuple:
+    count = len(messages)
+    lengths = np.fromiter((len(message) for message in messages), dtype=np.int64, count=count)
+    block_counts = (lengths + 9 + BLOCK_BYTES - 1) // BLOCK_BYTES
+    max_blocks = int(block_counts.max()) if count else 0
+    padded = np.zeros((count, max_blocks * BLOCK_BYTES), dtype=np.uint8)
+    if(count and (lengths == lengths[0]).all()):
+        # Same-length batch, one copy for all of them
+        padded[:, :lengths[0]] = np.frombuffer(b"".join(messages), dtype=np.uint8).reshape(count, int(lengths[0]))
+    else:
+        for lane in range(count):
+            padded[lane, :lengths[lane]] = np.frombuffer(messages[lane], dtype=np.uint8)
+    lanes = np.arange(count)
+    padded[lanes, lengths] = 0x80
+    bit_lengths = (lengths * 8).astype(">u8").view(np.uint8).reshape(count, 8)
+    padded[lanes[:, None], (block_counts * BLOCK_BYTES - 8)[:, None] + np.arange(8)] = bit_lengths
+    words = padded.view(">u4").astype(np.uint32).reshape(count, max_blocks, BLOCK_BYTES // 4)
+    return words, block_counts
+
+
+#################################
+#                               #
+#       COMPRESSION ROUNDS      #
+#                               #
+#################################
+# x rotated left by `bits`, lane by lane
+def rotl(x, bits: int):
+    return (x << bits) | (x >> (32 - bits))
+
+############################
+
+# Run the compression function over every block of every lane, returns the (5, lanes) final state.
+# Lane i only absorbs its first block_counts[i] blocks.
+def sha1_lanes(words, block_counts):
+    count, max_blocks, _ = words.shape
+    state = np.repeat(INITIAL_STATE[:, None], count, axis=1)
+    schedule = np.empty((80, count), dtype=np.uint32)
+    for block in range(max_blocks):
+        # Message schedule: the block's 16 words, then W[t] = rotl1(W[t-3] ^ W[t-8] ^ W[t-14] ^ W[t-16])
+        schedule[:16] = words[:, block, :].T
+        for t in range(16, 80):
+            schedule[t] = rotl(schedule[t - 3] ^ schedule[t - 8] ^ schedule[t - 14] ^ schedule[t - 16], 1)
+
+        a, b, c, d, e = state.copy()
+        for t in range(80):
+            if(t < 20):
+                f = d ^ (b & (c ^ d))                  # Ch(b, c, d)
+            elif(t < 40 or t >= 60):
+                f = b ^ c ^ d                          # Parity(b, c, d)
+            else:
+                f = (b & c) | (d & (b | c))            # Maj(b, c, d)
+            temp = rotl(a, 5) + f + e + ROUND_CONSTANTS[t // 20] + schedule[t]
+            e, d, c, b, a = d, c, rotl(b, 30), a, temp
+
+        # Lanes whose message already ended keep their state
+        active = block < block_counts
+        np.add(state, np.stack((a, b, c, d, e)), out=state, where=active[None, :])
+    return state
+
+############################
+
+# Raw 20 byte SHA-1 digest of every message, in order
+def sha1_batch(messages) -> list:
+    if not len(messages):
+        return list()
+    words, block_counts = pad_messages(messages)
+    packed = sha1_lanes(words, block_counts).T.astype(">u4").tobytes()
+    return [packed[lane * DIGEST_BYTES:(lane + 1) * DIGEST_BYTES] for lane in range(len(messages))]
+
+
+#################################
+#                               #
+#          VALIDATION           #
+#                               #
+#################################
+# Hash `count` messages of random lengths up to `max_length` (plus every padding edge case),
+# once as a mixed-length batch and once as a same-length batch, and compare every digest with
+# hashlib.sha1. Returns the list of (length, expected hex, got hex) that differ, empty when all agree.
+def validate_against_hashlib(count=1000, max_length=300, seed=0) -> list:
+    random_state = np.random.default_rng(seed)
+    lengths = list(PADDING_EDGE_LENGTHS) + [int(length) for length in random_state.integers(0, max_length + 1, size=count)]
+    messages = [random_state.integers(0, 256, size=length, dtype=np.uint8).tobytes() for length in lengths]
+    same_length = [random_state.integers(0, 256, size=max_length, dtype=np.uint8).tobytes() for _ in range(max(1, count // 10))]
+
+    mismatches = list()
+    for batch in (messages, same_length):
+        for message, digest in zip(batch, sha1_batch(batch)):
+            expected = hashlib.sha1(message).digest()
+            if(digest != expected):
+                mismatches.append((len(message), expected.hex(), digest.hex()))
+    return mismatches
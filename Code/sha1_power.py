@@ -0,0 +1,415 @@
+####################################################################################
+###                                                                              ###
+###               ECE 4300 - Computer Architecture Spring 2022                   ###
+###   Term Project: SHA-1 Algorithm Performance on Multiple Embedded Platforms   ###
+###                                                                              ###
+###                             Power Telemetry                                  ###
+###                                                                              ###
+###            By: Derek Mata, Christopher Yamada, Elizabeth Hwang               ###
+###                                                                              ###
+####################################################################################
+
+# Reads voltage, current and power while the scripts run instead of typing six numbers
+# off the USB meter afterwards. A --power-source spec picks where the readings come from:
+#
+#   manual                  the old prompts for the USB meter's peak/average values
+#   none                    no power readings
+#   hwmon[:NAME|PATH]       /sys/class/hwmon (ina3221, ina2xx, ...), inN mV, currN mA, powerN uW
+#   ina3221[:RAIL]          the Jetson Nano's onboard INA3221 iio driver, mV / mA / mW per rail
+#   power-supply[:NAME]     /sys/class/power_supply, voltage_now uV, current_now uA, power_now uW
+#   serial:PATH[@BAUD]      a USB meter's serial log (tty or file), one "volts,amps[,watts]" line per reading
+#   replay:FILE.csv         a recorded "t_s,volts,amps[,watts]" log played back against the clock, for testing
+#
+# PowerMonitor polls the source from a background thread and tags every reading with the
+# phase from sha1_sampler, so energy is split per phase by integrating power over time.
+
+# General python libraries
+import os
+import re
+import csv
+import glob
+import json
+import time
+import select
+import threading
+
+# Phase the main thread is in
+import sha1_sampler
+
+
+
+# Ways to get power readings, see the spec list above
+POWER_SOURCES = ("manual", "none", "hwmon", "ina3221", "power-supply", "serial", "replay")
+
+# Sources that are polled while the script runs (the rest are handled by the scripts)
+TELEMETRY_SOURCES = ("hwmon", "ina3221", "power-supply", "serial", "replay")
+
+# Default polling rate, INA3221/INA219 conversions take a few ms so faster gains nothing
+DEFAULT_POWER_HZ = 20.0
+
+# Where the kernel exposes the sensors
+HWMON_GLOB = "/sys/class/hwmon/hwmon*"
+INA3221_GLOB = "/sys/bus/i2c/drivers/ina3221x/*/iio:device*"
+POWER_SUPPLY_GLOB = "/sys/class/power_supply/*"
+
+# Numbers in a serial meter line
+NUMBER_PATTERN = re.compile(r"[-+]?\d+(?:\.\d+)?")
+
+
+
+#################################
+#                               #
+#         SOURCE SPECS          #
+#                               #
+#################################
+# argparse type for --power-source, checks the kind and keeps the spec string
+def power_source_spec(text: str) -> str:
+    kind = text.split(":", 1)[0]
+    if(kind not in POWER_SOURCES):
+        raise ValueError("power source has to start with one of " + ", ".join(POWER_SOURCES))
+    return text
+
+############################
+
+# True if the spec is polled by a PowerMonitor
+def is_telemetry_source(spec: str) -> bool:
+    return spec.split(":", 1)[0] in TELEMETRY_SOURCES
+
+############################
+
+# Build the reader for a telemetry spec
+def open_power_source(spec: str):
+    kind, _, argument = spec.partition(":")
+    if(kind == "hwmon"):
+        return HwmonSource(argument or None)
+    if(kind == "ina3221"):
+        return Ina3221Source(argument or None)
+    if(kind == "power-supply"):
+        return PowerSupplySource(argument or None)
+    if(kind == "serial"):
+        if not argument:
+            raise Exception("open_power_source: serial needs a path, e.g. serial:/dev/ttyUSB0@9600")
+        path, _, baud = argument.partition("@")
+        return SerialLogSource(path, int(baud) if baud else None)
+    if(kind == "replay"):
+        if not argument:
+            raise Exception("open_power_source: replay needs a CSV file, e.g. replay:power-log.csv")
+        return ReplaySource(argument)
+    raise Exception("open_power_source: " + spec + " is not a telemetry source")
+
+############################
+
+# Read one integer sysfs attribute, None if it is missing or unreadable
+def read_sysfs_number(path: str):
+    try:
+        with open(path, "r") as file:
+            return int(file.read().strip())
+    except (OSError, ValueError):
+        return None
+
+############################
+
+# Fill in whichever of volts/amps/watts the sensor did not report
+def complete_reading(volts, amps, watts) -> dict:
+    if(watts is None and volts is not None and amps is not None):
+        watts = volts * amps
+    if(amps is None and volts and watts is not None):
+        amps = watts / volts
+    if watts is None:
+        return None
+    return {"volts": volts, "amps": amps, "watts": watts}
+
+
+#################################
+#                               #
+#        SYSFS SOURCES          #
+#                               #
+#################################
+# A hwmon power monitor (ina3221, ina2xx, ...). Picks the first channel with both a voltage
+# and a current (or a power) input unless NAME matches the chip or PATH points at the directory.
+class HwmonSource:
+    def __init__(self, name_or_path=None):
+        candidates = [name_or_path] if(name_or_path and os.path.isdir(name_or_path)) else sorted(glob.glob(HWMON_GLOB))
+        self.volts_path = self.amps_path = self.watts_path = None
+        for hwmon_dir in candidates:
+            try:
+                with open(os.path.join(hwmon_dir, "name"), "r") as file:
+                    chip = file.read().strip()
+            except OSError:
+                chip = os.path.basename(hwmon_dir)
+            if(name_or_path and not os.path.isdir(name_or_path) and chip != name_or_path):
+                continue
+            for channel in range(0, 8):
+                volts_path = os.path.join(hwmon_dir, "in" + str(channel) + "_input")
+                amps_path = os.path.join(hwmon_dir, "curr" + str(channel) + "_input")
+                watts_path = os.path.join(hwmon_dir, "power" + str(channel) + "_input")
+                if(os.path.exists(watts_path) or (os.path.exists(volts_path) and os.path.exists(amps_path))):
+                    self.volts_path = volts_path if os.path.exists(volts_path) else None
+                    self.amps_path = amps_path if os.path.exists(amps_path) else None
+                    self.watts_path = watts_path if os.path.exists(watts_path) else None
+                    self.name = "hwmon " + chip + " channel " + str(channel)
+                    return
+        raise Exception("HwmonSource: no hwmon device with voltage and current inputs" + (" named " + name_or_path if name_or_path else ""))
+
+    def read(self, elapsed_sec: float):
+        millivolts = read_sysfs_number(self.volts_path) if self.volts_path else None
+        milliamps = read_sysfs_number(self.amps_path) if self.amps_path else None
+        microwatts = read_sysfs_number(self.watts_path) if self.watts_path else None
+        return complete_reading(millivolts / 1e3 if millivolts is not None else None,
+                                milliamps / 1e3 if milliamps is not None else None,
+                                microwatts / 1e6 if microwatts is not None else None)
+
+############################
+
+# The Jetson Nano's INA3221 on its L4T iio driver, rail 0 (POM_5V_IN, the whole board) unless RAIL names another
+class Ina3221Source:
+    def __init__(self, rail=None):
+        for device_dir in sorted(glob.glob(INA3221_GLOB)):
+            for channel in range(0, 3):
+                name_path = os.path.join(device_dir, "rail_name_" + str(channel))
+                try:
+                    with open(name_path, "r") as file:
+                        rail_name = file.read().strip()
+                except OSError:
+                    rail_name = "channel " + str(channel)
+                if(rail is None or rail == rail_name or rail == str(channel)):
+                    self.volts_path = os.path.join(device_dir, "in_voltage" + str(channel) + "_input")
+                    self.amps_path = os.path.join(device_dir, "in_current" + str(channel) + "_input")
+                    self.watts_path = os.path.join(device_dir, "in_power" + str(channel) + "_input")
+                    self.name = "INA3221 " + rail_name
+                    return
+        raise Exception("Ina3221Source: no INA3221 iio device" + (" with rail " + rail if rail else "") + " under " + INA3221_GLOB)
+
+    def read(self, elapsed_sec: float):
+        millivolts = read_sysfs_number(self.volts_path)
+        milliamps = read_sysfs_number(self.amps_path)
+        milliwatts = read_sysfs_number(self.watts_path)
+        return complete_reading(millivolts / 1e3 if millivolts is not None else None,
+                                milliamps / 1e3 if milliamps is not None else None,
+                                milliwatts / 1e3 if milliwatts is not None else None)
+
+############################
+
+# A power_supply class device (USB PD sink, battery, PMIC), the first one with voltage_now unless NAME is given
+class PowerSupplySource:
+    def __init__(self, name=None):
+        for supply_dir in sorted(glob.glob(POWER_SUPPLY_GLOB)):
+            if(name and os.path.basename(supply_dir) != name):
+                continue
+            if os.path.exists(os.path.join(supply_dir, "voltage_now")):
+                self.supply_dir = supply_dir
+                self.name = "power_supply " + os.path.basename(supply_dir)
+                return
+        raise Exception("PowerSupplySource: no power_supply device with voltage_now" + (" named " + name if name else ""))
+
+    def read(self, elapsed_sec: float):
+        microvolts = read_sysfs_number(os.path.join(self.supply_dir, "voltage_now"))
+        microamps = read_sysfs_number(os.path.join(self.supply_dir, "current_now"))
+        microwatts = read_sysfs_number(os.path.join(self.supply_dir, "power_now"))
+        return complete_reading(microvolts / 1e6 if microvolts is not None else None,
+                                abs(microamps) / 1e6 if microamps is not None else None,
+                                microwatts / 1e6 if microwatts is not None else None)
+
+
+#################################
+#                               #
+#     SERIAL AND REPLAY LOGS    #
+#                               #
+#################################
+# A USB meter that prints one "volts,amps[,watts]" line per reading over a serial port (or into a file).
+# A reader thread keeps the latest line so polling never blocks on the port.
+class SerialLogSource:
+    def __init__(self, path: str, baud=None):
+        self.name = "serial log " + path
+        self.file = open(path, "rb", buffering=0)
+        if(baud and os.isatty(self.file.fileno())):
+            import termios
+            import tty
+            tty.setraw(self.file.fileno())
+            attributes = termios.tcgetattr(self.file.fileno())
+            speed = getattr(termios, "B" + str(baud))
+            attributes[4] = attributes[5] = speed
+            termios.tcsetattr(self.file.fileno(), termios.TCSANOW, attributes)
+        elif not os.isatty(self.file.fileno()):
+            # A plain log file already holds earlier runs, only lines appended from now on are this run's
+            self.file.seek(0, os.SEEK_END)
+        self.latest = None
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._follow, name="serial-power-log", daemon=True)
+        self.thread.start()
+
+    def _follow(self) -> None:
+        pending = b""
+        while not self.stop_event.is_set():
+            # Wait for the port with a timeout so close() is never stuck behind a silent meter
+            ready, _, _ = select.select([self.file], [], [], 0.1)
+            if not ready:
+                continue
+            data = self.file.read(4096)
+            if not data:
+                # End of a plain file, wait for the meter to append more
+                self.stop_event.wait(0.05)
+                continue
+            pending += data
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                numbers = [float(number) for number in NUMBER_PATTERN.findall(line.decode("ascii", "replace"))]
+                if(len(numbers) >= 2):
+                    self.latest = complete_reading(numbers[0], numbers[1], numbers[2] if len(numbers) > 2 else None)
+
+    def read(self, elapsed_sec: float):
+        return self.latest
+
+    # Stop the reader thread and close the port (or file)
+    def close(self) -> None:
+        self.stop_event.set()
+        self.thread.join()
+        self.file.close()
+
+############################
+
+# Plays back a recorded CSV log (t_s,volts,amps[,watts], header optional) against the run's clock
+class ReplaySource:
+    def __init__(self, path: str):
+        self.name = "replay " + path
+        self.readings = list()
+        with open(path, "r", newline="") as file:
+            for row in csv.reader(file):
+                try:
+                    values = [float(value) for value in row]
+                except ValueError:
+                    continue
+                if(len(values) >= 3):
+                    self.readings.append((values[0], complete_reading(values[1], values[2], values[3] if len(values) > 3 else None)))
+        if not self.readings:
+            raise Exception("ReplaySource: " + path + " has no t_s,volts,amps rows")
+        self.readings.sort(key=lambda reading: reading[0])
+        self.position = 0
+
+    # The last recorded reading at or before `elapsed_sec`, the final one once the log runs out
+    def read(self, elapsed_sec: float):
+        while(self.position + 1 < len(self.readings) and self.readings[self.position + 1][0] <= elapsed_sec):
+            self.position += 1
+        return self.readings[self.position][1]
+
+
+#################################
+#                               #
+#         POWER MONITOR         #
+#                               #
+#################################
+class PowerMonitor:
+    def __init__(self, source, rate_hz=DEFAULT_POWER_HZ):
+        if(rate_hz <= 0):
+            raise Exception("PowerMonitor: rate_hz has to be above 0")
+        self.source = source
+        self.rate_hz = rate_hz
+        self.interval = 1.0 / rate_hz
+        self.readings = list()
+        self.started_ns = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self) -> None:
+        self.started_ns = time.perf_counter_ns()
+        self.stop_event.clear()
+        self.poll()
+        self.thread = threading.Thread(target=self._run, name="power-monitor", daemon=True)
+        self.thread.start()
+
+    # Stop polling, the last reading closes the final phase
+    def stop(self) -> None:
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+        self.poll()
+        # Sources that hold a port or a reader thread let go of it with the monitor
+        if hasattr(self.source, "close"):
+            self.source.close()
+
+    def _run(self) -> None:
+        deadline = time.perf_counter()
+        while True:
+            deadline += self.interval
+            if self.stop_event.wait(max(0.0, deadline - time.perf_counter())):
+                break
+            self.poll()
+            deadline = max(deadline, time.perf_counter() - self.interval)
+
+    # Take one reading, tagged with the phase and the time since start
+    def poll(self) -> None:
+        elapsed_ns = time.perf_counter_ns() - self.started_ns
+        reading = self.source.read(elapsed_ns / 1e9)
+        if reading is None:
+            return
+        reading = dict(reading)
+        reading["t_ns"] = elapsed_ns
+        reading["phase"] = sha1_sampler.current_phase
+        self.readings.append(reading)
+
+    # Peak and average of volts, amps and watts over the whole run
+    def peaks_and_averages(self) -> dict:
+        results = dict()
+        for key in ("watts", "volts", "amps"):
+            values = [reading[key] for reading in self.readings if reading[key] is not None]
+            results["max_" + key] = round(max(values), 4) if values else None
+            results["avg_" + key] = round(sum(values) / len(values), 4) if values else None
+        return results
+
+    # Joules and seconds per phase, integrating power between readings (trapezoid rule).
+    # Each interval counts towards the phase it ended in, like the resource sampler's context switches.
+    def energy_by_phase(self) -> dict:
+        phases = dict()
+        for previous, reading in zip(self.readings, self.readings[1:]):
+            seconds = (reading["t_ns"] - previous["t_ns"]) / 1e9
+            phase_energy = phases.setdefault(reading["phase"], {"joules": 0.0, "seconds": 0.0})
+            phase_energy["joules"] += (previous["watts"] + reading["watts"]) / 2 * seconds
+            phase_energy["seconds"] += seconds
+        return phases
+
+    # Total joules over the run
+    def total_joules(self) -> float:
+        return sum(phase_energy["joules"] for phase_energy in self.energy_by_phase().values())
+
+    # Write every reading plus the per-phase energy as JSON
+    def save(self, output_path: str) -> None:
+        with open(output_path, "w") as file:
+            json.dump({"source": self.source.name, "rate_hz": self.rate_hz, "summary": self.peaks_and_averages(),
+                       "energy_by_phase": self.energy_by_phase(), "readings": self.readings}, file, indent=1)
+            file.write("\n")
+
+    # Result lines in the same layout as the typed-in USB meter values, plus energy per phase and per MB.
+    # `megabytes` maps a label to (MB, phases), e.g. {"hashed": (12.5, ("read", "hash"))}
+    def summary_lines(self, megabytes: dict) -> list:
+        peaks = self.peaks_and_averages()
+        lines = ["\nElectrical Measurements from the System via " + self.source.name + " (" + str(len(self.readings)) + " readings at " + str(self.rate_hz) + " Hz):"]
+        if not self.readings:
+            return lines + ["\tno readings, is the sensor reporting?"]
+        lines.append("\tPeak power: " + str(peaks["max_watts"]) + "W")
+        lines.append("\tAvg power: " + str(peaks["avg_watts"]) + "W")
+        if(peaks["max_volts"] is not None):
+            lines.append("\tPeak voltage: " + str(peaks["max_volts"]) + "V")
+            lines.append("\tAvg voltage: " + str(peaks["avg_volts"]) + "V")
+        if(peaks["max_amps"] is not None):
+            lines.append("\tPeak current: " + str(peaks["max_amps"]) + "A")
+            lines.append("\tAvg current: " + str(peaks["avg_amps"]) + "A")
+        energy = self.energy_by_phase()
+        total_joules = sum(phase_energy["joules"] for phase_energy in energy.values())
+        lines.append("\tEnergy: " + str(round(total_joules, 4)) + "J")
+        for name, phase_energy in energy.items():
+            lines.append("\t\t" + name + ": " + str(round(phase_energy["joules"], 4)) + "J over " + str(round(phase_energy["seconds"], 4)) + "s")
+        for label, (mb, phase_names) in megabytes.items():
+            if(mb <= 0):
+                continue
+            phase_joules = sum(energy[name]["joules"] for name in phase_names if name in energy)
+            lines.append("\t" + str(round(phase_joules / mb, 6)) + "J per MB " + label + " (" + "/".join(phase_names) + " phases, " + str(round(mb, 3)) + "MB)")
+        return lines
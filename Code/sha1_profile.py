@@ -0,0 +1,120 @@
+####################################################################################
+###                                                                              ###
+###               ECE 4300 - Computer Architecture Spring 2022                   ###
+###   Term Project: SHA-1 Algorithm Performance on Multiple Embedded Platforms   ###
+###                                                                              ###
+###                           Per-Board Tuning Profile                           ###
+###                                                                              ###
+###            By: Derek Mata, Christopher Yamada, Elizabeth Hwang               ###
+###                                                                              ###
+####################################################################################
+
+# `sha1_benchmark.py autotune` sweeps the chunk size, the receiver's recv buffer and
+# the kernel socket buffers over a loopback transfer and saves the fastest combination
+# here, keyed by board. The transmitter and receiver load the entry for the board they
+# run on at startup, so each board keeps its own settings in the same file:
+#
+#   {"Raspberry Pi 4 Model B Rev 1.4": {"chunk_size": 16384, "recv_buffer": 65536,
+#                                       "socket_buffer": 262144, ...}, ...}
+#
+# A socket_buffer of 0 means the kernel default (SO_SNDBUF/SO_RCVBUF left alone).
+
+# General python libraries
+import os
+import json
+import socket
+import platform
+
+
+
+# Default location of the profile file, next to hashes.txt
+HOME_DIR = os.path.dirname(__file__)
+DEFAULT_PROFILE_PATH = os.path.abspath(os.path.join(HOME_DIR, "sha1-tune-profile.json"))
+
+# Device tree model string, present on the Raspberry Pi, Jetson and most ARM boards
+DEVICE_TREE_MODEL_PATH = "/proc/device-tree/model"
+
+# Boards from the transmitter/receiver device prompt, by menu number
+BOARD_NAMES = {
+    "1": "Raspberry Pi 3B+",
+    "2": "Raspberry Pi 4B",
+    "3": "Jetson Nano 4GB",
+}
+
+
+
+#################################
+#                               #
+#         BOARD DETECTION       #
+#                               #
+#################################
+# Name of the board this runs on, the device tree model if there is one, else host and architecture
+def detect_board() -> str:
+    try:
+        with open(DEVICE_TREE_MODEL_PATH, "rb") as file:
+            model = file.read().rstrip(b"\x00").decode("ascii", "replace").strip()
+        if model:
+            return model
+    except OSError:
+        pass
+    return platform.node() + " (" + platform.machine() + ")"
+
+############################
+
+# Board name for a --board argument, a menu number maps to its board and anything else is used as is
+def resolve_board_name(board: str) -> str:
+    return BOARD_NAMES.get(board.strip(), board.strip())
+
+############################
+
+# The one board name profiles are saved and loaded under: --board resolved as above, else the detected board
+def board_name(board=None) -> str:
+    return resolve_board_name(board) if board else detect_board()
+
+
+#################################
+#                               #
+#         PROFILE FILE          #
+#                               #
+#################################
+# Every saved board profile, an empty dict if the file does not exist yet
+def load_profiles(profile_path=DEFAULT_PROFILE_PATH) -> dict:
+    if not os.path.exists(profile_path):
+        return dict()
+    with open(profile_path, "r") as file:
+        profiles = json.load(file)
+    if not isinstance(profiles, dict):
+        raise Exception("load_profiles: " + profile_path + " does not hold a board -> settings object")
+    return profiles
+
+############################
+
+# Saved settings for `board` (default: this board), or None if it has never been tuned
+def load_board_profile(board=None, profile_path=DEFAULT_PROFILE_PATH):
+    return load_profiles(profile_path).get(board_name(board))
+
+############################
+
+# Save settings for `board` (default: this board), other boards' entries are kept
+def save_board_profile(settings: dict, board=None, profile_path=DEFAULT_PROFILE_PATH) -> str:
+    board = board_name(board)
+    profiles = load_profiles(profile_path)
+    profiles[board] = settings
+    temp_path = profile_path + ".tmp"
+    with open(temp_path, "w") as file:
+        json.dump(profiles, file, indent=2, sort_keys=True)
+        file.write("\n")
+    os.replace(temp_path, profile_path)
+    return board
+
+############################
+
+# Apply the profile's kernel socket buffer size to a socket, before connect()/listen() so TCP sees it
+def apply_socket_buffers(sock, profile, send=True, receive=True) -> None:
+    size = (profile or dict()).get("socket_buffer", 0)
+    if(size <= 0):
+        return
+    if send:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, size)
+    if receive:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, size)
@@ -0,0 +1,630 @@
+####################################################################################
+###                                                                              ###
+###               ECE 4300 - Computer Architecture Spring 2022                   ###
+###   Term Project: SHA-1 Algorithm Performance on Multiple Embedded Platforms   ###
+###                                                                              ###
+###                        Shared Wire Protocol (Framing)                        ###
+###                                                                              ###
+###            By: Derek Mata, Christopher Yamada, Elizabeth Hwang               ###
+###                                                                              ###
+####################################################################################
+
+# Every message between the transmitter and receiver is sent as a frame:
+#
+#   +-------+---------+------+-------+-------+--------+-----------------+
+#   | magic | version | type | flags | index | length | payload ...     |
+#   |  4 B  |   1 B   | 1 B  |  2 B  |  4 B  |  4 B   | `length` bytes  |
+#   +-------+---------+------+-------+-------+--------+-----------------+
+#
+# All header fields are big-endian. A file is sent as one or more MANIFEST or
+# CHUNK frames followed by an END frame, so the receiver knows exactly where
+# each file stops without waiting on a socket timeout.
+#
+# A streamed transfer sets FLAG_STREAMED on every frame and sends, for each
+# chunk index, a MANIFEST frame holding that chunk's hex digest followed by the
+# CHUNK frame itself. A single END frame closes the stream.
+#
+# With FLAG_TREE the digests are independent Merkle leaves (see sha1_merkle.py)
+# instead of one running sha1, and the END frame that closes the manifest (or the
+# stream) carries the hex root digest instead of a file name.
+#
+# After a streamed END the receiver answers with either an ACK (everything matched)
+# or a REPAIR frame listing the chunk indices that failed. The transmitter then
+# resends only those chunks, as digest + chunk pairs closed by another END frame,
+# and waits again, until the receiver ACKs.
+#
+# A streamed transfer can be striped over N connections. Each connection opens with a
+# STRIPE frame (transfer id, stream id, stream count), then chunk i's digest and chunk
+# travel on stream i mod N and every stream ends with its own END frame. The receiver
+# reads the streams round-robin, so frames come out in chunk order again, and the
+# ACK/REPAIR exchange (and any repair round) runs on stream 0 only.
+#
+# A transmitter that wants compressed chunks opens with a COMPRESS frame listing the
+# codecs it offers, and the receiver answers with a COMPRESS frame naming the one it
+# picked (or "none"), see sha1_compress.py. After that a CHUNK frame whose payload is
+# compressed carries FLAG_COMPRESSED, the receiver inflates it before anything else
+# looks at it.
+
+# General python libraries
+import os
+import time
+import socket
+import struct
+import asyncio
+
+
+
+# Protocol identification
+PROTOCOL_MAGIC = b"SHA1"
+PROTOCOL_VERSION = 1
+
+# Frame header layout (see diagram above)
+FRAME_HEADER = struct.Struct("!4sBBHII")
+FRAME_HEADER_SIZE = FRAME_HEADER.size
+
+# Frame types
+FRAME_MANIFEST = 1
+FRAME_CHUNK = 2
+FRAME_END = 3
+FRAME_ACK = 4
+FRAME_REPAIR = 5
+FRAME_STRIPE = 6
+FRAME_COMPRESS = 7
+
+# Frame flags
+FLAG_STREAMED = 0x0001      # frame belongs to a streamed transfer (digest + chunk per index)
+FLAG_TREE = 0x0002          # manifest holds Merkle leaf digests, the manifest's END frame carries the root
+FLAG_COMPRESSED = 0x0004    # CHUNK payload is compressed with the negotiated codec
+
+FRAME_TYPE_NAMES = {
+    FRAME_MANIFEST: "MANIFEST",
+    FRAME_CHUNK: "CHUNK",
+    FRAME_END: "END",
+    FRAME_ACK: "ACK",
+    FRAME_REPAIR: "REPAIR",
+    FRAME_STRIPE: "STRIPE",
+    FRAME_COMPRESS: "COMPRESS",
+}
+
+# STRIPE payload: transfer id, stream id, stream count
+STRIPE_PAYLOAD = struct.Struct("!IHH")
+
+# Largest payload we will put into (or accept from) a single frame
+MAX_FRAME_PAYLOAD = 16 * 1024 * 1024
+
+# Payload size used when splitting a file into frames
+FILE_FRAME_PAYLOAD = 64 * 1024
+
+# Payload size of the frames an asyncio transmitter hands to sendfile(), the kernel copies
+# each one from the page cache so fewer, larger frames only cost fewer headers
+SENDFILE_FRAME_PAYLOAD = 1024 * 1024
+
+# Bytes an asyncio transmitter lets pile up in its transport before writes wait for the socket
+ASYNC_WRITE_HIGH_WATER = 1024 * 1024
+
+# Port the receiver listens on
+PROTOCOL_PORT = 64321
+
+# Repair rounds the receiver asks for before giving up and ACKing with the failures
+MAX_REPAIR_ROUNDS = 3
+
+
+
+#################################
+#                               #
+#        FRAME ENCODING         #
+#                               #
+#################################
+# Build the header + payload bytes for one frame
+def pack_frame(frame_type: int, payload=b"", index=0, flags=0) -> bytes:
+    if(frame_type not in FRAME_TYPE_NAMES):
+        raise Exception("pack_frame: unknown frame type " + str(frame_type))
+    if(len(payload) > MAX_FRAME_PAYLOAD):
+        raise Exception("pack_frame: payload of " + str(len(payload)) + " bytes is larger than the frame limit")
+    header = FRAME_HEADER.pack(PROTOCOL_MAGIC, PROTOCOL_VERSION, frame_type, flags, index, len(payload))
+    return header + bytes(payload)
+
+############################
+
+# Send one frame over a connected socket
+def send_frame(sock, frame_type: int, payload=b"", index=0, flags=0) -> None:
+    if(len(payload) > MAX_FRAME_PAYLOAD):
+        raise Exception("send_frame: payload of " + str(len(payload)) + " bytes is larger than the frame limit")
+    header = FRAME_HEADER.pack(PROTOCOL_MAGIC, PROTOCOL_VERSION, frame_type, flags, index, len(payload))
+    # Small frames go out in one write so the header never sits alone in a segment
+    if(len(payload) <= FILE_FRAME_PAYLOAD):
+        sock.sendall(header + bytes(payload))
+    else:
+        sock.sendall(header)
+        sock.sendall(payload)
+
+############################
+
+# Write several buffers with as few syscalls as possible (scatter/gather where the OS has it)
+def sendall_buffers(sock, buffers) -> None:
+    if not hasattr(sock, "sendmsg"):
+        sock.sendall(b"".join(buffers))
+        return
+    views = [memoryview(buffer).cast("B") for buffer in buffers if len(buffer)]
+    while views:
+        sent = sock.sendmsg(views)
+        while(views and sent >= len(views[0])):
+            sent -= len(views[0])
+            views.pop(0)
+        if(views and sent):
+            views[0] = views[0][sent:]
+
+############################
+
+# Send a streamed chunk as its MANIFEST (digest) frame and CHUNK frame without copying the chunk.
+# With a negotiated `codec` the chunk goes out compressed whenever that makes it smaller.
+def send_digest_and_chunk(sock, index: int, digest: bytes, chunk, flags=0, codec=None) -> None:
+    chunk_flags = flags
+    if codec is not None:
+        chunk, codec_flags = codec.encode(chunk)
+        chunk_flags |= codec_flags
+    if(len(chunk) > MAX_FRAME_PAYLOAD):
+        raise Exception("send_digest_and_chunk: chunk of " + str(len(chunk)) + " bytes is larger than the frame limit")
+    digest_header = FRAME_HEADER.pack(PROTOCOL_MAGIC, PROTOCOL_VERSION, FRAME_MANIFEST, flags, index, len(digest))
+    chunk_header = FRAME_HEADER.pack(PROTOCOL_MAGIC, PROTOCOL_VERSION, FRAME_CHUNK, chunk_flags, index, len(chunk))
+    sendall_buffers(sock, [digest_header + digest + chunk_header, chunk])
+
+############################
+
+# Send a whole file as a run of frames of the given type, then an END frame.
+# CHUNK frames are compressed with `codec` when one was negotiated.
+def send_file_frames(sock, file_path: str, frame_type: int, name: str, payload_size=FILE_FRAME_PAYLOAD, flags=0, end_payload=None, codec=None) -> int:
+    total_bytes = 0
+    index = 0
+    with open(file_path, "rb") as file:
+        while True:
+            data = file.read(payload_size)
+            if not data:
+                break
+            if(codec is not None and frame_type == FRAME_CHUNK):
+                payload, codec_flags = codec.encode(data)
+                send_frame(sock, frame_type, payload, index=index, flags=flags | codec_flags)
+            else:
+                send_frame(sock, frame_type, data, index=index, flags=flags)
+            total_bytes += len(data)
+            index += 1
+    if end_payload is None:
+        end_payload = bytes(name, "ascii")
+    send_frame(sock, FRAME_END, end_payload, index=index, flags=flags)
+    return total_bytes
+
+
+# Payload of a REPAIR frame: the chunk indices as big-endian 32-bit integers
+def pack_indices(indices) -> bytes:
+    return struct.pack("!" + str(len(indices)) + "I", *indices)
+
+############################
+
+# Chunk indices back out of a REPAIR frame payload
+def unpack_indices(payload) -> list:
+    if(len(payload) % 4 != 0):
+        raise Exception("unpack_indices: REPAIR payload of " + str(len(payload)) + " bytes is not a list of 32-bit indices")
+    return list(struct.unpack("!" + str(len(payload) // 4) + "I", payload))
+
+
+#################################
+#                               #
+#        FRAME DECODING         #
+#                               #
+#################################
+# Read exactly `size` bytes from the socket, returns None if the peer closed first
+def recv_exact(sock, size: int):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:], size - received)
+        if count == 0:
+            if received == 0:
+                return None
+            raise Exception("recv_exact: connection closed after " + str(received) + " of " + str(size) + " bytes")
+        received += count
+    return buffer
+
+############################
+
+# Socket wrapper that pulls `recv_buffer` bytes per recv() call and hands frames their
+# exact sizes out of that buffer, so small headers and digests don't cost a syscall each.
+# Reads at least as large as the buffer go straight from the socket into the caller's memory.
+# Anything else (sendall, sendmsg, settimeout, ...) goes to the wrapped socket.
+class BufferedSocketReader:
+    def __init__(self, sock, recv_buffer: int):
+        self.sock = sock
+        self.buffer = bytearray(max(1, recv_buffer))
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+    def recv_into(self, view, size: int) -> int:
+        if(self.start == self.end):
+            if(size >= len(self.buffer)):
+                return self.sock.recv_into(view, size)
+            self.start = 0
+            self.end = self.sock.recv_into(self.buffer)
+            if(self.end == 0):
+                return 0
+        count = min(size, self.end - self.start)
+        view[:count] = self.view[self.start:self.start + count]
+        self.start += count
+        return count
+
+############################
+
+# Check a raw header and return (frame_type, flags, index, length)
+def unpack_header(header) -> tuple:
+    magic, version, frame_type, flags, index, length = FRAME_HEADER.unpack(header)
+    if(magic != PROTOCOL_MAGIC):
+        raise Exception("unpack_header: bad magic " + str(bytes(magic)) + ", peer is not speaking the SHA-1 protocol")
+    if(version != PROTOCOL_VERSION):
+        raise Exception("unpack_header: protocol version " + str(version) + " is not supported (expected " + str(PROTOCOL_VERSION) + ")")
+    if(frame_type not in FRAME_TYPE_NAMES):
+        raise Exception("unpack_header: unknown frame type " + str(frame_type))
+    if(length > MAX_FRAME_PAYLOAD):
+        raise Exception("unpack_header: frame length " + str(length) + " is larger than the frame limit")
+    return frame_type, flags, index, length
+
+############################
+
+# Receive one frame, returns (frame_type, flags, index, payload) or None on a clean close
+def recv_frame(sock):
+    # Striped connections hand out frames already put back in chunk order, compressed ones inflated
+    if isinstance(sock, (StripedReceiver, DecodingReceiver)):
+        return sock.recv_frame()
+    header = recv_exact(sock, FRAME_HEADER_SIZE)
+    if header is None:
+        return None
+    frame_type, flags, index, length = unpack_header(header)
+    if length:
+        payload = recv_exact(sock, length)
+        if payload is None:
+            raise Exception("recv_frame: connection closed before " + FRAME_TYPE_NAMES[frame_type] + " payload arrived")
+    else:
+        payload = bytearray()
+    return frame_type, flags, index, payload
+
+############################
+
+# Receive a frame and make sure it is of the expected type
+def expect_frame(sock, frame_type: int):
+    frame = recv_frame(sock)
+    if frame is None:
+        raise Exception("expect_frame: connection closed while waiting for " + FRAME_TYPE_NAMES[frame_type])
+    if(frame[0] != frame_type):
+        raise Exception("expect_frame: expected " + FRAME_TYPE_NAMES[frame_type] + " frame but got " + FRAME_TYPE_NAMES[frame[0]])
+    return frame
+
+############################
+
+# Receive MANIFEST or CHUNK frames into `sink` until the END frame, returns the END payload.
+# `sink` is a list to collect the payloads in, or a binary file they are written to as they arrive.
+def recv_file_frames(sock, frame_type: int, sink, first_frame=None) -> bytes:
+    store = sink.write if hasattr(sink, "write") else sink.append
+    while True:
+        if first_frame is not None:
+            frame, first_frame = first_frame, None
+        else:
+            frame = recv_frame(sock)
+        if frame is None:
+            raise Exception("recv_file_frames: connection closed before END of " + FRAME_TYPE_NAMES[frame_type] + " frames")
+        received_type, _, _, payload = frame
+        if(received_type == FRAME_END):
+            return bytes(payload)
+        if(received_type != frame_type):
+            raise Exception("recv_file_frames: expected " + FRAME_TYPE_NAMES[frame_type] + " frame but got " + FRAME_TYPE_NAMES[received_type])
+        store(payload)
+
+
+#################################
+#                               #
+#      ASYNCIO FRAME I/O        #
+#                               #
+#################################
+# Receive one frame from an asyncio StreamReader, returns None on a clean close
+async def read_frame_async(reader, timeout=None):
+    if isinstance(reader, (AsyncStripedReceiver, AsyncDecodingReceiver)):
+        return await reader.read_frame(timeout)
+    try:
+        header = await asyncio.wait_for(reader.readexactly(FRAME_HEADER_SIZE), timeout)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise Exception("read_frame_async: connection closed after " + str(len(e.partial)) + " header bytes")
+    frame_type, flags, index, length = unpack_header(header)
+    if length:
+        try:
+            payload = await asyncio.wait_for(reader.readexactly(length), timeout)
+        except asyncio.IncompleteReadError:
+            raise Exception("read_frame_async: connection closed before " + FRAME_TYPE_NAMES[frame_type] + " payload arrived")
+    else:
+        payload = b""
+    return frame_type, flags, index, payload
+
+############################
+
+# read_frame_async that makes sure the frame is of the expected type
+async def expect_frame_async(reader, frame_type: int, timeout=None):
+    frame = await read_frame_async(reader, timeout)
+    if frame is None:
+        raise Exception("expect_frame_async: connection closed while waiting for " + FRAME_TYPE_NAMES[frame_type])
+    if(frame[0] != frame_type):
+        raise Exception("expect_frame_async: expected " + FRAME_TYPE_NAMES[frame_type] + " frame but got " + FRAME_TYPE_NAMES[frame[0]])
+    return frame
+
+############################
+
+# Queue one frame on an asyncio StreamWriter and wait for the transport to drain
+async def write_frame_async(writer, frame_type: int, payload=b"", index=0, flags=0) -> None:
+    writer.write(pack_frame(frame_type, payload, index=index, flags=flags))
+    await writer.drain()
+
+############################
+
+# Queue a streamed chunk's MANIFEST and CHUNK frames. drain() only waits once the transport holds
+# more than its high water mark, so a fast producer is held back by the socket (backpressure)
+# instead of buffering the whole file in memory.
+async def write_digest_and_chunk_async(writer, index: int, digest: bytes, chunk, flags=0, codec=None) -> None:
+    chunk_flags = flags
+    if codec is not None:
+        chunk, codec_flags = codec.encode(chunk)
+        chunk_flags |= codec_flags
+    if(len(chunk) > MAX_FRAME_PAYLOAD):
+        raise Exception("write_digest_and_chunk_async: chunk of " + str(len(chunk)) + " bytes is larger than the frame limit")
+    writer.writelines([FRAME_HEADER.pack(PROTOCOL_MAGIC, PROTOCOL_VERSION, FRAME_MANIFEST, flags, index, len(digest)), digest,
+                       FRAME_HEADER.pack(PROTOCOL_MAGIC, PROTOCOL_VERSION, FRAME_CHUNK, chunk_flags, index, len(chunk)), chunk])
+    await writer.drain()
+
+############################
+
+# asyncio send_file_frames: each frame is its header followed by loop.sendfile() of that slice of
+# the file, so the kernel copies the payload from the page cache to the socket and it never passes
+# through Python. A negotiated codec has to see the bytes, so compressed CHUNK frames are read and written.
+async def send_file_frames_async(writer, file_path: str, frame_type: int, name: str, payload_size=SENDFILE_FRAME_PAYLOAD, flags=0,
+                                 end_payload=None, codec=None) -> int:
+    loop = asyncio.get_running_loop()
+    total_bytes = os.path.getsize(file_path)
+    index = 0
+    with open(file_path, "rb") as file:
+        for offset in range(0, total_bytes, payload_size):
+            count = min(payload_size, total_bytes - offset)
+            if(codec is not None and frame_type == FRAME_CHUNK):
+                file.seek(offset)
+                payload, codec_flags = codec.encode(file.read(count))
+                await write_frame_async(writer, frame_type, payload, index=index, flags=flags | codec_flags)
+            else:
+                writer.write(FRAME_HEADER.pack(PROTOCOL_MAGIC, PROTOCOL_VERSION, frame_type, flags, index, count))
+                await loop.sendfile(writer.transport, file, offset, count)
+            index += 1
+    if end_payload is None:
+        end_payload = bytes(name, "ascii")
+    await write_frame_async(writer, FRAME_END, end_payload, index=index, flags=flags)
+    return total_bytes
+
+
+#################################
+#                               #
+#       STRIPED TRANSFERS       #
+#                               #
+#################################
+# Payload of a STRIPE frame
+def pack_stripe(transfer_id: int, stream_id: int, stream_count: int) -> bytes:
+    return STRIPE_PAYLOAD.pack(transfer_id, stream_id, stream_count)
+
+############################
+
+# (transfer id, stream id, stream count) back out of a STRIPE frame payload
+def unpack_stripe(payload) -> tuple:
+    if(len(payload) != STRIPE_PAYLOAD.size):
+        raise Exception("unpack_stripe: STRIPE payload is " + str(len(payload)) + " bytes, expected " + str(STRIPE_PAYLOAD.size))
+    transfer_id, stream_id, stream_count = STRIPE_PAYLOAD.unpack(payload)
+    if(stream_count < 1 or stream_id >= stream_count):
+        raise Exception("unpack_stripe: stream " + str(stream_id) + " of " + str(stream_count) + " is not a valid stripe")
+    return transfer_id, stream_id, stream_count
+
+############################
+
+# Connect `stream_count` sockets to `address`, announcing each with a STRIPE frame. `setup(sock)`
+# runs before each connect (socket buffer sizes). One stream is a plain connection with no STRIPE frame.
+# Returns the sockets, stream 0 first.
+def connect_stripes(address, stream_count: int, flags=0, setup=None, timeout=None) -> list:
+    if(stream_count < 1 or stream_count > 0xFFFF):
+        raise Exception("connect_stripes: stream count " + str(stream_count) + " is out of range")
+    transfer_id = int.from_bytes(os.urandom(4), "big")
+    sockets = list()
+    try:
+        for stream_id in range(stream_count):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sockets.append(sock)
+            if setup is not None:
+                setup(sock)
+            sock.connect(address)
+            sock.settimeout(timeout)
+            if(stream_count > 1):
+                send_frame(sock, FRAME_STRIPE, pack_stripe(transfer_id, stream_id, stream_count), flags=flags)
+    except BaseException:
+        for sock in sockets:
+            sock.close()
+        raise
+    return sockets
+
+############################
+
+# Bookkeeping for putting N striped streams back in chunk order: which stream chunk i is on,
+# and the bytes and first/last frame times of every stream for the throughput report.
+class StripeOrder:
+    def __init__(self, stream_count: int):
+        self.stream_count = stream_count
+        self.next_index = 0
+        self.finished = False
+        self.stream_bytes = [0] * stream_count
+        self.first_ns = [None] * stream_count
+        self.last_ns = [None] * stream_count
+
+    # Stream the next frame has to come from, stream 0 once every stream has ended
+    def next_stream(self) -> int:
+        return 0 if self.finished else self.next_index % self.stream_count
+
+    # Account for a frame read from `stream` and check it is the one expected there
+    def record(self, stream: int, frame) -> None:
+        if frame is None:
+            raise Exception("StripeOrder: stream " + str(stream) + " closed before its END frame")
+        frame_type, _, index, payload = frame
+        now = time.perf_counter_ns()
+        if self.first_ns[stream] is None:
+            self.first_ns[stream] = now
+        self.last_ns[stream] = now
+        self.stream_bytes[stream] += FRAME_HEADER_SIZE + len(payload)
+        if self.finished:
+            return
+        if(frame_type in (FRAME_MANIFEST, FRAME_CHUNK) and index != self.next_index):
+            raise Exception("StripeOrder: stream " + str(stream) + " sent chunk " + str(index) + " where chunk " + str(self.next_index) + " belongs")
+        if(frame_type == FRAME_CHUNK):
+            self.next_index += 1
+
+    # Per-stream and aggregate throughput over the time each stream was delivering frames
+    def report(self) -> dict:
+        streams = list()
+        for stream in range(self.stream_count):
+            elapsed_sec = ((self.last_ns[stream] or 0) - (self.first_ns[stream] or 0)) / 1e9
+            streams.append({"stream": stream, "bytes": self.stream_bytes[stream], "elapsed_sec": round(elapsed_sec, 6),
+                            "throughput_MBps": round(self.stream_bytes[stream] / elapsed_sec / 1e6, 3) if elapsed_sec > 0 else 0.0})
+        started = [ns for ns in self.first_ns if ns is not None]
+        ended = [ns for ns in self.last_ns if ns is not None]
+        elapsed_sec = (max(ended) - min(started)) / 1e9 if started else 0.0
+        total = sum(self.stream_bytes)
+        return {"stream_count": self.stream_count, "bytes": total, "elapsed_sec": round(elapsed_sec, 6),
+                "throughput_MBps": round(total / elapsed_sec / 1e6, 3) if elapsed_sec > 0 else 0.0, "streams": streams}
+
+    # Result lines for the throughput report
+    def summary_lines(self) -> list:
+        report = self.report()
+        lines = ["Striped over " + str(report["stream_count"]) + " streams: " + str(report["bytes"]) + " bytes in "
+                 + str(report["elapsed_sec"]) + " s (" + str(report["throughput_MBps"]) + " MB/s aggregate)"]
+        for stream in report["streams"]:
+            lines.append("\tstream " + str(stream["stream"]) + ": " + str(stream["bytes"]) + " bytes in " + str(stream["elapsed_sec"])
+                         + " s (" + str(stream["throughput_MBps"]) + " MB/s)")
+        return lines
+
+############################
+
+# Reads the streams of a striped transfer round-robin, so recv_frame() on it returns frames
+# in chunk order with a single END once every stream has ended. Later frames (repair
+# rounds) come from stream 0, and so does anything else, e.g. sendall for ACK/REPAIR.
+class StripedReceiver(StripeOrder):
+    def __init__(self, connections):
+        StripeOrder.__init__(self, len(connections))
+        self.connections = connections
+
+    def __getattr__(self, name):
+        return getattr(self.connections[0], name)
+
+    def recv_frame(self):
+        stream = self.next_stream()
+        frame = recv_frame(self.connections[stream])
+        if(self.finished and frame is None):
+            return None
+        self.record(stream, frame)
+        if(frame[0] == FRAME_END and not self.finished):
+            # Chunk i was due on this stream and it ended, so every other stream has to end here too
+            for other in range(self.stream_count):
+                if(other != stream):
+                    other_end = recv_frame(self.connections[other])
+                    self.record(other, other_end)
+                    if(other_end[0] != FRAME_END):
+                        raise Exception("StripedReceiver: stream " + str(other) + " sent " + FRAME_TYPE_NAMES[other_end[0]] + " after the last chunk")
+            self.finished = True
+        return frame
+
+    def close(self) -> None:
+        for connection in self.connections:
+            connection.close()
+
+############################
+
+# Accept the rest of a striped transfer whose first connection sent `first_frame` (a STRIPE frame).
+# `prepare(connection)` sets up every accepted socket (timeouts, buffering) and returns what to read from.
+def accept_stripes(listener, connection, first_frame, prepare=None) -> StripedReceiver:
+    transfer_id, stream_id, stream_count = unpack_stripe(first_frame[3])
+    connections = [None] * stream_count
+    connections[stream_id] = connection
+    for _ in range(stream_count - 1):
+        accepted, _ = listener.accept()
+        if prepare is not None:
+            accepted = prepare(accepted)
+        _, _, _, payload = expect_frame(accepted, FRAME_STRIPE)
+        other_transfer, other_id, other_count = unpack_stripe(payload)
+        if(other_transfer != transfer_id or other_count != stream_count or connections[other_id] is not None):
+            accepted.close()
+            raise Exception("accept_stripes: stream " + str(other_id) + " of transfer " + str(other_transfer) + " does not belong to this transfer")
+        connections[other_id] = accepted
+    return StripedReceiver(connections)
+
+############################
+
+# asyncio version of StripedReceiver, over the StreamReaders of every stream
+class AsyncStripedReceiver(StripeOrder):
+    def __init__(self, readers):
+        StripeOrder.__init__(self, len(readers))
+        self.readers = readers
+
+    async def read_frame(self, timeout=None):
+        stream = self.next_stream()
+        frame = await read_frame_async(self.readers[stream], timeout)
+        if(self.finished and frame is None):
+            return None
+        self.record(stream, frame)
+        if(frame[0] == FRAME_END and not self.finished):
+            for other in range(self.stream_count):
+                if(other != stream):
+                    other_end = await read_frame_async(self.readers[other], timeout)
+                    self.record(other, other_end)
+                    if(other_end[0] != FRAME_END):
+                        raise Exception("AsyncStripedReceiver: stream " + str(other) + " sent " + FRAME_TYPE_NAMES[other_end[0]] + " after the last chunk")
+            self.finished = True
+        return frame
+
+
+#################################
+#                               #
+#      COMPRESSED TRANSFERS     #
+#                               #
+#################################
+# Wraps a connection (or a StripedReceiver) after compression was negotiated: CHUNK frames
+# come out of recv_frame() with their raw payload, whatever the transmitter compressed them with.
+# Anything else (sendall, settimeout, close, ...) goes to the wrapped connection.
+class DecodingReceiver:
+    def __init__(self, connection, codec):
+        self.connection = connection
+        self.codec = codec
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+    def recv_frame(self):
+        frame = recv_frame(self.connection)
+        if(frame is None or frame[0] != FRAME_CHUNK):
+            return frame
+        frame_type, flags, index, payload = frame
+        return frame_type, flags & ~FLAG_COMPRESSED, index, self.codec.decode(payload, flags)
+
+############################
+
+# asyncio version of DecodingReceiver, over a StreamReader or an AsyncStripedReceiver
+class AsyncDecodingReceiver:
+    def __init__(self, reader, codec):
+        self.reader = reader
+        self.codec = codec
+
+    async def read_frame(self, timeout=None):
+        frame = await read_frame_async(self.reader, timeout)
+        if(frame is None or frame[0] != FRAME_CHUNK):
+            return frame
+        frame_type, flags, index, payload = frame
+        return frame_type, flags & ~FLAG_COMPRESSED, index, self.codec.decode(payload, flags)
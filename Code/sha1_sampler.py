@@ -0,0 +1,234 @@
+####################################################################################
+###                                                                              ###
+###               ECE 4300 - Computer Architecture Spring 2022                   ###
+###   Term Project: SHA-1 Algorithm Performance on Multiple Embedded Platforms   ###
+###                                                                              ###
+###                           Resource Sampler Thread                            ###
+###                                                                              ###
+###            By: Derek Mata, Christopher Yamada, Elizabeth Hwang               ###
+###                                                                              ###
+####################################################################################
+
+# A background thread that wakes up `rate_hz` times a second while a script runs and
+# records per-core CPU %, the current frequency of every core, the process RSS and
+# peak RSS, context switches and every /sys/class/thermal zone. Each sample is tagged
+# with the phase the main thread is in (read, hash, write, send, receive, verify), set
+# with set_phase() or `with phase("hash"):`, so a Pi 3B+ throttling down to 600 MHz
+# halfway through hashing shows up next to the timing it skewed.
+#
+# The phase is one module-level string, so switching it in a per-chunk loop costs an
+# attribute store whether or not a sampler is running.
+
+# General python libraries
+import os
+import glob
+import json
+import time
+import resource
+import threading
+import contextlib
+
+# Metric calculating library
+import psutil
+
+
+
+# Phases the scripts tag their work with
+PHASES = ("idle", "read", "hash", "write", "send", "receive", "verify")
+
+# Default sampling rate
+DEFAULT_SAMPLE_HZ = 50.0
+
+# Thermal zones exposed by the kernel, temperatures are in millidegrees Celsius
+THERMAL_ZONE_GLOB = "/sys/class/thermal/thermal_zone*"
+
+# Phase the main thread is in right now
+current_phase = "idle"
+
+
+
+#################################
+#                               #
+#         PHASE TRACKING        #
+#                               #
+#################################
+# Tag everything from now on with `name`
+def set_phase(name: str) -> None:
+    global current_phase
+    current_phase = name
+
+############################
+
+# Tag a block with `name`, then go back to the phase it was in before
+@contextlib.contextmanager
+def phase(name: str):
+    previous = current_phase
+    set_phase(name)
+    try:
+        yield
+    finally:
+        set_phase(previous)
+
+
+#################################
+#                               #
+#        SYSTEM READINGS        #
+#                               #
+#################################
+# (name, temp file) for every thermal zone, named after its type file ("cpu-thermal", "GPU-therm", ...)
+def find_thermal_zones() -> list:
+    zones = list()
+    for zone_dir in sorted(glob.glob(THERMAL_ZONE_GLOB)):
+        name = os.path.basename(zone_dir)
+        try:
+            with open(os.path.join(zone_dir, "type"), "r") as file:
+                name = file.read().strip() or name
+        except OSError:
+            pass
+        zones.append((name, os.path.join(zone_dir, "temp")))
+    return zones
+
+############################
+
+# Current temperature of every thermal zone in degrees Celsius, unreadable zones are skipped
+def read_thermal_zones(zones) -> dict:
+    temps = dict()
+    for name, temp_path in zones:
+        try:
+            with open(temp_path, "r") as file:
+                temps[name] = int(file.read().strip()) / 1000.0
+        except (OSError, ValueError):
+            continue
+    return temps
+
+############################
+
+# Highest RSS this process has reached so far, in bytes (ru_maxrss is in kilobytes on Linux)
+def peak_rss_bytes() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+#################################
+#                               #
+#        RESOURCE SAMPLER       #
+#                               #
+#################################
+class ResourceSampler:
+    def __init__(self, rate_hz=DEFAULT_SAMPLE_HZ):
+        if(rate_hz <= 0):
+            raise Exception("ResourceSampler: rate_hz has to be above 0")
+        self.interval = 1.0 / rate_hz
+        self.rate_hz = rate_hz
+        self.process = psutil.Process()
+        self.zones = find_thermal_zones()
+        self.samples = list()
+        self.started_ns = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # Start sampling in a daemon thread
+    def start(self) -> None:
+        # The first cpu_percent call only sets the baseline for the next one
+        psutil.cpu_percent(percpu=True)
+        self.started_ns = time.perf_counter_ns()
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+        self.thread.start()
+
+    # Stop sampling and take one last sample so short runs still get one
+    def stop(self) -> None:
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+        self.samples.append(self.take_sample())
+
+    # Sample on a fixed schedule, a slow sample delays the next one instead of piling up
+    def _run(self) -> None:
+        deadline = time.perf_counter()
+        while True:
+            deadline += self.interval
+            if self.stop_event.wait(max(0.0, deadline - time.perf_counter())):
+                break
+            self.samples.append(self.take_sample())
+            deadline = max(deadline, time.perf_counter() - self.interval)
+
+    # One reading of everything, tagged with the main thread's phase
+    def take_sample(self) -> dict:
+        memory = self.process.memory_info()
+        switches = self.process.num_ctx_switches()
+        frequencies = psutil.cpu_freq(percpu=True) or list()
+        return {
+            "t_ms": round((time.perf_counter_ns() - self.started_ns) / 1e6, 3),
+            "phase": current_phase,
+            "cpu_percent": psutil.cpu_percent(percpu=True),
+            "cpu_freq_mhz": [round(frequency.current, 1) for frequency in frequencies],
+            "rss_bytes": memory.rss,
+            "peak_rss_bytes": peak_rss_bytes(),
+            "ctx_voluntary": switches.voluntary,
+            "ctx_involuntary": switches.involuntary,
+            "temps_c": read_thermal_zones(self.zones),
+        }
+
+    # Per-phase aggregate: sample count, CPU %, frequency range, hottest zone, RSS and context switches
+    def summary_by_phase(self) -> dict:
+        summary = dict()
+        previous = None
+        for sample in self.samples:
+            phase_summary = summary.setdefault(sample["phase"], {
+                "samples": 0, "cpu_percent_mean": 0.0, "cpu_percent_max": 0.0,
+                "cpu_freq_mhz_min": None, "cpu_freq_mhz_max": None, "temp_c_max": None,
+                "rss_bytes_max": 0, "ctx_switches": 0,
+            })
+            phase_summary["samples"] += 1
+            cores = sample["cpu_percent"] or [0.0]
+            phase_summary["cpu_percent_mean"] += sum(cores) / len(cores)
+            phase_summary["cpu_percent_max"] = max(phase_summary["cpu_percent_max"], max(cores))
+            if sample["cpu_freq_mhz"]:
+                low, high = min(sample["cpu_freq_mhz"]), max(sample["cpu_freq_mhz"])
+                phase_summary["cpu_freq_mhz_min"] = low if phase_summary["cpu_freq_mhz_min"] is None else min(phase_summary["cpu_freq_mhz_min"], low)
+                phase_summary["cpu_freq_mhz_max"] = high if phase_summary["cpu_freq_mhz_max"] is None else max(phase_summary["cpu_freq_mhz_max"], high)
+            if sample["temps_c"]:
+                hottest = max(sample["temps_c"].values())
+                phase_summary["temp_c_max"] = hottest if phase_summary["temp_c_max"] is None else max(phase_summary["temp_c_max"], hottest)
+            phase_summary["rss_bytes_max"] = max(phase_summary["rss_bytes_max"], sample["rss_bytes"])
+            # Switches since the previous sample count towards the phase they ended in
+            if previous is not None:
+                phase_summary["ctx_switches"] += (sample["ctx_voluntary"] - previous["ctx_voluntary"]) + (sample["ctx_involuntary"] - previous["ctx_involuntary"])
+            previous = sample
+        for phase_summary in summary.values():
+            phase_summary["cpu_percent_mean"] = round(phase_summary["cpu_percent_mean"] / phase_summary["samples"], 2)
+        return summary
+
+    # Peak RSS of the whole run in bytes
+    def peak_rss(self) -> int:
+        return max([sample["peak_rss_bytes"] for sample in self.samples] or [0])
+
+    # Write every sample plus the per-phase summary as JSON
+    def save(self, output_path: str) -> None:
+        with open(output_path, "w") as file:
+            json.dump({"rate_hz": self.rate_hz, "thermal_zones": [name for name, _ in self.zones],
+                       "summary": self.summary_by_phase(), "samples": self.samples}, file, indent=1)
+            file.write("\n")
+
+    # Result lines for the per-phase summary, in the format of the rest of results.txt
+    def summary_lines(self) -> list:
+        lines = ["Resource samples (" + str(len(self.samples)) + " at " + str(self.rate_hz) + " Hz), peak RSS " + str(round(self.peak_rss() / 1e6, 2)) + "MB:"]
+        for name, phase_summary in self.summary_by_phase().items():
+            line = ("\t" + name + ": " + str(phase_summary["samples"]) + " samples, CPU " + str(phase_summary["cpu_percent_mean"])
+                    + "% avg / " + str(phase_summary["cpu_percent_max"]) + "% max core")
+            if(phase_summary["cpu_freq_mhz_min"] is not None):
+                line += ", " + str(phase_summary["cpu_freq_mhz_min"]) + "-" + str(phase_summary["cpu_freq_mhz_max"]) + "MHz"
+            if(phase_summary["temp_c_max"] is not None):
+                line += ", " + str(phase_summary["temp_c_max"]) + "C max"
+            line += ", " + str(phase_summary["ctx_switches"]) + " context switches"
+            lines.append(line)
+        return lines
@@ -0,0 +1,158 @@
+####################################################################################
+###                                                                              ###
+###               ECE 4300 - Computer Architecture Spring 2022                   ###
+###   Term Project: SHA-1 Algorithm Performance on Multiple Embedded Platforms   ###
+###                                                                              ###
+###                              Tracing Spans                                   ###
+###                                                                              ###
+###            By: Derek Mata, Christopher Yamada, Elizabeth Hwang               ###
+###                                                                              ###
+####################################################################################
+
+# `with span("sha1.update"):` records how long a block took as a Chrome trace "complete"
+# event, which chrome://tracing and ui.perfetto.dev both open. Timestamps are anchored to
+# the wall clock when tracing starts, so a transmitter trace and a receiver trace from the
+# same board (or NTP-synced boards) line up when merged with `sha1_benchmark.py trace-merge`.
+#
+# Tracing is off until start_tracing() is called. While it is off span() hands back one
+# shared do-nothing context manager, so a traced per-chunk loop only pays for a function
+# call and a global lookup.
+
+# General python libraries
+import os
+import json
+import time
+import threading
+import contextlib
+
+
+
+# Is a trace being recorded right now
+tracing = False
+
+# Recorded trace events
+trace_events = list()
+
+# perf_counter_ns and wall clock (in ns) at the moment tracing started
+trace_start_perf_ns = 0
+trace_start_wall_ns = 0
+
+# Returned by span() while tracing is off
+NULL_SPAN = contextlib.nullcontext()
+
+
+
+#################################
+#                               #
+#             SPANS             #
+#                               #
+#################################
+class Span:
+    __slots__ = ("name", "category", "args", "start_ns")
+
+    def __init__(self, name: str, category: str, args):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start_ns = 0
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        end_ns = time.perf_counter_ns()
+        event = {
+            "name": self.name, "cat": self.category, "ph": "X",
+            "ts": (trace_start_wall_ns + self.start_ns - trace_start_perf_ns) / 1000.0,
+            "dur": (end_ns - self.start_ns) / 1000.0,
+            "pid": os.getpid(), "tid": threading.get_native_id(),
+        }
+        if self.args:
+            event["args"] = self.args
+        trace_events.append(event)
+        return False
+
+############################
+
+# Time a block as a trace span, `args` (a small dict) shows up in the span's details
+def span(name: str, category="sha1", args=None):
+    if not tracing:
+        return NULL_SPAN
+    return Span(name, category, args)
+
+############################
+
+# Wrap an iterator so every next() call (a file read, a mapped slice) becomes a span.
+# With tracing off the iterator is returned untouched.
+def traced_iter(iterator, name: str, category="sha1"):
+    if not tracing:
+        return iterator
+    return _traced_iter(iter(iterator), name, category)
+
+def _traced_iter(iterator, name: str, category: str):
+    while True:
+        with Span(name, category, None):
+            item = next(iterator, NULL_SPAN)
+        if item is NULL_SPAN:
+            return
+        yield item
+
+############################
+
+# A zero-length marker, e.g. when an ACK arrives
+def instant(name: str, category="sha1", args=None) -> None:
+    if not tracing:
+        return
+    event = {
+        "name": name, "cat": category, "ph": "i", "s": "t",
+        "ts": (trace_start_wall_ns + time.perf_counter_ns() - trace_start_perf_ns) / 1000.0,
+        "pid": os.getpid(), "tid": threading.get_native_id(),
+    }
+    if args:
+        event["args"] = args
+    trace_events.append(event)
+
+
+#################################
+#                               #
+#        START / SAVE TRACE     #
+#                               #
+#################################
+# Start recording, `process_name` labels this process's track in the trace viewer
+def start_tracing(process_name: str) -> None:
+    global tracing
+    global trace_start_perf_ns
+    global trace_start_wall_ns
+    trace_events.clear()
+    trace_start_wall_ns = time.time_ns()
+    trace_start_perf_ns = time.perf_counter_ns()
+    pid = os.getpid()
+    trace_events.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": process_name}})
+    trace_events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": threading.get_native_id(), "args": {"name": "main"}})
+    tracing = True
+
+############################
+
+# Stop recording and write the Chrome trace JSON, returns the number of events written
+def save_trace(output_path: str) -> int:
+    global tracing
+    tracing = False
+    with open(output_path, "w") as file:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, file)
+        file.write("\n")
+    return len(trace_events)
+
+############################
+
+# Combine several trace files (e.g. transmitter and receiver) into one timeline
+def merge_traces(input_paths, output_path: str) -> int:
+    events = list()
+    for input_path in input_paths:
+        with open(input_path, "r") as file:
+            trace = json.load(file)
+        events.extend(trace["traceEvents"] if isinstance(trace, dict) else trace)
+    with open(output_path, "w") as file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+        file.write("\n")
+    return len(events)
@@ -0,0 +1,487 @@
+####################################################################################
+###                                                                              ###
+###               ECE 4300 - Computer Architecture Spring 2022                   ###
+###   Term Project: SHA-1 Algorithm Performance on Multiple Embedded Platforms   ###
+###                                                                              ###
+###                          Chunk Verification Engine                           ###
+###                                                                              ###
+###            By: Derek Mata, Christopher Yamada, Elizabeth Hwang               ###
+###                                                                              ###
+####################################################################################
+
+# Hashes received chunks in memory with hashlib instead of spawning one
+# `sha1sum` shell per chunk file. Work is spread over a thread pool by default
+# (hashlib drops the GIL for buffers over 2 KB, so 4 KB chunks hash in parallel)
+# or a process pool for very small chunks where the GIL would serialize them.
+#
+# Staged transfers (send.txt -> receive.txt plus the manifest) can run to millions of
+# chunks, so IndexedVerifier streams receive.txt and checks chunk i against digest i a
+# batch at a time. What it keeps per chunk is a matched flag (1 byte) and, when a Merkle
+# root or the sha1sum cross-check needs them, the raw leaf digest in a DigestStore
+# (20 bytes in one flat bytearray).
+
+# General python libraries
+import os
+import tempfile
+import itertools
+import subprocess
+import functools
+
+# Hashing library
+import hashlib
+
+# Algorithm names for manifests that are not SHA-1
+from sha1_hashing import new_hash
+
+# Worker pools
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+
+
+# Number of chunks handed to a process pool worker at once
+PROCESS_POOL_BATCH = 256
+
+# Number of file names given to a single `sha1sum` call in cross-check mode
+SHA1SUM_BATCH = 512
+
+# Size of one raw SHA-1 digest in bytes
+DIGEST_SIZE = 20
+
+# Chunks hashed per round when verifying staged files, bounds how many chunks are held at once
+VERIFY_BATCH = 4096
+
+# Bytes read at a time when streaming a staged file
+STAGED_READ_SIZE = 1 << 20
+
+# Mismatches kept with their digests for the results file, later ones are only counted
+MAX_LISTED_MISMATCHES = 1000
+
+
+
+#################################
+#                               #
+#          POOL SIZING          #
+#                               #
+#################################
+# Number of cores this process is allowed to run on
+def default_worker_count() -> int:
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return max(1, os.cpu_count() or 1)
+
+
+#################################
+#                               #
+#        IN-MEMORY HASHING      #
+#                               #
+#################################
+# SHA-1 hex digest of one chunk
+def sha1_hexdigest(chunk) -> str:
+    return hashlib.sha1(chunk).hexdigest()
+
+############################
+
+# Raw 20 byte SHA-1 digest of one chunk
+def sha1_digest(chunk) -> bytes:
+    return hashlib.sha1(chunk).digest()
+
+############################
+
+# Raw digest of one chunk with any of sha1_hashing.HASH_ALGORITHMS
+def chunk_digest(chunk, algorithm="sha1") -> bytes:
+    return new_hash(algorithm, chunk).digest()
+
+############################
+
+# Worker pool for `workers` workers, or None when one worker means hashing inline
+def open_pool(workers=None, use_processes=False):
+    if workers is None:
+        workers = default_worker_count()
+    if(workers <= 1):
+        return None
+    if use_processes:
+        return ProcessPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers)
+
+############################
+
+# Apply `function` to every chunk on `pool` (inline if there is no pool), keeping the order
+def map_chunks(pool, function, chunks) -> list:
+    if(pool is None or len(chunks) < 2):
+        return [function(chunk) for chunk in chunks]
+    if isinstance(pool, ProcessPoolExecutor):
+        return list(pool.map(function, chunks, chunksize=PROCESS_POOL_BATCH))
+    return list(pool.map(function, chunks))
+
+############################
+
+# SHA-1 hex digest of every chunk, in the same order as `chunks`
+def hash_chunks(chunks, workers=None, use_processes=False) -> list:
+    if(len(chunks) < 2):
+        return [sha1_hexdigest(chunk) for chunk in chunks]
+    pool = open_pool(workers, use_processes)
+    if pool is None:
+        return [sha1_hexdigest(chunk) for chunk in chunks]
+    with pool:
+        return map_chunks(pool, sha1_hexdigest, chunks)
+
+############################
+
+# Hash every chunk and compare it to its expected digest, returns (digests, matched flags)
+def verify_chunks(chunks, expected_digests, workers=None, use_processes=False) -> tuple:
+    if(len(chunks) != len(expected_digests)):
+        raise Exception("verify_chunks: got " + str(len(chunks)) + " chunks but " + str(len(expected_digests)) + " digests")
+    digests = hash_chunks(chunks, workers=workers, use_processes=use_processes)
+    matched = [digests[i] == expected_digests[i].lower() for i in range(len(digests))]
+    return digests, matched
+
+
+#################################
+#                               #
+#      SHA1SUM CROSS-CHECK      #
+#                               #
+#################################
+# Run `sha1sum` once per batch of files (relative to `cwd` if given), returns {path: digest}
+def sha1sum_files(paths, batch_size=SHA1SUM_BATCH, output_path=None, cwd=None) -> dict:
+    digests = dict()
+    output_file = open(output_path, "a") if output_path else None
+    try:
+        for start in range(0, len(paths), batch_size):
+            batch = list(paths[start:start + batch_size])
+            result = subprocess.run(["sha1sum", "--"] + batch, capture_output=True, text=True, cwd=cwd)
+            if(result.returncode != 0):
+                raise Exception("sha1sum_files: sha1sum exited with " + str(result.returncode) + ": " + result.stderr.strip())
+            if output_file:
+                output_file.write(result.stdout)
+            for line in result.stdout.splitlines():
+                digest, _, path = line.partition("  ")
+                digests[path] = digest
+    finally:
+        if output_file:
+            output_file.close()
+    return digests
+
+############################
+
+# Compare hashlib digests (hex strings, or raw bytes such as a DigestStore holds) against
+# `sha1sum` for the same files, returns indices that disagree
+def cross_check_with_sha1sum(paths, digests, batch_size=SHA1SUM_BATCH, output_path=None, cwd=None) -> list:
+    linux_digests = sha1sum_files(paths, batch_size=batch_size, output_path=output_path, cwd=cwd)
+    mismatched = list()
+    for i in range(len(paths)):
+        digest = digests[i]
+        if isinstance(digest, (bytes, bytearray)):
+            digest = digest.hex()
+        if(linux_digests.get(paths[i]) != digest):
+            mismatched.append(i)
+    return mismatched
+
+############################
+
+# Same cross-check for chunks held in memory or a ChunkStore: each batch is written out as
+# text-of-hashes-N.txt files in a scratch directory for sha1sum, then deleted again
+def cross_check_chunks_with_sha1sum(chunks, digests, batch_size=SHA1SUM_BATCH, output_path=None) -> list:
+    mismatched = list()
+    with tempfile.TemporaryDirectory(prefix="sha1sum-check-") as scratch_dir:
+        for start in range(0, len(chunks), batch_size):
+            names = list()
+            for index in range(start, min(start + batch_size, len(chunks))):
+                names.append("text-of-hashes-" + str(index + 1) + ".txt")
+                with open(os.path.join(scratch_dir, names[-1]), "wb") as file:
+                    file.write(chunks[index])
+            batch_mismatches = cross_check_with_sha1sum(names, [digests[index] for index in range(start, start + len(names))],
+                                                        batch_size=batch_size, output_path=output_path, cwd=scratch_dir)
+            mismatched.extend(start + i for i in batch_mismatches)
+            for name in names:
+                os.remove(os.path.join(scratch_dir, name))
+    return mismatched
+
+
+#################################
+#                               #
+#          DIGEST STORE         #
+#                               #
+#################################
+# Fixed-width raw digests keyed by chunk index, all in one bytearray: digest i lives at
+# [i*20, i*20+20). A million SHA-1 digests take 20 MB here instead of ~53 MB as a list
+# of bytes objects, and nothing is allocated per entry until one is read back.
+class DigestStore:
+    def __init__(self, digest_size=DIGEST_SIZE):
+        self.digest_size = digest_size
+        self.data = bytearray()
+
+    # Store holding the packed digests in `buffer` (bytes, bytearray or a memoryview slice), copied in one go
+    @classmethod
+    def from_buffer(cls, buffer, digest_size=DIGEST_SIZE):
+        if(len(buffer) % digest_size != 0):
+            raise Exception("DigestStore.from_buffer: " + str(len(buffer)) + " bytes is not a whole number of " + str(digest_size) + " byte digests")
+        store = cls(digest_size)
+        store.data = bytearray(buffer)
+        return store
+
+    def __len__(self) -> int:
+        return len(self.data) // self.digest_size
+
+    # Raw digest of chunk `index`
+    def __getitem__(self, index: int) -> bytes:
+        start = self._offset(index)
+        return bytes(self.data[start:start + self.digest_size])
+
+    # Set the digest of chunk `index`, the index one past the end appends
+    def __setitem__(self, index: int, digest) -> None:
+        if(len(digest) != self.digest_size):
+            raise Exception("DigestStore: digest is " + str(len(digest)) + " bytes, expected " + str(self.digest_size))
+        if(index == len(self)):
+            self.data += digest
+            return
+        start = self._offset(index)
+        self.data[start:start + self.digest_size] = digest
+
+    def __iter__(self):
+        for start in range(0, len(self.data), self.digest_size):
+            yield bytes(self.data[start:start + self.digest_size])
+
+    # Add the digest of the next chunk
+    def append(self, digest) -> None:
+        self[len(self)] = digest
+
+    # Hex digest of chunk `index`
+    def hex(self, index: int) -> str:
+        return self[index].hex()
+
+    # Byte offset of chunk `index` in the store, negative indices count from the end
+    def _offset(self, index: int) -> int:
+        count = len(self)
+        if(index < 0):
+            index += count
+        if(index < 0 or index >= count):
+            raise IndexError("DigestStore: index " + str(index) + " is outside the " + str(count) + " stored digests")
+        return index * self.digest_size
+
+
+#################################
+#                               #
+#       VERIFY-ON-RECEIVE       #
+#                               #
+#################################
+# Checks chunks one at a time as they come off the socket and keeps a running tally.
+# The transmitter's digests are cumulative (one running sha1 over every chunk so far),
+# so by default this keeps its own running sha1 and compares after each update.
+class RunningVerifier:
+    def __init__(self, chained=True):
+        self.chained = chained
+        self.algorithm = "sha1"
+        self.sha1 = hashlib.sha1()
+        self.chunk_count = 0
+        self.byte_count = 0
+        self.matched_count = 0
+        self.mismatched_count = 0
+        self.mismatched_indices = list()
+        self.leaf_digests = None
+        self.root_matched = None
+        self.resume_sha1 = None
+        self.repair_rounds = 0
+        self.repaired_bytes = 0
+
+    # Switch to Merkle tree manifests: independent per-chunk digests, leaves kept for the root check
+    def enable_tree_mode(self) -> None:
+        self.chained = False
+        self.leaf_digests = DigestStore()
+
+    # Check against another algorithm's digests (a staged manifest names its own), before the first chunk
+    def set_algorithm(self, algorithm: str) -> None:
+        if self.chunk_count:
+            raise Exception("RunningVerifier.set_algorithm: " + str(self.chunk_count) + " chunks were already checked with " + self.algorithm)
+        self.algorithm = algorithm
+        self.sha1 = new_hash(algorithm)
+
+    # Hash one chunk and compare it against the digest the transmitter sent for it
+    def check(self, chunk, expected_digest: str) -> bool:
+        matched = self._compare(self.chunk_count, chunk, expected_digest)
+        self.chunk_count += 1
+        self.byte_count += len(chunk)
+        return matched
+
+    # Hash chunk `index` and update the tally. In chained mode the running state just
+    # before the first mismatch is kept, so a repair round can pick up from there.
+    def _compare(self, index: int, chunk, expected_digest: str) -> bool:
+        if self.chained:
+            before = self.sha1.copy() if self.resume_sha1 is None else None
+            self.sha1.update(chunk)
+            digest = self.sha1.hexdigest()
+        else:
+            leaf = chunk_digest(chunk, self.algorithm)
+            digest = leaf.hex()
+            if self.leaf_digests is not None:
+                self.leaf_digests[index] = leaf
+        matched = (digest == expected_digest.strip().lower())
+        if matched:
+            self.matched_count += 1
+        else:
+            self.mismatched_count += 1
+            self.mismatched_indices.append(index)
+            if(self.chained and self.resume_sha1 is None):
+                self.resume_sha1 = before
+        return matched
+
+    # Begin a repair round, returns the chunk indices the transmitter has to send again.
+    # A chained mismatch poisons every later digest, so that is every chunk from the first failure on,
+    # unless the receiver kept the chunks and only asks for the first one (see resume()).
+    def start_repair_round(self) -> list:
+        indices = self.mismatched_indices
+        self.mismatched_indices = list()
+        self.mismatched_count -= len(indices)
+        self.repair_rounds += 1
+        if(self.chained and indices):
+            self.sha1 = self.resume_sha1
+            self.resume_sha1 = None
+        return indices
+
+    # Check a chunk that was sent again during a repair round
+    def recheck(self, index: int, chunk, expected_digest: str) -> bool:
+        self.repaired_bytes += len(chunk)
+        return self._compare(index, chunk, expected_digest)
+
+    # Chained repair against stored chunks: after the first failed chunk was resent and rechecked, carry
+    # the running digest on over the later chunks read back off the disk, (index, chunk, expected digest)
+    # in order. The next chunk that fails is then the only one the following round has to ask for.
+    def resume(self, stored) -> None:
+        for index, chunk, expected_digest in stored:
+            self._compare(index, chunk, expected_digest)
+
+    # One line summary of the tally so far
+    def summary(self) -> str:
+        line = (str(self.matched_count) + "/" + str(self.chunk_count) + " chunks matched, "
+                + str(self.mismatched_count) + " mismatched (" + str(self.byte_count) + " bytes verified)")
+        if self.repair_rounds:
+            line += ", " + str(self.repaired_bytes) + " bytes repaired in " + str(self.repair_rounds) + " round(s)"
+        if self.root_matched is not None:
+            line += ", Merkle root " + ("MATCHES" if self.root_matched else "DOES NOT MATCH")
+        return line
+
+############################
+
+# Append `payload` to `pending` and pull out every complete "\r"-terminated chunk (staged send.txt format)
+def split_staged_chunks(pending: bytearray, payload) -> list:
+    pending += payload
+    chunks = list()
+    start = 0
+    while True:
+        end = pending.find(b"\r", start)
+        if(end < 0):
+            break
+        if(end > start):
+            chunks.append(bytes(pending[start:end]))
+        start = end + 1
+    del pending[:start]
+    return chunks
+
+############################
+
+# Stream a staged file (receive.txt, send.txt) one "\r"-terminated chunk at a time,
+# a last chunk without the "\r" is still returned
+def iter_staged_file(path: str, read_size=STAGED_READ_SIZE):
+    pending = bytearray()
+    with open(path, "rb") as file:
+        while True:
+            block = file.read(read_size)
+            if not block:
+                break
+            yield from split_staged_chunks(pending, block)
+    if pending:
+        yield bytes(pending)
+
+
+#################################
+#                               #
+#     INDEXED STAGED VERIFY     #
+#                               #
+#################################
+# Checks chunk i of receive.txt against raw digest i of the manifest without holding receive.txt.
+# Chunks are pulled a batch at a time and hashed on one pool for the whole run. Chained
+# manifests (the transmitter's running sha1) are compared against our own running sha1,
+# tree manifests against each chunk's own leaf digest. `algorithm` is the manifest's.
+class IndexedVerifier:
+    def __init__(self, chained=True, keep_leaves=False, workers=None, use_processes=False, batch_size=VERIFY_BATCH, algorithm="sha1"):
+        if(batch_size < 1):
+            raise Exception("IndexedVerifier: batch_size has to be at least 1")
+        self.chained = chained
+        self.workers = default_worker_count() if workers is None else workers
+        self.use_processes = use_processes
+        self.batch_size = batch_size
+        self.algorithm = algorithm
+        self.sha1 = new_hash(algorithm)
+        self.matched = bytearray()
+        self.leaves = DigestStore(self.sha1.digest_size) if keep_leaves else None
+        self.byte_count = 0
+        self.mismatched_count = 0
+        self.mismatches = list()
+
+    @property
+    def chunk_count(self) -> int:
+        return len(self.matched)
+
+    @property
+    def matched_count(self) -> int:
+        return self.chunk_count - self.mismatched_count
+
+    # Per-chunk leaves can be hashed on the pool, a chained digest has to see the chunks one after another
+    @property
+    def parallel(self) -> bool:
+        return not self.chained or self.leaves is not None
+
+    # Workers run() actually hashes on
+    @property
+    def active_workers(self) -> int:
+        return max(1, self.workers) if self.parallel else 1
+
+    # Verify every chunk against the digest at the same index. A chunk without a digest
+    # (or a digest without a chunk) counts as a mismatch. No pool is opened when nothing can use it.
+    def run(self, chunks, expected_digests) -> None:
+        pairs = itertools.zip_longest(chunks, expected_digests)
+        pool = open_pool(self.workers, self.use_processes) if self.parallel else None
+        try:
+            while True:
+                batch = list(itertools.islice(pairs, self.batch_size))
+                if not batch:
+                    break
+                self._check_batch(pool, batch)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    # Hash one batch of (chunk, expected raw digest) pairs and record the results
+    def _check_batch(self, pool, batch) -> None:
+        chunks = [chunk if chunk is not None else b"" for chunk, _ in batch]
+        leaves = None
+        if self.parallel:
+            leaves = map_chunks(pool, sha1_digest if self.algorithm == "sha1" else functools.partial(chunk_digest, algorithm=self.algorithm), chunks)
+            if self.leaves is not None:
+                for leaf in leaves:
+                    self.leaves.append(leaf)
+        if self.chained:
+            digests = list()
+            for chunk, _ in batch:
+                if chunk is not None:
+                    self.sha1.update(chunk)
+                digests.append(self.sha1.digest())
+        else:
+            digests = leaves
+
+        for i in range(len(batch)):
+            chunk, expected = batch[i]
+            matched = (chunk is not None and digests[i] == expected)
+            self.matched.append(matched)
+            if chunk is not None:
+                self.byte_count += len(chunk)
+            if not matched:
+                self.mismatched_count += 1
+                if(len(self.mismatches) < MAX_LISTED_MISMATCHES):
+                    self.mismatches.append((len(self.matched) - 1, expected.hex() if expected is not None else "",
+                                            digests[i].hex() if chunk is not None else ""))
+
+    # One line summary of the tally
+    def summary(self) -> str:
+        return (str(self.matched_count) + "/" + str(self.chunk_count) + " chunks matched, "
+                + str(self.mismatched_count) + " mismatched (" + str(self.byte_count) + " bytes verified)")
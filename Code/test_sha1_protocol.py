@@ -0,0 +1,269 @@
+####################################################################################
+###                                                                              ###
+###               ECE 4300 - Computer Architecture Spring 2022                   ###
+###   Term Project: SHA-1 Algorithm Performance on Multiple Embedded Platforms   ###
+###                                                                              ###
+###                   Protocol, Manifest and Chunk Store Tests                   ###
+###                                                                              ###
+###            By: Derek Mata, Christopher Yamada, Elizabeth Hwang               ###
+###                                                                              ###
+####################################################################################
+
+# Checks for the pieces both scripts trust blindly: framing, the binary manifest, the
+# Merkle audit paths, the chunk codec's limits and resuming a chunk store.
+# Run from Code/ with:  python -m pytest -q
+
+# General python libraries
+import hashlib
+import socket
+import struct
+import zlib
+
+# Test runner
+import pytest
+
+# Modules under test
+from sha1_protocol import FRAME_HEADER, FRAME_CHUNK, FRAME_END, FRAME_MANIFEST, FLAG_COMPRESSED, FLAG_STREAMED
+from sha1_protocol import pack_frame, send_frame, recv_frame, recv_file_frames, pack_indices, unpack_indices
+from sha1_manifest import Manifest, MANIFEST_HEADER, MANIFEST_MAGIC, MANIFEST_VERSION, ALGORITHM_IDS
+from sha1_merkle import hash_leaves, merkle_levels, merkle_parent, merkle_root, audit_path, verify_audit_path, verify_subrange
+from sha1_compress import ChunkCodec
+from sha1_chunkstore import ChunkStoreWriter, ChunkStore
+
+
+
+#################################
+#                               #
+#            FRAMING            #
+#                               #
+#################################
+# Every frame type survives a trip over a real socket pair, payload, index and flags included
+def test_frame_round_trip():
+    left, right = socket.socketpair()
+    with left, right:
+        send_frame(left, FRAME_MANIFEST, b"a" * 40, index=7, flags=FLAG_STREAMED)
+        send_frame(left, FRAME_CHUNK, bytes(range(256)) * 400, index=8)
+        send_frame(left, FRAME_END)
+        assert recv_frame(right) == (FRAME_MANIFEST, FLAG_STREAMED, 7, bytearray(b"a" * 40))
+        assert recv_frame(right) == (FRAME_CHUNK, 0, 8, bytearray(bytes(range(256)) * 400))
+        assert recv_frame(right) == (FRAME_END, 0, 0, bytearray())
+        left.close()
+        assert recv_frame(right) is None
+
+############################
+
+# recv_file_frames collects payloads up to the END frame and hands back its payload
+def test_recv_file_frames_collects_until_end():
+    left, right = socket.socketpair()
+    with left, right:
+        for part in (b"one", b"two", b"three"):
+            send_frame(left, FRAME_CHUNK, part)
+        send_frame(left, FRAME_END, b"root")
+        parts = list()
+        assert recv_file_frames(right, FRAME_CHUNK, parts) == b"root"
+        assert [bytes(part) for part in parts] == [b"one", b"two", b"three"]
+
+############################
+
+# A peer that goes away inside a header or a payload is an error, not a clean close
+@pytest.mark.parametrize("cut", [FRAME_HEADER.size - 3, FRAME_HEADER.size + 10])
+def test_truncated_frame(cut):
+    left, right = socket.socketpair()
+    with left, right:
+        left.sendall(pack_frame(FRAME_CHUNK, b"x" * 64)[:cut])
+        left.close()
+        with pytest.raises(Exception, match="connection closed"):
+            recv_frame(right)
+
+############################
+
+# Frames with a bad magic or a length over the frame limit are refused before any payload is read
+def test_bad_frame_headers():
+    header = FRAME_HEADER.pack(b"XXXX", 1, FRAME_CHUNK, 0, 0, 0)
+    left, right = socket.socketpair()
+    with left, right:
+        left.sendall(header)
+        with pytest.raises(Exception, match="bad magic"):
+            recv_frame(right)
+    header = FRAME_HEADER.pack(b"SHA1", 1, FRAME_CHUNK, 0, 0, 1 << 30)
+    left, right = socket.socketpair()
+    with left, right:
+        left.sendall(header)
+        with pytest.raises(Exception, match="frame limit"):
+            recv_frame(right)
+
+############################
+
+# REPAIR payloads carry 32-bit indices
+def test_repair_indices():
+    assert unpack_indices(pack_indices([0, 3, 70000])) == [0, 3, 70000]
+    with pytest.raises(Exception, match="32-bit indices"):
+        unpack_indices(b"\x00\x01\x02")
+
+
+
+#################################
+#                               #
+#            MANIFEST           #
+#                               #
+#################################
+# Manifest of `count` fake chunks
+def make_manifest(count, tree=False):
+    manifest = Manifest("sha1", 4096, tree=tree)
+    for index in range(count):
+        manifest.digests.append(hashlib.sha1(str(index).encode("ascii")).digest())
+    return manifest
+
+############################
+
+# pack() and from_binary() agree on every header field and every digest
+@pytest.mark.parametrize("tree", [False, True])
+def test_manifest_round_trip(tree):
+    manifest = make_manifest(5, tree)
+    loaded = Manifest.from_binary(manifest.pack())
+    assert (loaded.algorithm, loaded.chunk_size, loaded.tree, len(loaded)) == ("sha1", 4096, tree, 5)
+    assert [loaded.hex(index) for index in range(5)] == [manifest.hex(index) for index in range(5)]
+    assert loaded.hex(5) == ""
+    assert Manifest.from_bytes(manifest.pack()).digests.data == manifest.digests.data
+
+############################
+
+# Header fields that do not describe the buffer are rejected with a Manifest.from_binary error
+@pytest.mark.parametrize("fields, message", [
+    ((b"XXXX", MANIFEST_VERSION, ALGORITHM_IDS["sha1"], 20, 0, 4096, 0), "bad magic"),
+    ((MANIFEST_MAGIC, MANIFEST_VERSION + 1, ALGORITHM_IDS["sha1"], 20, 0, 4096, 0), "unsupported manifest version"),
+    ((MANIFEST_MAGIC, MANIFEST_VERSION, 250, 20, 0, 4096, 0), "unknown algorithm id"),
+    ((MANIFEST_MAGIC, MANIFEST_VERSION, ALGORITHM_IDS["sha1"], 0, 0, 4096, 3), "digests are 20 bytes"),
+    ((MANIFEST_MAGIC, MANIFEST_VERSION, ALGORITHM_IDS["sha1"], 20, 0, 4096, 3), "bytes follow it"),
+])
+def test_manifest_bad_headers(fields, message):
+    with pytest.raises(Exception, match="Manifest.from_binary: .*" + message):
+        Manifest.from_binary(MANIFEST_HEADER.pack(*fields) + b"\x00" * 20)
+
+############################
+
+# A buffer shorter than the header is refused before unpacking
+def test_manifest_short_header():
+    with pytest.raises(Exception, match="too short"):
+        Manifest.from_binary(MANIFEST_MAGIC + b"\x01")
+
+
+
+#################################
+#                               #
+#          MERKLE TREE          #
+#                               #
+#################################
+# `count` distinct chunks
+def make_chunks(count):
+    return [struct.pack("!I", index) * 100 for index in range(count)]
+
+############################
+
+# An odd level promotes its last node, so three leaves combine as ((0,1),2)
+def test_merkle_root_odd_promotes_last():
+    leaves = hash_leaves(make_chunks(3))
+    assert merkle_root(leaves) == merkle_parent(merkle_parent(leaves[0], leaves[1]), leaves[2])
+    assert merkle_root(leaves[:1]) == leaves[0]
+    assert merkle_root([]) == hashlib.sha1().digest()
+
+############################
+
+# Every leaf's audit path rebuilds the root, a changed leaf does not
+@pytest.mark.parametrize("count", [1, 3, 5, 7, 8, 13])
+def test_audit_paths(count):
+    leaves = hash_leaves(make_chunks(count))
+    levels = merkle_levels(leaves)
+    root = merkle_root(leaves)
+    for index, leaf in enumerate(leaves):
+        path = audit_path(levels, index)
+        assert verify_audit_path(leaf, path, root)
+        if(count > 1):
+            assert not verify_audit_path(hashlib.sha1(b"other").digest(), path, root)
+
+############################
+
+# A subrange is checked against its own leaves only, a tampered chunk shows up at its position
+def test_verify_subrange_odd_leaf_count():
+    chunks = make_chunks(7)
+    leaves = hash_leaves(chunks, workers=2)
+    assert verify_subrange(chunks[2:5], 2, leaves) == [True, True, True]
+    assert verify_subrange([chunks[5], b"tampered"], 5, leaves) == [True, False]
+    assert verify_subrange(chunks[6:], 6, leaves) == [True]
+    with pytest.raises(Exception, match="outside"):
+        verify_subrange(chunks[5:], 6, leaves)
+
+
+
+#################################
+#                               #
+#          CHUNK CODEC          #
+#                               #
+#################################
+# Compressed frames inflate back to the raw chunk, uncompressed ones pass through untouched
+def test_codec_round_trip():
+    codec = ChunkCodec("zlib:6")
+    chunk = b"abc" * 1000
+    payload, flags = codec.encode(chunk)
+    assert flags == FLAG_COMPRESSED
+    assert codec.decode(payload, flags) == chunk
+    assert codec.decode(b"raw", 0) == b"raw"
+
+############################
+
+# A frame that inflates past max_output, or stops short of its stream end, is refused
+@pytest.mark.parametrize("payload", [zlib.compress(b"a" * 5000), zlib.compress(b"b" * 500)[:-6]])
+def test_codec_oversized_or_truncated_frame(payload):
+    codec = ChunkCodec("zlib:6", max_output=1000)
+    with pytest.raises(Exception, match="decompresses to more than"):
+        codec.decode(payload, FLAG_COMPRESSED)
+
+############################
+
+# Bytes after the end of the compressed stream are refused
+def test_codec_trailing_bytes():
+    codec = ChunkCodec("zlib:6")
+    with pytest.raises(Exception, match="bytes after the end"):
+        codec.decode(zlib.compress(b"c" * 500) + b"junk", FLAG_COMPRESSED)
+
+
+
+#################################
+#                               #
+#          CHUNK STORE          #
+#                               #
+#################################
+# Reopening without truncate drops a half-written last entry and keeps appending after the whole ones
+def test_chunk_store_resume(tmp_path):
+    data_path = str(tmp_path / "chunks.dat")
+    index_path = str(tmp_path / "chunks.idx")
+    with ChunkStoreWriter(data_path, index_path) as writer:
+        for chunk in (b"first", b"second", b"third"):
+            writer.append(chunk)
+    # An interrupted append: part of an index entry and a few data bytes that never got indexed
+    with open(index_path, "ab") as file:
+        file.write(b"\x00\x01\x02")
+    with open(data_path, "ab") as file:
+        file.write(b"partial")
+
+    with ChunkStoreWriter(data_path, index_path, truncate=False) as writer:
+        assert len(writer) == 3
+        assert writer.offset == len(b"firstsecondthird")
+        assert writer.append(b"fourth") == 3
+    with ChunkStore(data_path, index_path) as store:
+        assert len(store) == 4
+        assert [bytes(store[index]) for index in range(4)] == [b"first", b"second", b"third", b"fourth"]
+
+############################
+
+# A fresh writer over an existing store starts from nothing
+def test_chunk_store_truncate(tmp_path):
+    data_path = str(tmp_path / "chunks.dat")
+    index_path = str(tmp_path / "chunks.idx")
+    with ChunkStoreWriter(data_path, index_path) as writer:
+        writer.append(b"old")
+    with ChunkStoreWriter(data_path, index_path) as writer:
+        assert len(writer) == 0
+        writer.append(b"new")
+    with ChunkStore(data_path, index_path) as store:
+        assert [bytes(chunk) for chunk in store] == [b"new"]